@@ -0,0 +1,104 @@
+'''Resource usage of the processes started by the run console'''
+import sys
+import os
+
+if hasattr(os, 'sysconf'):
+    CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+else:
+    CLOCK_TICKS = 100
+
+# ru_maxrss is reported in kilobytes on Linux but in bytes on macOS
+MAXRSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+
+live_sampling_supported = os.path.exists('/proc/self/stat')
+
+
+def format_bytes(size):
+    if abs(size) < 1024:
+        return f'{size} B'
+    for unit in ('KiB', 'MiB', 'GiB'):
+        size /= 1024
+        if abs(size) < 1024 or unit == 'GiB':
+            return f'{size:.1f} {unit}'
+
+
+def read_process_usage(pid):
+    '''Current usage of a running process from /proc, or None where it is unavailable'''
+    try:
+        with open(f'/proc/{pid}/stat') as stat_file:
+            stat = stat_file.read()
+        with open(f'/proc/{pid}/status') as status_file:
+            status = status_file.read()
+    except OSError:
+        return None
+
+    # The command name may contain spaces, so split after its closing bracket
+    fields = stat.rsplit(')', 1)[1].split()
+    usage = {'user': int(fields[11]) / CLOCK_TICKS, 'system': int(fields[12]) / CLOCK_TICKS}
+    for line in status.splitlines():
+        name, separator, value = line.partition(':')
+        if name == 'VmRSS':
+            usage['rss'] = int(value.split()[0]) * 1024
+        elif name == 'VmHWM':
+            usage['peak_rss'] = int(value.split()[0]) * 1024
+        elif name == 'voluntary_ctxt_switches':
+            usage['voluntary_switches'] = int(value)
+        elif name == 'nonvoluntary_ctxt_switches':
+            usage['involuntary_switches'] = int(value)
+
+    try:
+        with open(f'/proc/{pid}/io') as io_file:
+            for line in io_file:
+                name, separator, value = line.partition(':')
+                if name == 'read_bytes':
+                    usage['read_bytes'] = int(value)
+                elif name == 'write_bytes':
+                    usage['write_bytes'] = int(value)
+    except OSError:
+        pass
+    return usage
+
+
+def exit_code_from_status(status):
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def wait_with_usage(process):
+    '''Wait for a Popen process to exit and return its rusage, where the platform has one'''
+    if not hasattr(os, 'wait4'):
+        process.wait()
+        return None
+    try:
+        pid, status, rusage = os.wait4(process.pid, 0)
+    except ChildProcessError:
+        # Already reaped by Popen, e.g. while it was being stopped
+        process.wait()
+        return None
+    process.returncode = exit_code_from_status(status)
+    return {
+        'user': rusage.ru_utime,
+        'system': rusage.ru_stime,
+        'peak_rss': rusage.ru_maxrss * MAXRSS_UNIT,
+        'voluntary_switches': rusage.ru_nvcsw,
+        'involuntary_switches': rusage.ru_nivcsw,
+        'read_blocks': rusage.ru_inblock,
+        'write_blocks': rusage.ru_oublock,
+    }
+
+
+def format_usage(usage):
+    parts = [f"Wall {usage['wall']:.5f}s"]
+    if 'user' in usage:
+        parts.append(f"User {usage['user']:.3f}s")
+        parts.append(f"Sys {usage['system']:.3f}s")
+    if 'peak_rss' in usage:
+        parts.append(f"Peak RSS {format_bytes(usage['peak_rss'])}")
+    if 'voluntary_switches' in usage:
+        parts.append(f"Ctx Switches {usage['voluntary_switches']} vol / {usage['involuntary_switches']} invol")
+    if 'read_bytes' in usage:
+        parts.append(f"I/O {format_bytes(usage['read_bytes'])} read / {format_bytes(usage['write_bytes'])} written")
+    elif 'read_blocks' in usage:
+        parts.append(f"I/O {usage['read_blocks']} blocks in / {usage['write_blocks']} out")
+    return ' | '.join(parts)
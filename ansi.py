@@ -0,0 +1,153 @@
+'''Streaming parser for the ANSI escape sequences written by terminal programs
+
+Output arrives in arbitrary chunks, so an escape sequence cut in half is
+kept back until the rest of it arrives. The parser only produces
+operations; the console decides how to apply them to its document.
+'''
+import collections
+import re
+
+Style = collections.namedtuple('Style', 'foreground background bold italic underline')
+DEFAULT_STYLE = Style(None, None, False, False, False)
+
+# Control sequences, OSC strings (window titles etc.), other escapes, carriage return and backspace
+TOKEN_EXPRESSION = re.compile(r'\x1b\[([0-9;?]*)([@-~])|\x1b\][^\x07\x1b]*(?:\x07|\x1b\\)|\x1b[@-Z\\^_]|[\r\b]')
+
+# Longest incomplete sequence kept back before giving up and showing it as text
+MAX_PENDING = 64
+
+
+class AnsiParser:
+    def __init__(self):
+        self.style = DEFAULT_STYLE
+        self.pending = ''
+
+    def feed(self, text):
+        '''Returns the operations for a chunk of output as tuples, starting with their name
+
+        ('text', text, style), ('carriage_return',), ('backspace',),
+        ('erase_line', mode), ('erase_display', mode), ('cursor_up', count),
+        ('cursor_down', count), ('cursor_column', column)
+        '''
+        text = self.pending + text
+        self.pending = ''
+        operations = []
+        position = 0
+        for match in TOKEN_EXPRESSION.finditer(text):
+            if match.start() > position:
+                operations.append(('text', text[position:match.start()], self.style))
+            position = match.end()
+            token = match.group(0)
+            if token == '\r':
+                operations.append(('carriage_return',))
+            elif token == '\b':
+                operations.append(('backspace',))
+            elif match.group(2):
+                operation = self.control_sequence(match.group(1), match.group(2))
+                if operation is not None:
+                    operations.append(operation)
+
+        rest = text[position:]
+        escape = rest.find('\x1b')
+        if escape >= 0 and len(rest) - escape <= MAX_PENDING:
+            self.pending = rest[escape:]
+            rest = rest[:escape]
+        if rest:
+            operations.append(('text', rest, self.style))
+        return operations
+
+    def control_sequence(self, parameters, command):
+        if parameters.startswith('?'):
+            return None  # private modes such as hiding the cursor
+        numbers = [int(number) if number else 0 for number in parameters.split(';')] if parameters else []
+        first = numbers[0] if numbers else 0
+        if command == 'm':
+            self.style = self.apply_sgr(numbers or [0])
+        elif command == 'K':
+            return ('erase_line', first)
+        elif command == 'J':
+            return ('erase_display', first)
+        elif command == 'A':
+            return ('cursor_up', first or 1)
+        elif command == 'B':
+            return ('cursor_down', first or 1)
+        elif command == 'G':
+            return ('cursor_column', max(first, 1))
+
+    def apply_sgr(self, numbers):
+        '''Applies a Select Graphic Rendition sequence to the current style'''
+        foreground, background, bold, italic, underline = self.style
+        numbers = iter(numbers)
+        for number in numbers:
+            if number == 0:
+                foreground, background, bold, italic, underline = DEFAULT_STYLE
+            elif number == 1:
+                bold = True
+            elif number == 22:
+                bold = False
+            elif number == 3:
+                italic = True
+            elif number == 23:
+                italic = False
+            elif number == 4:
+                underline = True
+            elif number == 24:
+                underline = False
+            elif 30 <= number <= 37:
+                foreground = number - 30
+            elif 90 <= number <= 97:
+                foreground = number - 90 + 8
+            elif number == 39:
+                foreground = None
+            elif 40 <= number <= 47:
+                background = number - 40
+            elif 100 <= number <= 107:
+                background = number - 100 + 8
+            elif number == 49:
+                background = None
+            elif number in (38, 48):
+                colour = self.extended_colour(numbers)
+                if number == 38:
+                    foreground = colour
+                else:
+                    background = colour
+        return Style(foreground, background, bold, italic, underline)
+
+    def extended_colour(self, numbers):
+        '''Reads the rest of a 256 colour (5;n) or true colour (2;r;g;b) parameter'''
+        mode = next(numbers, None)
+        if mode == 5:
+            return next(numbers, None)
+        elif mode == 2:
+            red, green, blue = next(numbers, 0), next(numbers, 0), next(numbers, 0)
+            return (red, green, blue)
+
+
+# Dark theme versions of the 16 standard terminal colours
+BASE_COLOURS = [
+    0x3F4451, 0xE06C75, 0x98C379, 0xE5C07B, 0x61AFEF, 0xC678DD, 0x56B6C2, 0xD7DAE0,
+    0x4F5666, 0xFF7B86, 0xB1E18B, 0xEFD88B, 0x67CDFF, 0xE48BFF, 0x63D4E0, 0xFFFFFF,
+]
+
+
+def clamp(value):
+    return min(max(value, 0), 255)
+
+
+def colour_value(colour):
+    '''RGB integer for a colour index of the 256 colour palette, or an (r, g, b) tuple
+
+    Programs can send numbers outside 0-255, which are taken as the nearest that is not.
+    '''
+    if isinstance(colour, tuple):
+        red, green, blue = (clamp(value) for value in colour)
+        return (red << 16) | (green << 8) | blue
+    colour = clamp(colour)
+    if colour < 16:
+        return BASE_COLOURS[colour]
+    if colour < 232:
+        colour -= 16
+        levels = [0 if level == 0 else 55 + level * 40 for level in (colour // 36, colour // 6 % 6, colour % 6)]
+        return (levels[0] << 16) | (levels[1] << 8) | levels[2]
+    grey = 8 + (colour - 232) * 10
+    return (grey << 16) | (grey << 8) | grey
@@ -0,0 +1,280 @@
+from PyQt5 import QtWidgets, QtGui, QtCore
+from concurrent.futures import ThreadPoolExecutor
+from widgets import TitledDockWidget
+from runconfig import RunConfiguration
+import subprocess
+import statistics
+import shutil
+import time
+import json
+import os
+
+
+def percentile(sorted_values, fraction):
+    '''Linearly interpolated percentile of already sorted values'''
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarise(timings, bins=12):
+    '''Summary statistics, Tukey outliers and a histogram of benchmark timings'''
+    ordered = sorted(timings)
+    lower_quartile = percentile(ordered, 0.25)
+    upper_quartile = percentile(ordered, 0.75)
+    fence = 1.5 * (upper_quartile - lower_quartile)
+    outliers = [timing for timing in timings
+                if timing < lower_quartile - fence or timing > upper_quartile + fence]
+
+    width = (ordered[-1] - ordered[0]) / bins or 1
+    histogram = [0] * bins
+    for timing in ordered:
+        histogram[min(int((timing - ordered[0]) / width), bins - 1)] += 1
+
+    return {
+        'timings': timings,
+        'min': ordered[0],
+        'max': ordered[-1],
+        'median': statistics.median(ordered),
+        'mean': statistics.mean(ordered),
+        'stdev': statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+        'outliers': outliers,
+        'histogram': histogram,
+        'histogram_start': ordered[0],
+        'histogram_width': width,
+    }
+
+
+def compare(result, baseline):
+    '''Relative change of the median, or None from a zero baseline, and whether it is larger than the noise of either run'''
+    if baseline['median']:
+        change = result['median'] / baseline['median'] - 1
+    else:
+        change = 0.0 if not result['median'] else None
+    noise = 2 * max(result['stdev'], baseline['stdev'])
+    significant = abs(result['median'] - baseline['median']) > noise
+    return change, significant
+
+
+def describe_change(result, baseline):
+    '''The summary line comparing a result with its baseline'''
+    change, significant = compare(result, baseline)
+    verdict = ('slower' if result['median'] > baseline['median'] else 'faster') if significant else 'within noise'
+    relative = f'{change * 100:+.1f}%' if change is not None else 'no relative change'
+    return f"vs baseline median {baseline['median']:.5f}s: {relative} ({verdict})"
+
+
+class BenchmarkThread(QtCore.QThread):
+
+    progress = QtCore.pyqtSignal(int, int)
+    benchmark_finished = QtCore.pyqtSignal(dict)
+    benchmark_failed = QtCore.pyqtSignal(str)
+
+    def __init__(self, file, repeat=10, warmup=1, parallel=1, pin_cpu=False, configuration=None):
+        super().__init__()
+        self.file = file
+        self.configuration = configuration or RunConfiguration()
+        self.repeat = repeat
+        self.warmup = warmup
+        self.parallel = max(1, parallel)
+        # Pinned with taskset, as preexec_fn is unsafe in a process with threads
+        self.pin_cpu = pin_cpu and hasattr(os, 'sched_getaffinity') and shutil.which('taskset') is not None
+        self.cancelled = False
+
+    def time_once(self, worker_index=0):
+        if self.cancelled:
+            return None
+        command = self.configuration.python_command() + [os.path.abspath(self.file)] + self.configuration.script_arguments()
+        if self.pin_cpu:
+            cpus = sorted(os.sched_getaffinity(0))
+            # taskset sets the affinity before it executes Python, so the timed startup is pinned too
+            command = ['taskset', '--cpu-list', str(cpus[worker_index % len(cpus)])] + command
+        start_time = time.perf_counter()
+        process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, stdin=subprocess.DEVNULL,
+                                   env=self.environment, cwd=self.configuration.cwd())
+        errors = process.communicate()[1]
+        time_taken = time.perf_counter() - start_time
+        if process.returncode != 0:
+            self.cancelled = True
+            raise RuntimeError(errors.decode(errors='replace') or f'Exit code {process.returncode}')
+        return time_taken
+
+    def run(self):
+        self.environment = self.configuration.process_environment()
+        try:
+            for _ in range(self.warmup):
+                self.time_once()
+            self.progress.emit(0, self.repeat)
+            with ThreadPoolExecutor(self.parallel) as executor:
+                futures = [executor.submit(self.time_once, index % self.parallel) for index in range(self.repeat)]
+                timings = []
+                for future in futures:
+                    timing = future.result()
+                    if timing is None:
+                        return self.benchmark_failed.emit('Cancelled')
+                    timings.append(timing)
+                    self.progress.emit(len(timings), self.repeat)
+        except (RuntimeError, OSError, ValueError) as error:
+            return self.benchmark_failed.emit(str(error))
+        result = summarise(timings)
+        result.update(file=self.file, warmup=self.warmup, parallel=self.parallel, pin_cpu=self.pin_cpu,
+                      configuration=self.configuration.describe(), created=time.time())
+        self.benchmark_finished.emit(result)
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class HistogramWidget(QtWidgets.QWidget):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.result = None
+        self.setMinimumHeight(100)
+
+    def set_result(self, result):
+        self.result = result
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QtGui.QPainter(self)
+        painter.fillRect(self.rect(), QtGui.QColor(0x21252B))
+        if not self.result:
+            return
+        histogram = self.result['histogram']
+        tallest = max(histogram) or 1
+        bar_width = self.width() / len(histogram)
+        chart_height = self.height() - 20
+        for index, count in enumerate(histogram):
+            bar_height = chart_height * count / tallest
+            rect = QtCore.QRectF(index * bar_width + 1, 4 + chart_height - bar_height, bar_width - 2, bar_height)
+            painter.fillRect(rect, QtGui.QColor(0x61AFEF))
+        painter.setPen(QtGui.QColor(0xA9B7C6))
+        start = self.result['histogram_start']
+        end = start + self.result['histogram_width'] * len(histogram)
+        painter.drawText(3, self.height() - 3, f'{start:.4f}s')
+        painter.drawText(QtCore.QRect(0, self.height() - 16, self.width() - 3, 16), QtCore.Qt.AlignRight, f'{end:.4f}s')
+
+
+class BenchmarkDock(TitledDockWidget):
+    def __init__(self, settings, parent=None):
+        super().__init__('Benchmark', parent)
+        self.settings = settings
+        self.benchmark_thread = None
+        self.result = None
+        try:
+            self.results = json.loads(self.settings.value('benchmarks', '{}'))
+        except ValueError:
+            self.results = {}
+
+        container = QtWidgets.QWidget(self)
+        layout = QtWidgets.QVBoxLayout(container)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(0)
+
+        self.tool_bar = QtWidgets.QWidget(container)
+        self.tool_bar.setObjectName('console_toolbar')
+        tool_layout = QtWidgets.QHBoxLayout(self.tool_bar)
+        tool_layout.setContentsMargins(5, 2, 5, 2)
+        self.repeat_entry = self.add_spin_box(tool_layout, 'Runs', 1, 10000, int(self.settings.value('benchmark_repeat', 10)))
+        self.warmup_entry = self.add_spin_box(tool_layout, 'Warm-up', 0, 100, int(self.settings.value('benchmark_warmup', 1)))
+        self.parallel_entry = self.add_spin_box(tool_layout, 'Parallel', 1, os.cpu_count() or 1,
+                                                int(self.settings.value('benchmark_parallel', 1)))
+        self.pin_checkbox = QtWidgets.QCheckBox('Pin CPU', self.tool_bar)
+        self.pin_checkbox.setObjectName('console_status')
+        self.pin_checkbox.setChecked(self.settings.value('benchmark_pin_cpu', 'false') == 'true')
+        self.pin_checkbox.setEnabled(hasattr(os, 'sched_getaffinity') and shutil.which('taskset') is not None)
+        tool_layout.addWidget(self.pin_checkbox)
+        tool_layout.addStretch()
+        self.cancel_button = QtWidgets.QPushButton('Cancel', self.tool_bar)
+        self.cancel_button.setObjectName('console_button')
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel)
+        tool_layout.addWidget(self.cancel_button)
+        self.baseline_button = QtWidgets.QPushButton('Set as Baseline', self.tool_bar)
+        self.baseline_button.setObjectName('console_button')
+        self.baseline_button.clicked.connect(self.set_baseline)
+        tool_layout.addWidget(self.baseline_button)
+        layout.addWidget(self.tool_bar)
+
+        self.summary_label = QtWidgets.QLabel('', container)
+        self.summary_label.setObjectName('benchmark_summary')
+        self.summary_label.setTextInteractionFlags(QtCore.Qt.TextSelectableByMouse)
+        layout.addWidget(self.summary_label)
+
+        self.histogram = HistogramWidget(container)
+        layout.addWidget(self.histogram)
+
+        self.setWidget(container)
+
+    def add_spin_box(self, layout, label, minimum, maximum, value):
+        label_widget = QtWidgets.QLabel(label, self.tool_bar)
+        label_widget.setObjectName('console_status')
+        layout.addWidget(label_widget)
+        spin_box = QtWidgets.QSpinBox(self.tool_bar)
+        spin_box.setRange(minimum, maximum)
+        spin_box.setValue(max(minimum, min(value, maximum)))
+        layout.addWidget(spin_box)
+        return spin_box
+
+    def save_settings(self):
+        self.settings.setValue('benchmark_repeat', self.repeat_entry.value())
+        self.settings.setValue('benchmark_warmup', self.warmup_entry.value())
+        self.settings.setValue('benchmark_parallel', self.parallel_entry.value())
+        self.settings.setValue('benchmark_pin_cpu', self.pin_checkbox.isChecked())
+        self.settings.setValue('benchmarks', json.dumps(self.results))
+
+    def benchmark(self, file, configuration=None):
+        if self.benchmark_thread is not None and self.benchmark_thread.isRunning():
+            return
+        self.save_settings()
+        self.benchmark_thread = BenchmarkThread(file, self.repeat_entry.value(), self.warmup_entry.value(),
+                                                self.parallel_entry.value(), self.pin_checkbox.isChecked(), configuration)
+        self.benchmark_thread.progress.connect(self.show_progress)
+        self.benchmark_thread.benchmark_finished.connect(self.show_result)
+        self.benchmark_thread.benchmark_failed.connect(self.show_failure)
+        self.benchmark_thread.finished.connect(lambda: self.cancel_button.setEnabled(False))
+        self.cancel_button.setEnabled(True)
+        self.summary_label.setText(f'Warming up {os.path.basename(file)}...')
+        self.benchmark_thread.start()
+
+    def cancel(self):
+        if self.benchmark_thread is not None:
+            self.benchmark_thread.cancel()
+
+    def show_progress(self, done, total):
+        self.summary_label.setText(f'Benchmarking {os.path.basename(self.benchmark_thread.file)}: {done}/{total}')
+
+    def show_failure(self, error):
+        self.summary_label.setText(f'Benchmark failed:\n{error.strip()}')
+
+    def show_result(self, result):
+        self.result = result
+        path = os.path.abspath(result['file'])
+        file_results = self.results.setdefault(path, {})
+        file_results['last'] = result
+        self.save_settings()
+
+        lines = [
+            f"{os.path.basename(path)}: {len(result['timings'])} runs, {result['warmup']} warm-up"
+            f"{', parallel ' + str(result['parallel']) if result['parallel'] > 1 else ''}"
+            f"{', pinned' if result['pin_cpu'] else ''}",
+            result.get('configuration', ''),
+            f"min {result['min']:.5f}s   median {result['median']:.5f}s   "
+            f"mean {result['mean']:.5f}s   stddev {result['stdev']:.5f}s   max {result['max']:.5f}s",
+            f"{len(result['outliers'])} outliers" +
+            (': ' + ', '.join(f'{outlier:.5f}s' for outlier in result['outliers']) if result['outliers'] else ''),
+        ]
+        baseline = file_results.get('baseline')
+        if baseline is not None:
+            lines.append(describe_change(result, baseline))
+            if baseline.get('configuration') != result.get('configuration'):
+                lines.append(f"baseline ran with {baseline.get('configuration', 'Default')}")
+        self.summary_label.setText('\n'.join(lines))
+        self.histogram.set_result(result)
+
+    def set_baseline(self):
+        if self.result is not None:
+            self.results[os.path.abspath(self.result['file'])]['baseline'] = self.result
+            self.save_settings()
+            self.summary_label.setText(self.summary_label.text() + '\nSaved as baseline')
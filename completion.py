@@ -0,0 +1,233 @@
+'''Completions for the editors: keywords, builtins, the names in a buffer and the symbols of the project'''
+from PyQt5 import QtCore
+from concurrent.futures import ThreadPoolExecutor
+from symbolworker import parse_symbols
+import heapq
+import syntax
+import re
+
+identifier_expression = re.compile(r'[^\W\d]\w*')
+bucket_size = 32  # Entries a leaf holds before it bursts into a node per next character
+scan_limit = 1000  # Entries looked at per lookup, which keeps lookups to a few milliseconds
+fuzzy_scan_limit = 300
+
+# Weights of each source, so a name from the buffer beats an equally good one from elsewhere
+buffer_weight = 3
+definition_weight = 4
+keyword_weight = 2
+project_weight = 1
+
+
+class TrieNode:
+
+    __slots__ = ('children', 'bucket')
+
+    def __init__(self):
+        self.children = None
+        self.bucket = []
+
+
+class PrefixTrie:
+    '''Burst trie of names keyed by their lowered text
+
+    Entries sit in small buckets until a bucket grows past bucket_size, when it bursts into a
+    node per next character, so a lookup walks a few dicts and then scans short lists.
+    '''
+
+    def __init__(self):
+        self.root = TrieNode()
+        self.weights = {}
+
+    def __len__(self):
+        return len(self.weights)
+
+    def insert(self, word, weight=0):
+        if word in self.weights:
+            self.weights[word] = max(self.weights[word], weight)
+            return
+        self.weights[word] = weight
+        key = word.lower()
+        node, depth = self.root, 0
+        while node.children is not None and depth < len(key):
+            node = node.children.setdefault(key[depth], TrieNode())
+            depth += 1
+        node.bucket.append((key, word))
+        if node.children is None and len(node.bucket) > bucket_size:
+            self.burst(node, depth)
+
+    @staticmethod
+    def burst(node, depth):
+        node.children = {}
+        bucket, node.bucket = node.bucket, []
+        for key, word in bucket:
+            if len(key) == depth:
+                node.bucket.append((key, word))
+            else:
+                node.children.setdefault(key[depth], TrieNode()).bucket.append((key, word))
+
+    def find(self, prefix, limit=scan_limit):
+        '''Up to limit words whose lowered text starts with the lowered prefix, shortest words first'''
+        key = prefix.lower()
+        node, depth = self.root, 0
+        while node.children is not None and depth < len(key):
+            node = node.children.get(key[depth])
+            if node is None:
+                return []
+            depth += 1
+        if depth < len(key):
+            # Stopped at a bucket, whose entries only share the part of the key walked so far
+            return [word for entry_key, word in node.bucket if entry_key.startswith(key)][:limit]
+        found = []
+        level = [node]
+        # Breadth first, as names deeper in the trie are longer and so less likely to be wanted
+        while level and len(found) < limit:
+            following = []
+            for node in level:
+                found += [word for entry_key, word in node.bucket]
+                if node.children is not None:
+                    following += node.children.values()
+            level = following
+        return found[:limit]
+
+
+def fuzzy_expression(prefix):
+    # a[^b]*b[^c]*c finds the characters in order without backtracking
+    return re.compile(re.escape(prefix[0]) + ''.join(
+        f'[^{re.escape(character)}]*{re.escape(character)}' for character in prefix[1:]), re.IGNORECASE)
+
+
+def rank_completions(prefix, tries, count=50):
+    '''The best count words of any of the tries for a prefix the user has typed
+
+    Prefix matches rank first, case sensitive ones ahead, then fuzzy matches by how tightly
+    they fit, taken from the names under the prefix's first character.
+    '''
+    lowered = prefix.lower()
+    expression = fuzzy_expression(prefix)
+    best = {}
+    for trie in tries:
+        found = trie.find(prefix)
+        if len(prefix) > 1:
+            found += trie.find(prefix[0], fuzzy_scan_limit)
+        for word in found:
+            if word == prefix or word in best:
+                continue
+            if word.startswith(prefix):
+                rank = 30
+            elif word.lower().startswith(lowered):
+                rank = 20
+            else:
+                match = expression.search(word)
+                if match is None:
+                    continue
+                rank = 10 - min(match.end() - match.start() - len(prefix), 9)
+            best[word] = rank + trie.weights[word] - len(word) / 100
+    return heapq.nlargest(count, best, key=best.get)
+
+
+def buffer_trie(source):
+    '''Trie of the names in some source, with the ones it defines weighted above the ones it uses
+
+    Source being edited often does not parse, in which case every identifier in it is used.
+    '''
+    trie = PrefixTrie()
+    try:
+        symbols, references = parse_symbols(source)
+    except (SyntaxError, ValueError, RecursionError):
+        symbols, references = [], set(identifier_expression.findall(source))
+    for symbol in symbols:
+        trie.insert(symbol.name, definition_weight)
+    for name in references:
+        trie.insert(name, buffer_weight)
+    return trie
+
+
+def project_trie(names):
+    trie = PrefixTrie()
+    for name in names:
+        trie.insert(name, project_weight)
+    return trie
+
+
+class ProjectCompletions(QtCore.QObject):
+    '''Keyword, builtin and project symbol tries, with the project's rebuilt in the background as it is indexed'''
+
+    project_trie_built = QtCore.pyqtSignal(object)
+
+    def __init__(self, project_symbols, parent=None, delay=2000):
+        super().__init__(parent)
+        self.project_symbols = project_symbols
+        # One thread analyses buffers and builds tries in turn, so the GUI thread only looks things up
+        self.executor = ThreadPoolExecutor(1)
+        self.language_trie = PrefixTrie()
+        for word in syntax.python.keywords + [name.lstrip('@') for name in syntax.python.builtins]:
+            self.language_trie.insert(word, keyword_weight)
+        self.project_trie = PrefixTrie()
+        self.project_trie_built.connect(self.set_project_trie)
+        self.rebuild_timer = QtCore.QTimer(self)
+        self.rebuild_timer.setSingleShot(True)
+        self.rebuild_timer.setInterval(delay)
+        self.rebuild_timer.timeout.connect(self.rebuild)
+        self.project_symbols.files_indexed.connect(self.rebuild_timer.start)
+        self.rebuild()
+
+    def rebuild(self):
+        self.submit(lambda: project_trie(self.project_symbols.index.names()), self.project_trie_built)
+
+    def submit(self, function, signal):
+        '''Runs function on the background thread and emits its result with signal'''
+        def done(future):
+            if future.cancelled() or future.exception() is not None:
+                return
+            try:
+                signal.emit(future.result())
+            except RuntimeError:
+                pass  # The object the signal belongs to was deleted while the function ran
+        self.executor.submit(function).add_done_callback(done)
+
+    def set_project_trie(self, trie):
+        self.project_trie = trie
+
+    def complete(self, prefix, local_trie=None):
+        tries = [self.language_trie, self.project_trie]
+        if local_trie is not None:
+            tries.insert(0, local_trie)
+        return rank_completions(prefix, tries)
+
+    def shutdown(self):
+        self.rebuild_timer.stop()
+        self.executor.shutdown(wait=False)
+
+
+class BufferCompletions(QtCore.QObject):
+    '''Names in the buffer of one editor, analysed in the background a moment after typing stops'''
+
+    analysed = QtCore.pyqtSignal(object)
+
+    def __init__(self, editor, project_completions, delay=300):
+        super().__init__(editor)
+        self.editor = editor
+        self.project_completions = project_completions
+        self.trie = PrefixTrie()
+        self.revision = None  # Document revision the last analysis was started for
+        self.analysed.connect(self.set_trie)
+        self.analyse_timer = QtCore.QTimer(self)
+        self.analyse_timer.setSingleShot(True)
+        self.analyse_timer.setInterval(delay)
+        self.analyse_timer.timeout.connect(self.analyse)
+        self.editor.document().contentsChanged.connect(self.analyse_timer.start)
+        self.analyse()
+
+    def analyse(self):
+        revision = self.editor.document().revision()
+        if revision == self.revision:
+            return
+        self.revision = revision
+        source = self.editor.toPlainText()
+        self.project_completions.submit(lambda: buffer_trie(source), self.analysed)
+
+    def set_trie(self, trie):
+        self.trie = trie
+
+    def complete(self, prefix):
+        return self.project_completions.complete(prefix, self.trie)
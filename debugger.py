@@ -0,0 +1,143 @@
+from PyQt5 import QtWidgets, QtCore
+from widgets import TitledDockWidget, LauncherScriptThread
+import json
+import os
+
+
+class DebuggerDock(TitledDockWidget):
+    '''Controls a script running under the launcher's debugger and shows where it stopped'''
+
+    frame_activated = QtCore.pyqtSignal(str, int)
+    execution_moved = QtCore.pyqtSignal(str, int)
+
+    def __init__(self, parent=None):
+        super().__init__('Debugger', parent)
+        self.script_thread = None
+        self.paused = False
+        self.stack = []
+
+        container = QtWidgets.QWidget(self)
+        layout = QtWidgets.QVBoxLayout(container)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(0)
+
+        self.tool_bar = QtWidgets.QWidget(container)
+        self.tool_bar.setObjectName('console_toolbar')
+        tool_layout = QtWidgets.QHBoxLayout(self.tool_bar)
+        tool_layout.setContentsMargins(5, 2, 5, 2)
+        self.status_label = QtWidgets.QLabel('Not Running', self.tool_bar)
+        self.status_label.setObjectName('console_status')
+        tool_layout.addWidget(self.status_label)
+        tool_layout.addStretch()
+        self.step_buttons = []
+        for text, command in (('Continue', 'continue'), ('Step Over', 'step_over'),
+                              ('Step Into', 'step_into'), ('Step Out', 'step_out')):
+            button = QtWidgets.QPushButton(text, self.tool_bar)
+            button.setObjectName('console_button')
+            button.setEnabled(False)
+            button.clicked.connect(lambda checked, command=command: self.send_command(command))
+            tool_layout.addWidget(button)
+            self.step_buttons.append(button)
+        self.stop_button = QtWidgets.QPushButton('Stop', self.tool_bar)
+        self.stop_button.setObjectName('console_button')
+        self.stop_button.setEnabled(False)
+        self.stop_button.clicked.connect(self.stop)
+        tool_layout.addWidget(self.stop_button)
+        layout.addWidget(self.tool_bar)
+
+        splitter = QtWidgets.QSplitter(QtCore.Qt.Horizontal, container)
+        self.stack_tree = QtWidgets.QTreeWidget(splitter)
+        self.stack_tree.setObjectName('hotspots')
+        self.stack_tree.setHeaderLabels(['Frame', 'Location'])
+        self.stack_tree.setRootIsDecorated(False)
+        self.stack_tree.currentItemChanged.connect(self.frame_selected)
+        self.stack_tree.itemDoubleClicked.connect(self.open_frame)
+        self.locals_tree = QtWidgets.QTreeWidget(splitter)
+        self.locals_tree.setObjectName('hotspots')
+        self.locals_tree.setHeaderLabels(['Name', 'Type', 'Value'])
+        self.locals_tree.setRootIsDecorated(False)
+        self.locals_tree.header().setSectionResizeMode(2, QtWidgets.QHeaderView.Stretch)
+        layout.addWidget(splitter)
+
+        self.setWidget(container)
+
+    @property
+    def running(self):
+        return self.script_thread is not None and not self.script_thread.exited.is_set()
+
+    def debug(self, file, breakpoints, use_pty=False, configuration=None):
+        '''Creates the run for a file; breakpoints maps paths to their line numbers'''
+        self.script_thread = LauncherScriptThread(file, 'debug', use_pty, configuration, root=os.getcwd(),
+                                                  breakpoints=json.dumps(breakpoints))
+        self.script_thread.message.connect(self.debug_message)
+        self.script_thread.process_started.connect(lambda pid: self.set_paused(False, 'Running'))
+        self.script_thread.process_finished.connect(self.finished)
+        self.stop_button.setEnabled(True)
+        self.set_paused(False, 'Starting')
+        self.show()
+        return self.script_thread
+
+    def set_breakpoints(self, path, lines):
+        if self.running:
+            self.script_thread.send('breakpoints', file=os.path.abspath(path), lines=lines)
+
+    def send_command(self, command):
+        if self.running and self.paused:
+            self.script_thread.send(command)
+            self.set_paused(False, 'Running')
+
+    def stop(self):
+        if self.running:
+            self.script_thread.stop()
+
+    def set_paused(self, paused, status):
+        self.paused = paused
+        self.status_label.setText(status)
+        for button in self.step_buttons:
+            button.setEnabled(paused)
+        if not paused:
+            self.stack = []
+            self.stack_tree.clear()
+            self.locals_tree.clear()
+            self.execution_moved.emit('', 0)
+
+    def debug_message(self, message):
+        if message['type'] == 'paused':
+            self.show_stack(message['stack'])
+            top = message['stack'][0] if message['stack'] else None
+            location = f" at {os.path.basename(top['file'])}:{top['line']}" if top else ''
+            self.set_paused(True, f"Paused{location} ({message['reason']}, {message['thread']})")
+            self.raise_()
+        elif message['type'] == 'resumed':
+            self.set_paused(False, 'Running')
+
+    def show_stack(self, stack):
+        self.stack = stack
+        self.stack_tree.clear()
+        for frame in stack:
+            item = QtWidgets.QTreeWidgetItem([frame['name'], f"{os.path.basename(frame['file'])}:{frame['line']}"])
+            item.setToolTip(1, frame['file'])
+            self.stack_tree.addTopLevelItem(item)
+        if stack:
+            self.stack_tree.setCurrentItem(self.stack_tree.topLevelItem(0))
+
+    def frame_selected(self, item, previous):
+        self.locals_tree.clear()
+        if item is None:
+            return
+        frame = self.stack[self.stack_tree.indexOfTopLevelItem(item)]
+        for name, type_name, value in frame['locals']:
+            variable = QtWidgets.QTreeWidgetItem([name, type_name, value])
+            variable.setToolTip(2, value)
+            self.locals_tree.addTopLevelItem(variable)
+        self.open_frame(item)
+
+    def open_frame(self, item, column=0):
+        frame = self.stack[self.stack_tree.indexOfTopLevelItem(item)]
+        if os.path.isfile(frame['file']):
+            self.frame_activated.emit(frame['file'], frame['line'])
+            self.execution_moved.emit(frame['file'], frame['line'])
+
+    def finished(self, exit_code, time_taken):
+        self.stop_button.setEnabled(False)
+        self.set_paused(False, f'Finished ({exit_code})')
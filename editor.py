@@ -1,5 +1,28 @@
-from widgets import PythonCodeEditor, CodeTabWidget, ProjectStructureDock, RunConsoleDock
+from widgets import PythonCodeEditor, CodeTabWidget, ProjectStructureDock, RunConsoleDock, LauncherScriptThread, LiveChart, \
+    RunHistoryDock, QuickOpenEntry, QuickOpenList, QuickOpenSearch
+from profiling import FlameGraphDock, HotspotDock, MemorySitesDock, ProfileStats
+from accounting import format_bytes
+from benchmark import BenchmarkDock
+from repl import KernelConsoleDock
+from debugger import DebuggerDock
+from testing import TestRunnerDock
+from linecoverage import CoverageMap
+from runconfig import RunConfigurationDialog, load_configurations, save_configurations
+from ignores import default_excludes
+from fileindex import ProjectIndex
+from fuzzy import PathMatcher
+from search import FindInFilesDock
+from symbols import ProjectSymbols
+from completion import ProjectCompletions
+from navigation import UsagesDock
+from outline import OutlineDock
+from watcher import FileWatcher
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from PyQt5 import QtWidgets, QtCore, QtGui
+import multiprocessing
+import textwrap
+import json
+import widgets
 import syntax
 import sys
 import os
@@ -10,6 +33,11 @@ class PyFlame(QtWidgets.QMainWindow):
         super().__init__()
         self.modal_dialog = None
         self.settings = settings
+        self.line_timings = {}
+        self.error_lines = {}
+        self.coverage = CoverageMap()
+        self.run_configurations = load_configurations(self.settings)
+        self.cell_sources = {}
 
         # Colours
         self.primary_colour = QtGui.QColor(primary_colour)
@@ -26,14 +54,87 @@ class PyFlame(QtWidgets.QMainWindow):
 
         # Project Folder Area
         os.chdir(self.settings.value('last_project_dir', os.getcwd()))
-        self.project_structure = ProjectStructureDock(self)
+        self.project_structure = ProjectStructureDock(self, self.project_excludes)
         self.addDockWidget(QtCore.Qt.LeftDockWidgetArea, self.project_structure)
         self.project_structure.file_opened.connect(self.new_editor_tab)
         self.project_structure.reload_directory()
+        self.outline = OutlineDock(self.tab_widget, self)
+        self.addDockWidget(QtCore.Qt.LeftDockWidgetArea, self.outline)
+        self.outline.hide()
+        index_directory = os.path.join(
+            QtCore.QStandardPaths.writableLocation(QtCore.QStandardPaths.AppLocalDataLocation), 'indexes')
+        self.project_index = ProjectIndex(index_directory, self)
+        self.path_matcher = None
+        self.quick_open_executor = ThreadPoolExecutor(1)
+        self.project_index.ready.connect(self.forget_path_matcher)
+        self.project_index.files_changed.connect(self.forget_path_matcher)
+        self.project_index.open(os.getcwd(), self.project_excludes)
+        # Shared by the background indexes; spawned as forking with Qt's threads running is not safe
+        self.index_executor = ProcessPoolExecutor(max(1, (os.cpu_count() or 1) // 2),
+                                                  multiprocessing.get_context('spawn'))
+        self.project_symbols = ProjectSymbols(self.project_index, self.index_executor,
+                                              os.path.join(index_directory, 'symbols.sqlite3'), self)
+        self.project_completions = ProjectCompletions(self.project_symbols, self)
+        self.file_watcher = FileWatcher(self.tab_widget, self.project_index, self.project_structure, self)
+        self.tab_widget.set_completions(self.project_completions)
 
         # Run Console Area
-        self.run_console = RunConsoleDock(self)
+        self.run_console = RunConsoleDock(self, max_workers=int(self.settings.value('max_concurrent_runs', 4)))
         self.addDockWidget(QtCore.Qt.LeftDockWidgetArea, self.run_console)
+        self.run_history = RunHistoryDock(self.settings, self, int(self.settings.value('run_history_size', 10)))
+        self.addDockWidget(QtCore.Qt.BottomDockWidgetArea, self.run_history)
+        self.run_console.run_manager.run_finished.connect(self.run_history.record)
+        self.run_console.location_activated.connect(self.open_location)
+        self.run_console.traceback_found.connect(self.mark_traceback)
+        self.tab_widget.currentChanged.connect(lambda index: self.run_history.show_file(self.code_widget_path))
+        self.run_history.show_file(self.code_widget_path)
+        self.run_history.hide()
+
+        # Profiler Area
+        self.flame_graph = FlameGraphDock(self)
+        self.flame_graph.frame_activated.connect(self.open_location)
+        self.addDockWidget(QtCore.Qt.BottomDockWidgetArea, self.flame_graph)
+        self.flame_graph.hide()
+        self.hotspots = HotspotDock(self)
+        self.hotspots.frame_activated.connect(self.open_location)
+        self.addDockWidget(QtCore.Qt.BottomDockWidgetArea, self.hotspots)
+        self.hotspots.hide()
+        self.memory_sites = MemorySitesDock(self)
+        self.memory_sites.frame_activated.connect(self.open_location)
+        self.addDockWidget(QtCore.Qt.BottomDockWidgetArea, self.memory_sites)
+        self.memory_sites.hide()
+        self.benchmark_dock = BenchmarkDock(self.settings, self)
+        self.addDockWidget(QtCore.Qt.BottomDockWidgetArea, self.benchmark_dock)
+        self.benchmark_dock.hide()
+        self.debugger = DebuggerDock(self)
+        self.debugger.frame_activated.connect(self.open_location)
+        self.debugger.execution_moved.connect(self.show_execution_line)
+        self.addDockWidget(QtCore.Qt.BottomDockWidgetArea, self.debugger)
+        self.debugger.hide()
+        self.tab_widget.breakpoints_changed.connect(self.debugger.set_breakpoints)
+        self.test_runner = TestRunnerDock(self.settings, self, self.project_excludes)
+        self.test_runner.frame_activated.connect(self.open_location)
+        self.addDockWidget(QtCore.Qt.BottomDockWidgetArea, self.test_runner)
+        self.test_runner.hide()
+        self.find_in_files = FindInFilesDock(self.project_index, self.index_executor, self,
+                                             int(self.settings.value('search_workers', 0)),
+                                             self.settings.value('trigram_index', 'true') == 'true')
+        self.find_in_files.frame_activated.connect(self.open_location)
+        self.addDockWidget(QtCore.Qt.BottomDockWidgetArea, self.find_in_files)
+        self.find_in_files.hide()
+        self.usages = UsagesDock(self)
+        self.usages.frame_activated.connect(self.open_location)
+        self.addDockWidget(QtCore.Qt.BottomDockWidgetArea, self.usages)
+        self.usages.hide()
+        self.tab_widget.definition_requested.connect(self.show_definition)
+        self.tab_widget.usages_requested.connect(self.show_usages)
+
+        # Python Console Area
+        self.kernel_console = KernelConsoleDock(self)
+        self.kernel_console.kernel_reset.connect(self.cell_sources.clear)
+        self.addDockWidget(QtCore.Qt.BottomDockWidgetArea, self.kernel_console)
+        self.kernel_console.hide()
+        self.apply_run_configuration()
 
         # Other
         self.setCentralWidget(self.tab_widget)
@@ -55,8 +156,26 @@ class PyFlame(QtWidgets.QMainWindow):
         self.settings.setValue('window_maximised', self.isMaximized())
         self.settings.setValue('last_project_dir', os.getcwd())
         self.settings.setValue('last_open_files', list(self.tab_widget.open_editors.keys()))
+        self.run_console.stop_all()
+        self.test_runner.stop()
+        self.project_structure.stop()
+        self.outline.shutdown()
+        self.find_in_files.shutdown()
+        self.project_symbols.stop()
+        self.project_completions.shutdown()
+        self.index_executor.shutdown(wait=False)
+        self.quick_open_executor.shutdown(wait=False)
+        self.project_index.close()
+        self.kernel_console.kernel.shutdown()
         event.accept()
 
+    @property
+    def project_excludes(self):
+        try:
+            return json.loads(self.settings.value('project_excludes', json.dumps(default_excludes)))
+        except ValueError:
+            return default_excludes
+
     @property
     def code_widget(self):
         if not self.tab_widget.welcome_tab:
@@ -82,6 +201,7 @@ class PyFlame(QtWidgets.QMainWindow):
                 ('New...', 'Ctrl+N', self.new_file),
                 ('Open', 'Ctrl+O', self.open_file),
                 ('Open Folder', None, self.open_folder),
+                ('Go to File...', 'Ctrl+P', self.quick_open),
                 ('Save', 'Ctrl+S', self.save_file),
                 ('Save As...', None, self.save_as),
                 (None, None, None),
@@ -99,25 +219,76 @@ class PyFlame(QtWidgets.QMainWindow):
                 ('Copy', 'Ctrl+C', self.copy),
                 ('Paste', 'Ctrl+V', self.paste),
                 (None, None, None),
-                ('Style Code with PEP-8', 'Shift+Alt+F', self.style_code)
+                ('Style Code with PEP-8', 'Shift+Alt+F', self.style_code),
+                (None, None, None),
+                ('Find in Files', 'Ctrl+Shift+F', self.find_in_project),
+                (None, None, None),
+                ('Go to Definition', 'F12', self.go_to_definition),
+                ('Find Usages', 'Shift+F12', self.find_usages),
             ),
             'View': (
-
+                ('Outline', None, self.show_outline),
+                ('Python Console', None, self.show_kernel_console),
+                ('Run History', None, self.show_run_history),
+                ('Tests', None, self.show_test_runner),
+                (None, None, None),
+                ('Clear Line Heat Map', None, self.clear_line_heat),
+                ('Clear Error Markers', None, self.clear_error_lines),
+                ('Clear Coverage', None, self.clear_coverage),
             ),
             'Run': (
                 ('Execute Current File', 'F5', self.run_code),
+                ('Run in Terminal Mode', None, self.toggle_terminal_mode),
+                ('Profile Current File', 'Ctrl+F5', self.profile_code),
+                ('Run with cProfile', 'Ctrl+Shift+F5', self.cprofile_code),
+                ('Profile Lines of Current File', 'Ctrl+Alt+F5', self.line_profile_code),
+                ('Run with Memory Tracking', None, self.memory_profile_code),
+                ('Run with Coverage', 'Ctrl+Alt+C', self.coverage_code),
+                (None, None, None),
+                ('Benchmark Current File', 'Ctrl+B', self.benchmark_code),
+                (None, None, None),
+                ('Debug Current File', 'Shift+F9', self.debug_code),
+                ('Toggle Breakpoint', 'Ctrl+F8', self.toggle_breakpoint),
+                ('Continue', 'F8', lambda: self.debugger.send_command('continue')),
+                ('Step Over', 'F10', lambda: self.debugger.send_command('step_over')),
+                ('Step Into', 'F11', lambda: self.debugger.send_command('step_into')),
+                ('Step Out', 'Shift+F11', lambda: self.debugger.send_command('step_out')),
+                (None, None, None),
+                ('Run All Tests', 'Ctrl+Shift+T', self.test_runner.run_all),
+                ('Run Affected Tests', 'Ctrl+Alt+T', self.test_runner.run_affected),
+                (None, None, None),
+                ('Run Selection in Console', 'Alt+Shift+E', self.run_selection_in_kernel),
+                ('Run Cell', 'Ctrl+Return', self.run_cell),
+                ('Run Cell and Advance', 'Ctrl+Shift+Return', self.run_cell_and_advance),
+                ('Run Changed Cells', None, self.run_changed_cells),
+                ('Run File in Console', 'Alt+Shift+R', self.run_file_in_kernel),
+                ('Restart Console', None, self.restart_kernel),
             )
         }
+        self.menu_actions = {}
         for menu_name, menu_items in menu_structure.items():
             menu = self.menuBar().addMenu(menu_name)
             for item_name, shortcut, callback in menu_items:
                 if item_name and shortcut:
-                    menu.addAction(item_name, callback, shortcut)
+                    self.menu_actions[item_name] = menu.addAction(item_name, callback, shortcut)
                 elif item_name:
-                    menu.addAction(item_name, callback)
+                    self.menu_actions[item_name] = menu.addAction(item_name, callback)
                 else:
                     menu.addSeparator()
 
+        terminal_action = self.menu_actions['Run in Terminal Mode']
+        terminal_action.setCheckable(True)
+        terminal_action.setChecked(self.use_pty)
+        terminal_action.setEnabled(widgets.pty is not None)
+
+        run_menu = terminal_action.parentWidget()
+        self.configuration_menu = QtWidgets.QMenu('Run Configuration', self)
+        self.configuration_menu.setToolTipsVisible(True)
+        run_menu.insertMenu(terminal_action, self.configuration_menu)
+        self.configuration_group = QtWidgets.QActionGroup(self)
+        self.configuration_group.triggered.connect(lambda action: self.select_run_configuration(action.text()))
+        self.build_configuration_menu()
+
     def resizeEvent(self, event):
         if self.modal_dialog:
             self.modal_dialog.move(self.rect().center().x() - self.modal_dialog.width() // 2,
@@ -126,10 +297,23 @@ class PyFlame(QtWidgets.QMainWindow):
     def new_editor_tab(self, path):
         widget = self.tab_widget.addTab(path)
         self.tab_widget.setCurrentWidget(widget)
+        if os.path.abspath(path) in self.line_timings:
+            widget.set_line_heat(self.line_timings[os.path.abspath(path)])
+        if os.path.abspath(path) in self.error_lines:
+            widget.set_error_lines(self.error_lines[os.path.abspath(path)])
+        widget.set_line_coverage(self.coverage.line_states(path))
+        return widget
 
     def close_editor_tab(self, tab_index):
         self.tab_widget.removeTab(tab_index)
 
+    def open_location(self, path, line):
+        if not os.path.isfile(path):
+            return
+        widget = self.tab_widget.find_editor(path) or self.new_editor_tab(path)
+        self.tab_widget.setCurrentWidget(widget)
+        widget.go_to_line(line)
+
     def keyPressEvent(self, event):
         if event.key() == QtCore.Qt.Key_Escape and self.modal_dialog:
             if self.modal_dialog.isVisible():
@@ -138,10 +322,268 @@ class PyFlame(QtWidgets.QMainWindow):
     def run_code(self):
         try:
             path = self.tab_widget.open_editors.inv[self.tab_widget.currentWidget()]
-            self.run_console.run_script(path)
+            self.run_console.run_script(path, self.use_pty, self.run_configuration)
         except KeyError:
             pass
 
+    @property
+    def use_pty(self):
+        return self.settings.value('run_in_terminal', 'false') == 'true'
+
+    def toggle_terminal_mode(self, checked):
+        self.settings.setValue('run_in_terminal', checked)
+
+    @property
+    def run_configuration(self):
+        name = self.settings.value('run_configuration', 'Default')
+        for configuration in self.run_configurations:
+            if configuration.name == name:
+                return configuration
+        return self.run_configurations[0]
+
+    def apply_run_configuration(self):
+        '''Points the console kernel and the test runner at the selected configuration'''
+        self.kernel_console.configuration = self.run_configuration
+        self.test_runner.configuration = self.run_configuration
+
+    def select_run_configuration(self, name):
+        self.settings.setValue('run_configuration', name)
+        self.apply_run_configuration()
+
+    def build_configuration_menu(self):
+        self.configuration_menu.clear()
+        for action in self.configuration_group.actions():
+            self.configuration_group.removeAction(action)
+        selected = self.run_configuration
+        for configuration in self.run_configurations:
+            action = self.configuration_menu.addAction(configuration.name)
+            action.setCheckable(True)
+            action.setChecked(configuration is selected)
+            action.setToolTip(configuration.describe())
+            self.configuration_group.addAction(action)
+        self.configuration_menu.addSeparator()
+        self.configuration_menu.addAction('Edit Run Configurations...', self.edit_run_configurations)
+
+    def edit_run_configurations(self):
+        dialog = RunConfigurationDialog(self.run_configurations, self)
+        if dialog.exec_() != QtWidgets.QDialog.Accepted:
+            return
+        self.run_configurations = dialog.configurations
+        save_configurations(self.settings, self.run_configurations)
+        self.build_configuration_menu()
+        self.apply_run_configuration()
+
+    def profile_code(self):
+        try:
+            path = self.tab_widget.open_editors.inv[self.tab_widget.currentWidget()]
+        except KeyError:
+            return
+        interval = 1 / max(int(self.settings.value('sampling_rate', 200)), 1)
+        script_thread = LauncherScriptThread(path, 'sample', self.use_pty, self.run_configuration, interval=interval)
+        script_thread.message.connect(self.profiler_message)
+        self.run_console.add_run(script_thread)
+
+    def cprofile_code(self):
+        try:
+            path = self.tab_widget.open_editors.inv[self.tab_widget.currentWidget()]
+        except KeyError:
+            return
+        script_thread = LauncherScriptThread(path, 'cprofile', self.use_pty, self.run_configuration)
+        script_thread.message.connect(self.profiler_message)
+        self.run_console.add_run(script_thread)
+
+    def line_profile_code(self):
+        try:
+            path = self.tab_widget.open_editors.inv[self.tab_widget.currentWidget()]
+        except KeyError:
+            return
+        script_thread = LauncherScriptThread(path, 'lines', self.use_pty, self.run_configuration, root=os.getcwd())
+        script_thread.message.connect(self.profiler_message)
+        self.run_console.add_run(script_thread)
+
+    def coverage_code(self):
+        try:
+            path = self.tab_widget.open_editors.inv[self.tab_widget.currentWidget()]
+        except KeyError:
+            return
+        script_thread = LauncherScriptThread(path, 'coverage', self.use_pty, self.run_configuration, root=os.getcwd())
+        script_thread.message.connect(self.profiler_message)
+        self.run_console.add_run(script_thread)
+
+    def memory_profile_code(self):
+        try:
+            path = self.tab_widget.open_editors.inv[self.tab_widget.currentWidget()]
+        except KeyError:
+            return
+        script_thread = LauncherScriptThread(path, 'memory', self.use_pty, self.run_configuration, interval=0.1)
+        script_thread.message.connect(self.profiler_message)
+        console_tab = self.run_console.add_run(script_thread)
+        memory_chart = LiveChart([('current', 0x61AFEF), ('peak', 0xE06C75)], format_bytes)
+        console_tab.add_panel(memory_chart)
+
+        def update_chart(message):
+            if message['type'] == 'memory':
+                memory_chart.add_point((message['current'], message['peak']))
+        script_thread.message.connect(update_chart)
+
+    def benchmark_code(self):
+        try:
+            path = self.tab_widget.open_editors.inv[self.tab_widget.currentWidget()]
+        except KeyError:
+            return
+        self.benchmark_dock.show()
+        self.benchmark_dock.raise_()
+        self.benchmark_dock.benchmark(path, self.run_configuration)
+
+    def debug_code(self):
+        try:
+            path = self.tab_widget.open_editors.inv[self.tab_widget.currentWidget()]
+        except KeyError:
+            return
+        if self.debugger.running:
+            return
+        breakpoints = {}
+        for editor_path, editor in self.tab_widget.open_editors.items():
+            lines = editor.breakpoint_lines()
+            if lines:
+                breakpoints[os.path.abspath(editor_path)] = lines
+        script_thread = self.debugger.debug(path, breakpoints, self.use_pty, self.run_configuration)
+        self.run_console.add_run(script_thread)
+
+    def toggle_breakpoint(self):
+        editor = self.tab_widget.currentWidget()
+        if editor in self.tab_widget.open_editors.inv:
+            editor.toggle_breakpoint(editor.textCursor().block())
+
+    def show_execution_line(self, file, line):
+        '''Points at the debugger's current line in its editor and clears it everywhere else'''
+        for path, editor in self.tab_widget.open_editors.items():
+            if file and os.path.abspath(path) == os.path.abspath(file):
+                editor.set_execution_line(line)
+            else:
+                editor.set_execution_line(0)
+
+    def show_kernel_console(self):
+        self.kernel_console.ensure_kernel()
+        self.kernel_console.input_box.setFocus()
+
+    def run_selection_in_kernel(self):
+        if self.code_widget is None:
+            return
+        cursor = self.code_widget.textCursor()
+        if cursor.hasSelection():
+            code = cursor.selectedText().replace('\u2029', '\n')
+        else:
+            code = cursor.block().text()
+        code = textwrap.dedent(code)
+        if code.strip():
+            self.kernel_console.execute(code, self.code_widget_path or '<kernel>')
+
+    def execute_cell(self, index, start, end):
+        path = self.code_widget_path or '<kernel>'
+        source = self.code_widget.cell_text(start, end)
+        self.cell_sources.setdefault(path, {})[index] = source
+        title = self.code_widget.cell_title(index, start)
+        # Pad with blank lines so tracebacks point at the right line of the file
+        self.kernel_console.execute('\n' * start + source, path, title, echo=f'--- {title} ---\n')
+
+    def run_cell(self):
+        if self.code_widget is None:
+            return
+        self.execute_cell(*self.code_widget.current_cell())
+
+    def run_cell_and_advance(self):
+        if self.code_widget is None:
+            return
+        index, start, end = self.code_widget.current_cell()
+        self.execute_cell(index, start, end)
+        self.code_widget.go_to_line(min(end + 2, self.code_widget.blockCount()))
+
+    def run_changed_cells(self):
+        '''Runs only the cells whose source differs from when they were last run'''
+        if self.code_widget is None:
+            return
+        last_sources = self.cell_sources.get(self.code_widget_path or '<kernel>', {})
+        for index, (start, end) in enumerate(self.code_widget.cells()):
+            if last_sources.get(index) != self.code_widget.cell_text(start, end):
+                self.execute_cell(index, start, end)
+
+    def run_file_in_kernel(self):
+        if self.code_widget_path:
+            self.save_file()
+            self.kernel_console.run_file(self.code_widget_path)
+
+    def restart_kernel(self):
+        self.kernel_console.restart()
+
+    def load_line_timings(self, lines):
+        self.line_timings = {}
+        for file, line, hits, seconds in lines:
+            self.line_timings.setdefault(os.path.abspath(file), {})[line] = (hits, seconds)
+        for path, editor in self.tab_widget.open_editors.items():
+            editor.set_line_heat(self.line_timings.get(os.path.abspath(path), {}))
+
+    def show_outline(self):
+        self.outline.show()
+        self.outline.raise_()
+
+    def show_test_runner(self):
+        self.test_runner.show()
+        self.test_runner.raise_()
+        if not self.test_runner.file_items:
+            self.test_runner.discover()
+
+    def show_run_history(self):
+        self.run_history.show_file(self.code_widget_path)
+        self.run_history.show()
+        self.run_history.raise_()
+
+    def clear_line_heat(self):
+        self.line_timings = {}
+        for editor in self.tab_widget.open_editors.values():
+            editor.clear_line_heat()
+
+    def show_coverage(self):
+        for path, editor in self.tab_widget.open_editors.items():
+            editor.set_line_coverage(self.coverage.line_states(path))
+        self.project_structure.set_coverage(self.coverage.totals(os.getcwd()))
+
+    def clear_coverage(self):
+        self.coverage.clear()
+        self.show_coverage()
+
+    def mark_traceback(self, frames, message):
+        '''Marks the frames of the latest traceback in the gutter, replacing the previous ones'''
+        self.error_lines = {}
+        for file, line in frames:
+            self.error_lines.setdefault(os.path.abspath(file), {})[line] = message
+        for path, editor in self.tab_widget.open_editors.items():
+            editor.set_error_lines(self.error_lines.get(os.path.abspath(path), {}))
+
+    def clear_error_lines(self):
+        self.error_lines = {}
+        for editor in self.tab_widget.open_editors.values():
+            editor.clear_error_lines()
+
+    def profiler_message(self, message):
+        if message['type'] == 'profile':
+            self.flame_graph.load_profile(message)
+            self.flame_graph.show()
+            self.flame_graph.raise_()
+        elif message['type'] == 'pstats':
+            self.hotspots.load_stats(ProfileStats.from_entries(message['entries']))
+            self.hotspots.show()
+            self.hotspots.raise_()
+        elif message['type'] == 'lines':
+            self.load_line_timings(message['lines'])
+        elif message['type'] == 'memory_sites':
+            self.memory_sites.load_sites(message['sites'])
+            self.memory_sites.show()
+            self.memory_sites.raise_()
+        elif message['type'] == 'coverage':
+            self.coverage.load(message['files'])
+            self.show_coverage()
+
     # FILE MENU FUNCTIONS
     def new_file(self):
         self.modal_dialog = QtWidgets.QWidget(self)
@@ -166,6 +608,48 @@ class PyFlame(QtWidgets.QMainWindow):
         self.modal_dialog.resize(self.width(), 75)
         self.modal_dialog.move(0, self.height() - self.modal_dialog.height())
 
+    def quick_open(self):
+        if self.path_matcher is None:
+            self.path_matcher = PathMatcher(self.project_index.paths(), os.getcwd())
+        matcher = self.path_matcher
+        self.modal_dialog = QtWidgets.QWidget(self)
+        self.modal_dialog.setObjectName('modal')
+        layout = QtWidgets.QVBoxLayout()
+        layout.setSpacing(8)
+
+        title_label = QtWidgets.QLabel('Go to File...')
+        title_label.setObjectName('header')
+        layout.addWidget(title_label)
+
+        results = QuickOpenList()
+        results.setObjectName('quick_open_results')
+        query_entry = QuickOpenEntry()
+        query_entry.setObjectName('dialog_entry')
+        query_entry.setPlaceholderText('Enter Part of a File Path')
+        search = QuickOpenSearch(matcher, self.quick_open_executor, self.modal_dialog)
+        search.matches_found.connect(results.show_matches)
+        query_entry.textChanged.connect(search.set_query)
+        query_entry.moved.connect(results.move_selection)
+        query_entry.returnPressed.connect(lambda: self.open_quick_open_result(results.selected_path()))
+        results.itemActivated.connect(lambda item: self.open_quick_open_result(results.selected_path()))
+        layout.addWidget(query_entry)
+        layout.addWidget(results)
+        search.match()
+
+        self.modal_dialog.setLayout(layout)
+        self.modal_dialog.show()
+        query_entry.setFocus()
+        self.modal_dialog.resize(self.width(), 320)
+        self.modal_dialog.move(0, self.height() - self.modal_dialog.height())
+
+    def open_quick_open_result(self, path):
+        if path and os.path.isfile(path):
+            self.tab_widget.setCurrentWidget(self.tab_widget.find_editor(path) or self.new_editor_tab(path))
+        self.modal_dialog.close()
+
+    def forget_path_matcher(self, *changes):
+        self.path_matcher = None
+
     def create_new_file(self, path):
         if os.path.exists(path):
             print('File Already Exists')
@@ -186,19 +670,39 @@ class PyFlame(QtWidgets.QMainWindow):
                 for _ in range(self.tab_widget.tabBar().count()):
                     self.tab_widget.removeTab(0)
             self.project_structure.reload_directory()
+            self.project_index.open(os.getcwd(), self.project_excludes)
         self.setWindowTitle(f'PyFlame [{os.getcwd()}]')
 
     def save_file(self):
         if self.code_widget_path:
+            if self.code_widget.changed_on_disk:
+                answer = QtWidgets.QMessageBox.question(
+                    self, 'File Changed', f'{os.path.basename(self.code_widget_path)} changed on disk since it was '
+                                          'opened. Overwrite the changes?')
+                if answer != QtWidgets.QMessageBox.Yes:
+                    return
             with open(self.code_widget_path, 'w') as file:
                 file.write(self.code_widget.toPlainText())
+            self.code_widget.mark_saved(self.code_widget_path)
+            self.project_structure.refresh(os.path.dirname(os.path.abspath(self.code_widget_path)))
+            self.project_index.update([self.code_widget_path])
 
     def save_as(self):
+        if self.code_widget is None:
+            return
         filename, filetype = QtWidgets.QFileDialog.getSaveFileName(self)
-        if filename:
-            with open(filename, 'w') as file:
-                file.write(self.code_widget.toPlainText())
-            self.tab_widget.open_editors[self.code_widget] = filename
+        if not filename:
+            return
+        if self.tab_widget.find_editor(filename) not in (None, self.code_widget):
+            QtWidgets.QMessageBox.warning(self, 'Save As', f'{os.path.basename(filename)} is open in another tab. '
+                                                           'Close that tab first.')
+            return
+        with open(filename, 'w') as file:
+            file.write(self.code_widget.toPlainText())
+        self.tab_widget.rename_file(self.code_widget, filename)
+        self.code_widget.mark_saved(filename)
+        self.project_structure.refresh(os.path.dirname(os.path.abspath(filename)))
+        self.project_index.update([filename])
 
     def open_settings(self):
         pass
@@ -231,4 +735,30 @@ class PyFlame(QtWidgets.QMainWindow):
     def style_code(self):
         self.code_widget.autopep8_code()
 
+    def find_in_project(self):
+        selection = self.code_widget.textCursor().selectedText() if self.code_widget is not None else ''
+        self.find_in_files.start_search(selection if '\u2029' not in selection else '')
+
+    def go_to_definition(self):
+        if self.code_widget is not None:
+            self.code_widget.go_to_definition()
+
+    def find_usages(self):
+        if self.code_widget is not None:
+            self.code_widget.find_usages()
+
+    def show_definition(self, path, name, line, attribute):
+        '''Opens the definition of a name used at a line, or lists the definitions it could be'''
+        definitions, resolved = self.project_symbols.index.find_definitions(name, os.path.abspath(path), line,
+                                                                             attribute)
+        if resolved:
+            path, symbol = definitions[0]
+            self.open_location(path, symbol.line if symbol is not None else 1)
+        else:
+            self.usages.show_locations(f'Definitions of {name}',
+                                       [(path, symbol.line, symbol.column) for path, symbol in definitions])
+
+    def show_usages(self, name):
+        self.usages.show_locations(f'Usages of {name}', self.project_symbols.index.usages(name))
+
 
@@ -0,0 +1,236 @@
+from PyQt5 import QtCore
+from ignores import IgnoreRules
+import threading
+import hashlib
+import sqlite3
+import os
+
+schema_version = 1
+
+
+def database_path(directory, root):
+    '''Where the index of a project root is kept, one database per root'''
+    name = hashlib.sha1(os.path.abspath(root).encode()).hexdigest()[:16]
+    return os.path.join(directory, f'{name}.sqlite3')
+
+
+def content_hash(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FileIndex:
+    '''Path, size, mtime and content hash of every project file, kept in SQLite between sessions'''
+
+    def __init__(self, database, root, excludes=None):
+        self.root = os.path.abspath(root)
+        self.rules = IgnoreRules(self.root, excludes)
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(database)), exist_ok=True)
+        self.connection = sqlite3.connect(database, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        if self.connection.execute('PRAGMA user_version').fetchone()[0] != schema_version:
+            self.connection.executescript(f'''
+                DROP TABLE IF EXISTS files;
+                CREATE TABLE files (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, hash TEXT);
+                PRAGMA user_version = {schema_version};
+            ''')
+        self.files = {path: (size, mtime_ns, digest) for path, size, mtime_ns, digest
+                      in self.connection.execute('SELECT path, size, mtime_ns, hash FROM files')}
+
+    def paths(self):
+        with self.lock:
+            return list(self.files)
+
+    def file_hash(self, path):
+        entry = self.files.get(os.path.abspath(path))
+        return entry[2] if entry is not None else None
+
+    def scan(self):
+        '''{path: (size, mtime_ns)} of the files on disk, leaving out ignored ones'''
+        found = {}
+        for directory, directories, files in self.rules.walk():
+            for entry in files:
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                found[entry.path] = (stat.st_size, stat.st_mtime_ns)
+        return found
+
+    def refresh(self, cancelled=lambda: False):
+        '''Brings the index up to date with the disk, hashing only files whose size or mtime changed
+
+        Returns the paths added or changed and the paths removed.
+        '''
+        found = self.scan()
+        with self.lock:
+            files = dict(self.files)
+        changed = [path for path, stat in found.items() if path not in files or files[path][:2] != stat]
+        removed = [path for path in files if path not in found]
+        updates = []
+        for path in changed:
+            if cancelled():
+                break
+            try:
+                updates.append((path, *found[path], content_hash(path)))
+            except OSError:
+                removed.append(path)
+        self.store(updates, removed)
+        return [update[0] for update in updates], removed
+
+    def indexed(self, path):
+        '''Whether a path is under the root with neither it nor any directory above it ignored'''
+        if not path.startswith(os.path.join(self.root, '')):
+            return False
+        directory = os.path.dirname(path)
+        while directory != self.root:
+            if self.rules.ignored(directory, True):
+                return False
+            directory = os.path.dirname(directory)
+        return not self.rules.ignored(path, False)
+
+    def update(self, paths):
+        '''Refreshes the entries of specific paths, after they were saved or changed on disk'''
+        updates, removed = [], []
+        for path in map(os.path.abspath, paths):
+            try:
+                stat = os.stat(path)
+                if not self.indexed(path) or not os.path.isfile(path):
+                    raise FileNotFoundError(path)
+                entry = self.files.get(path)
+                if entry is None or entry[:2] != (stat.st_size, stat.st_mtime_ns):
+                    updates.append((path, stat.st_size, stat.st_mtime_ns, content_hash(path)))
+            except OSError:
+                if path in self.files:
+                    removed.append(path)
+        self.store(updates, removed)
+        return [update[0] for update in updates], removed
+
+    def update_directories(self, directories):
+        '''Refreshes the entries in directories whose listing changed on disk
+
+        Files the index holds in them are checked again, and so are files under subdirectories
+        that have gone. Subdirectories the index holds nothing in are walked, as they are new.
+        '''
+        prefix = os.path.join(self.root, '')
+        directories = {directory for directory in map(os.path.abspath, directories)
+                       if directory == self.root or directory.startswith(prefix)}
+        with self.lock:
+            known = list(self.files)
+        known_directories = {os.path.dirname(path) for path in known}
+        prefixes = tuple(os.path.join(directory, '') for directory in directories)
+        exists = {}
+        paths = set()
+        for path in known:
+            parent = os.path.dirname(path)
+            if parent in directories:
+                paths.add(path)
+            elif path.startswith(prefixes):
+                if parent not in exists:
+                    exists[parent] = os.path.isdir(parent)
+                if not exists[parent]:
+                    paths.add(path)
+        for directory in directories:
+            if os.path.isfile(os.path.join(directory, '.gitignore')):
+                self.rules.forget(directory)
+            if directory != self.root and self.rules.ignored(directory, True):
+                continue
+            for walked, subdirectories, files in self.rules.walk(directory):
+                paths.update(entry.path for entry in files)
+                subdirectories[:] = [entry for entry in subdirectories if entry.path not in known_directories]
+        return self.update(paths)
+
+    def store(self, updates, removed):
+        with self.lock:
+            for path, size, mtime_ns, digest in updates:
+                self.files[path] = (size, mtime_ns, digest)
+            for path in removed:
+                self.files.pop(path, None)
+            with self.connection:
+                self.connection.executemany('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)', updates)
+                self.connection.executemany('DELETE FROM files WHERE path = ?', [(path,) for path in removed])
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+class FileIndexThread(QtCore.QThread):
+    '''Refreshes a file index in the background'''
+
+    files_changed = QtCore.pyqtSignal(list, list)
+
+    def __init__(self, file_index, paths=None, directories=None):
+        super().__init__()
+        self.file_index = file_index
+        self.paths = paths
+        self.directories = directories
+        self.cancelled = False
+
+    def run(self):
+        if self.directories is not None:
+            changed, removed = self.file_index.update_directories(self.directories)
+        elif self.paths is None:
+            changed, removed = self.file_index.refresh(lambda: self.cancelled)
+        else:
+            changed, removed = self.file_index.update(self.paths)
+        if changed or removed:
+            self.files_changed.emit(changed, removed)
+
+    def stop(self):
+        self.cancelled = True
+        self.wait()
+
+
+class ProjectIndex(QtCore.QObject):
+    '''The file index of the open project, which other project wide features start from'''
+
+    files_changed = QtCore.pyqtSignal(list, list)
+    ready = QtCore.pyqtSignal()
+
+    def __init__(self, directory, parent=None):
+        super().__init__(parent)
+        self.directory = directory
+        self.file_index = None
+        self.threads = []
+
+    @property
+    def root(self):
+        return self.file_index.root if self.file_index is not None else None
+
+    def paths(self):
+        return self.file_index.paths() if self.file_index is not None else []
+
+    def open(self, root, excludes=None):
+        '''Loads the saved index of a root at once, then catches up with the disk in the background'''
+        self.close()
+        self.file_index = FileIndex(database_path(self.directory, root), root, excludes)
+        self.ready.emit()
+        self.refresh()
+
+    def refresh(self, paths=None, directories=None):
+        if self.file_index is None:
+            return
+        thread = FileIndexThread(self.file_index, paths, directories)
+        thread.files_changed.connect(self.files_changed)
+        thread.finished.connect(lambda: self.threads.remove(thread) if thread in self.threads else None)
+        self.threads.append(thread)
+        thread.start()
+
+    def update(self, paths):
+        self.refresh(list(paths))
+
+    def update_directories(self, directories):
+        self.refresh(directories=list(directories))
+
+    def close(self):
+        for thread in list(self.threads):
+            thread.stop()
+        self.threads = []
+        if self.file_index is not None:
+            self.file_index.close()
+            self.file_index = None
@@ -0,0 +1,102 @@
+'''Fuzzy matching of project paths for quick open'''
+import heapq
+import re
+import os
+
+# Characters that start a word: the first one, any after a separator and upper case after lower case
+word_start_expression = re.compile(r'(?:^|(?<=[/_\-. ]))[^/_\-. ]|(?<=[a-z])[A-Z]')
+
+
+class PathEntry:
+
+    __slots__ = ('path', 'relative', 'lowered', 'name', 'name_start', 'starts')
+
+    def __init__(self, path, relative):
+        self.path = path
+        self.relative = relative
+        self.lowered = relative.lower()
+        self.name_start = relative.rfind('/') + 1
+        self.name = self.lowered[self.name_start:]
+        self.starts = None  # Word starts, worked out the first time the entry is scored
+
+
+class PathMatcher:
+    '''Ranks the paths of a project against a query whose characters appear in order in the path
+
+    The lowered paths are prepared once, and a query that extends the previous one only looks
+    through the previous query's matches, so typing narrows down a shrinking list.
+    '''
+
+    def __init__(self, paths, root, limit=1000):
+        prefix = os.path.join(os.path.abspath(root), '')
+        self.entries = []
+        for path in paths:
+            relative = path[len(prefix):] if path.startswith(prefix) else os.path.relpath(path, root)
+            self.entries.append(PathEntry(path, relative.replace(os.sep, '/')))
+        # Shortest first, so any slice of the matches holds the shortest of them
+        self.entries.sort(key=lambda entry: len(entry.relative))
+        self.limit = limit
+        self.last_query = None
+        self.last_matches = self.entries
+
+    def candidates(self, query):
+        pool = self.last_matches if self.last_query is not None and query.startswith(self.last_query) else self.entries
+        # a[^b]*b[^c]*c finds the characters in order without backtracking
+        expression = re.compile(re.escape(query[0]) + ''.join(
+            f'[^{re.escape(character)}]*{re.escape(character)}' for character in query[1:]))
+        matches = [entry for entry in pool if expression.search(entry.lowered)]
+        self.last_query = query
+        self.last_matches = matches
+        return matches
+
+    def score(self, query, entry):
+        '''Higher for matches in the file name, at word starts and in runs; None if the greedy match fails'''
+        if entry.starts is None:
+            entry.starts = {match.start() for match in word_start_expression.finditer(entry.relative)}
+        text = entry.lowered
+        index = text.rfind(query)
+        if index != -1:
+            positions = list(range(index, index + len(query)))
+        else:
+            # Match the end of the query against the file name when possible, the rest against the directories
+            position = len(text)
+            positions = []
+            for character in reversed(query):
+                position = text.rfind(character, 0, position)
+                if position == -1:
+                    return None, []
+                positions.append(position)
+            positions.reverse()
+        score = 0
+        previous = -2
+        for position in positions:
+            if position == previous + 1:
+                score += 4
+            if position in entry.starts:
+                score += 3
+            if position >= entry.name_start:
+                score += 2
+            previous = position
+        if text.startswith(query, entry.name_start):
+            score += 10
+        return score - len(text) / 100, positions
+
+    def match(self, query, count=50):
+        '''[(entry, positions)] of the best matches, best first'''
+        query = query.strip().lower().replace('\\', '/')
+        if not query:
+            self.last_query = None
+            self.last_matches = self.entries
+            return [(entry, []) for entry in self.entries[:count]]
+        matches = self.candidates(query)
+        if len(matches) > self.limit:
+            # Too many to score them all in time, so keep the shortest of those whose file name holds the query
+            named = [entry for entry in matches if query in entry.name][:self.limit]
+            others = [entry for entry in matches[:self.limit] if query not in entry.name]
+            matches = named + others[:self.limit - len(named)]
+        scored = []
+        for entry in matches:
+            score, positions = self.score(query, entry)
+            if score is not None:
+                scored.append((score, entry, positions))
+        return [(entry, positions) for score, entry, positions in heapq.nlargest(count, scored, key=lambda item: item[0])]
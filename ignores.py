@@ -0,0 +1,144 @@
+'''Decides which paths of a project are ignored, from .gitignore files and exclude globs
+
+Only depends on the standard library so background workers can use it too.
+'''
+import re
+import os
+
+default_excludes = ['.git', '.hg', '.svn', '__pycache__', '*.py[co]', '.tox', '.venv', 'venv', 'node_modules']
+
+
+def glob_expression(glob):
+    '''Regular expression for a gitignore style glob, where * and ? stay within a path component'''
+    expression = ''
+    index = 0
+    while index < len(glob):
+        character = glob[index]
+        if glob.startswith('**/', index):
+            expression += '(?:.*/)?'
+            index += 3
+            continue
+        if glob.startswith('**', index):
+            expression += '.*'
+            index += 2
+            continue
+        if character == '*':
+            expression += '[^/]*'
+        elif character == '?':
+            expression += '[^/]'
+        elif character == '[':
+            end = glob.find(']', index + 2)
+            if end == -1:
+                expression += re.escape(character)
+            else:
+                characters = glob[index + 1:end]
+                if characters.startswith('!'):
+                    characters = '^' + characters[1:]
+                expression += f'[{characters}]'
+                index = end
+        elif character == '\\' and index + 1 < len(glob):
+            index += 1
+            expression += re.escape(glob[index])
+        else:
+            expression += re.escape(character)
+        index += 1
+    return expression
+
+
+class IgnorePattern:
+    '''One line of a .gitignore, relative to the directory the file is in'''
+
+    def __init__(self, line, base):
+        self.prefix = os.path.join(base, '')
+        self.negated = line.startswith('!')
+        if self.negated:
+            line = line[1:]
+        self.directory_only = line.endswith('/')
+        line = line.rstrip('/')
+        # Patterns with a slash before their end are anchored to their directory
+        anchored = '/' in line
+        line = line.lstrip('/')
+        prefix = '' if anchored else '(?:.*/)?'
+        self.expression = re.compile(f'^{prefix}{glob_expression(line)}$')
+
+    def matches(self, path, is_directory):
+        if self.directory_only and not is_directory:
+            return False
+        if not path.startswith(self.prefix):
+            return False
+        relative = path[len(self.prefix):].replace(os.sep, '/')
+        return self.expression.match(relative) is not None
+
+
+def read_patterns(directory):
+    try:
+        with open(os.path.join(directory, '.gitignore'), encoding='utf-8', errors='replace') as file:
+            lines = file.read().splitlines()
+    except OSError:
+        return []
+    patterns = []
+    for line in lines:
+        if line.endswith(' ') and not line.endswith('\\ '):
+            line = line.rstrip(' ')
+        if line and not line.startswith('#'):
+            patterns.append(IgnorePattern(line, directory))
+    return patterns
+
+
+class IgnoreRules:
+    '''The .gitignore files from the root down to each directory, read once per directory, plus the user's excludes'''
+
+    def __init__(self, root, excludes=None):
+        self.root = os.path.abspath(root)
+        self.excludes = [IgnorePattern(glob, self.root)
+                         for glob in (default_excludes if excludes is None else excludes) if glob.strip()]
+        self.directory_patterns = {}
+
+    def patterns(self, directory):
+        '''Every .gitignore pattern that applies to the entries of a directory, outermost first'''
+        patterns = self.directory_patterns.get(directory)
+        if patterns is None:
+            parent = os.path.dirname(directory)
+            inherited = self.patterns(parent) if directory != self.root and parent != directory else []
+            patterns = self.directory_patterns[directory] = inherited + read_patterns(directory)
+        return patterns
+
+    def ignored(self, path, is_directory):
+        path = os.path.abspath(path)
+        for pattern in self.excludes:
+            if pattern.matches(path, is_directory):
+                return True
+        ignored = False
+        # The last matching pattern wins, so a later ! can bring a path back
+        for pattern in self.patterns(os.path.dirname(path)):
+            if pattern.negated == ignored and pattern.matches(path, is_directory):
+                ignored = not pattern.negated
+        return ignored
+
+    def forget(self, directory):
+        '''Drops the patterns read for a directory and below it, after a .gitignore changed'''
+        directory = os.path.abspath(directory)
+        for cached in list(self.directory_patterns):
+            if cached == directory or cached.startswith(os.path.join(directory, '')):
+                del self.directory_patterns[cached]
+
+    def walk(self, directory=None):
+        '''Yields (directory, directories, files) like os.walk without descending into ignored directories'''
+        stack = [directory or self.root]
+        while stack:
+            directory = stack.pop()
+            directories, files = [], []
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    is_directory = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    continue
+                if self.ignored(entry.path, is_directory):
+                    continue
+                (directories if is_directory else files).append(entry)
+            yield directory, directories, files
+            stack.extend(entry.path for entry in reversed(directories))
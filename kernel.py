@@ -0,0 +1,129 @@
+'''Long-lived interpreter that runs code sent by the IDE in one persistent namespace
+
+Like launcher.py this runs in the child process and only uses the standard library.
+
+    python kernel.py --port PORT [--cwd DIRECTORY]
+
+Requests are JSON lines with a type of 'execute' or 'run_file'. Output
+is streamed back while the code runs and every request ends with a
+'done' message carrying its execution time.
+'''
+import argparse
+import ast
+import os
+import sys
+import time
+import traceback
+from launcher import Channel
+
+
+class StreamWriter:
+    '''Replaces sys.stdout/sys.stderr so output is streamed to the IDE'''
+
+    def __init__(self, channel, name):
+        self.channel = channel
+        self.name = name
+        self.request_id = None
+
+    def write(self, text):
+        if text:
+            self.channel.send('stream', id=self.request_id, name=self.name, text=text)
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+    @property
+    def encoding(self):
+        return 'utf-8'
+
+
+class Kernel:
+    def __init__(self, channel):
+        self.channel = channel
+        self.namespace = {'__name__': '__main__', '__builtins__': __builtins__}
+        self.stdout = StreamWriter(channel, 'stdout')
+        self.stderr = StreamWriter(channel, 'stderr')
+
+    def compile_interactive(self, source, filename):
+        '''Compiles source so that a trailing expression is echoed, like the interactive prompt'''
+        tree = ast.parse(source, filename)
+        last_expression = None
+        if tree.body and isinstance(tree.body[-1], ast.Expr):
+            last_expression = ast.Expression(tree.body.pop().value)
+        body = compile(tree, filename, 'exec')
+        if last_expression is not None:
+            last_expression = compile(last_expression, filename, 'eval')
+        return body, last_expression
+
+    def execute(self, request_id, source, filename='<kernel>'):
+        self.stdout.request_id = self.stderr.request_id = request_id
+        error = False
+        start_time = time.perf_counter()
+        try:
+            body, last_expression = self.compile_interactive(source, filename)
+            exec(body, self.namespace)
+            if last_expression is not None:
+                value = eval(last_expression, self.namespace)
+                if value is not None:
+                    self.namespace['_'] = value
+                    self.channel.send('result', id=request_id, value=repr(value))
+        except SystemExit:
+            error = True
+            self.stderr.write('SystemExit ignored by the kernel\n')
+        except BaseException:
+            error = True
+            # Hide the kernel's own frame from the traceback
+            exc_type, exc_value, exc_traceback = sys.exc_info()
+            self.stderr.write(''.join(traceback.format_exception(exc_type, exc_value, exc_traceback.tb_next)))
+        time_taken = time.perf_counter() - start_time
+        self.channel.send('done', id=request_id, time=time_taken, error=error)
+
+    def run_file(self, request_id, path):
+        try:
+            with open(path, encoding='utf-8') as file:
+                source = file.read()
+        except OSError as error:
+            self.stderr.request_id = request_id
+            self.stderr.write(f'{error}\n')
+            return self.channel.send('done', id=request_id, time=0, error=True)
+        self.namespace['__file__'] = path
+        self.execute(request_id, source, path)
+
+    def serve(self):
+        sys.stdout, sys.stderr = self.stdout, self.stderr
+        self.channel.send('ready', pid=os.getpid(), version=sys.version)
+        while True:
+            try:
+                request = self.channel.receive()
+            except KeyboardInterrupt:
+                # Interrupting an idle kernel does nothing
+                continue
+            if request is None:
+                break
+            if request['type'] == 'execute':
+                self.execute(request['id'], request['code'], request.get('filename', '<kernel>'))
+            elif request['type'] == 'run_file':
+                self.run_file(request['id'], request['path'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='kernel.py')
+    parser.add_argument('--port', type=int, required=True)
+    parser.add_argument('--cwd', default=os.getcwd())
+    options = parser.parse_args(argv)
+
+    channel = Channel(options.port)
+    os.chdir(options.cwd)
+    sys.path[0] = options.cwd
+    try:
+        Kernel(channel).serve()
+    finally:
+        channel.close()
+
+
+if __name__ == '__main__':
+    main()
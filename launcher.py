@@ -0,0 +1,617 @@
+'''Runs a script on behalf of the IDE with an instrument attached
+
+This file is executed by the interpreter of the child process, so it must
+only depend on the standard library, and on linecoverage.py beside it,
+which is loaded by its path so a user module of the same name cannot
+shadow it.
+
+    python launcher.py --port PORT --mode MODE [options] script [args...]
+
+Results are sent back to the IDE as JSON lines over a local socket.
+'''
+import argparse
+import collections
+import cProfile
+import dis
+import importlib.util
+import json
+import os
+import pstats
+import queue
+import runpy
+import socket
+import sys
+import threading
+import time
+import tracemalloc
+
+LAUNCHER_FILE = os.path.abspath(__file__)
+
+
+def load_sibling(name):
+    '''Imports a module from the launcher's directory by path, without going through sys.path'''
+    spec = importlib.util.spec_from_file_location(f'_pyflame_{name}', os.path.join(os.path.dirname(LAUNCHER_FILE),
+                                                                                    f'{name}.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+linecoverage = load_sibling('linecoverage')
+
+
+class Channel:
+    '''Sends JSON messages back to the IDE over a local socket'''
+
+    def __init__(self, port=None):
+        self.lock = threading.Lock()
+        self.sock = None
+        self.reader = None
+        if port:
+            self.sock = socket.create_connection(('127.0.0.1', port))
+
+    def send(self, message_type, **data):
+        if self.sock is None:
+            return
+        data['type'] = message_type
+        message = (json.dumps(data) + '\n').encode()
+        with self.lock:
+            self.sock.sendall(message)
+
+    def receive(self):
+        '''Next JSON message sent by the IDE, or None once it has disconnected'''
+        if self.sock is None:
+            return None
+        if self.reader is None:
+            self.reader = self.sock.makefile('rb')
+        line = self.reader.readline()
+        if not line:
+            return None
+        return json.loads(line.decode())
+
+    def close(self):
+        if self.sock is not None:
+            # Wakes up a thread blocked in receive(), which holds the reader's lock
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+class Instrument:
+    '''Base class for everything the launcher can attach to a run'''
+
+    def __init__(self, channel, options):
+        self.channel = channel
+        self.options = options
+        self.script_globals = None  # The script's globals once it has finished, for stop() to look at
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+class StackSampler(Instrument):
+    '''Samples the Python stacks of every thread from a background thread'''
+
+    def __init__(self, channel, options):
+        super().__init__(channel, options)
+        self.interval = options.interval
+        self.counts = collections.Counter()
+        self.frame_keys = {}
+        self.ignored_files = {LAUNCHER_FILE, runpy.run_path.__code__.co_filename}
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.sample_loop, name='pyflame-sampler', daemon=True)
+        self.total_samples = 0
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        stacks = [[[list(frame) for frame in stack], count] for stack, count in self.counts.items()]
+        self.channel.send('profile', interval=self.interval, samples=self.total_samples, stacks=stacks)
+
+    def frame_key(self, code):
+        key = self.frame_keys.get(code)
+        if key is None:
+            key = self.frame_keys[code] = (code.co_name, code.co_filename, code.co_firstlineno)
+        return key
+
+    def sample_loop(self):
+        own_thread = threading.get_ident()
+        while not self.stopped.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    if code.co_filename in self.ignored_files:
+                        break
+                    stack.append(self.frame_key(code))
+                    frame = frame.f_back
+                if stack:
+                    stack.reverse()
+                    self.counts[tuple(stack)] += 1
+                    self.total_samples += 1
+
+
+class DeterministicProfiler(Instrument):
+    '''Profiles every call with cProfile and sends back the pstats table'''
+
+    def __init__(self, channel, options):
+        super().__init__(channel, options)
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+        stats = pstats.Stats(self.profile).stats
+        entries = []
+        for (file, line, name), (cc, nc, tt, ct, callers) in stats.items():
+            if file == LAUNCHER_FILE:
+                continue
+            caller_entries = [list(caller) + list(timings) for caller, timings in callers.items()]
+            entries.append([file, line, name, cc, nc, tt, ct, caller_entries])
+        self.channel.send('pstats', entries=entries)
+
+
+class LineTimer(Instrument):
+    '''Counts hits and time per line for files inside the project root
+
+    Uses sys.monitoring where available, which lets untracked lines be
+    disabled after their first event, and falls back to sys.settrace.
+    '''
+
+    def __init__(self, channel, options):
+        super().__init__(channel, options)
+        self.root = os.path.join(os.path.abspath(options.root or os.path.dirname(options.script)), '')
+        self.hits = collections.Counter()
+        self.times = collections.defaultdict(float)
+        self.last_lines = {}
+        self.tracked_files = {}
+        self.monitoring = getattr(sys, 'monitoring', None)
+
+    def is_tracked(self, filename):
+        tracked = self.tracked_files.get(filename)
+        if tracked is None:
+            path = os.path.abspath(filename)
+            tracked = (not filename.startswith('<') and path.startswith(self.root) and path != LAUNCHER_FILE)
+            self.tracked_files[filename] = tracked
+        return tracked
+
+    def record_line(self, filename, line):
+        now = time.perf_counter()
+        thread_id = threading.get_ident()
+        previous = self.last_lines.get(thread_id)
+        if previous is not None:
+            self.times[previous[0]] += now - previous[1]
+        key = (filename, line)
+        self.hits[key] += 1
+        self.last_lines[thread_id] = (key, now)
+
+    def monitor_line(self, code, line):
+        if not self.is_tracked(code.co_filename):
+            return self.monitoring.DISABLE
+        self.record_line(code.co_filename, line)
+
+    def trace_call(self, frame, event, arg):
+        if event == 'call' and self.is_tracked(frame.f_code.co_filename):
+            return self.trace_line
+
+    def trace_line(self, frame, event, arg):
+        if event == 'line':
+            self.record_line(frame.f_code.co_filename, frame.f_lineno)
+        return self.trace_line
+
+    def start(self):
+        if self.monitoring is not None:
+            tool_id = self.monitoring.PROFILER_ID
+            self.monitoring.use_tool_id(tool_id, 'pyflame')
+            self.monitoring.register_callback(tool_id, self.monitoring.events.LINE, self.monitor_line)
+            self.monitoring.set_events(tool_id, self.monitoring.events.LINE)
+        else:
+            threading.settrace(self.trace_call)
+            sys.settrace(self.trace_call)
+
+    def stop(self):
+        if self.monitoring is not None:
+            tool_id = self.monitoring.PROFILER_ID
+            self.monitoring.set_events(tool_id, 0)
+            self.monitoring.register_callback(tool_id, self.monitoring.events.LINE, None)
+            self.monitoring.free_tool_id(tool_id)
+        else:
+            sys.settrace(None)
+            threading.settrace(None)
+        # The last line of each thread ran until now
+        now = time.perf_counter()
+        for key, started in self.last_lines.values():
+            self.times[key] += now - started
+        lines = [[file, line, hits, self.times[file, line]] for (file, line), hits in self.hits.items()]
+        self.channel.send('lines', lines=lines)
+
+
+class MemoryTracker(Instrument):
+    '''Streams tracemalloc usage while the script runs and reports the top allocation sites'''
+
+    top_sites = 100
+
+    def __init__(self, channel, options):
+        super().__init__(channel, options)
+        self.interval = options.interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.sample_loop, name='pyflame-memory', daemon=True)
+
+    def start(self):
+        tracemalloc.start()
+        self.start_time = time.perf_counter()
+        self.thread.start()
+
+    def send_usage(self):
+        current, peak = tracemalloc.get_traced_memory()
+        self.channel.send('memory', time=time.perf_counter() - self.start_time, current=current, peak=peak)
+
+    def sample_loop(self):
+        while not self.stopped.wait(self.interval):
+            self.send_usage()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        self.send_usage()
+        # What the script's globals still refer to is alive in self.script_globals, so it is included
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, LAUNCHER_FILE),
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, runpy.run_path.__code__.co_filename),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+            tracemalloc.Filter(False, '<unknown>'),
+        ])
+        tracemalloc.stop()
+        sites = []
+        for statistic in snapshot.statistics('lineno')[:self.top_sites]:
+            frame = statistic.traceback[0]
+            sites.append([frame.filename, frame.lineno, statistic.size, statistic.count])
+        self.channel.send('memory_sites', sites=sites)
+
+
+class CoverageTracer(Instrument):
+    '''Records which lines of the files inside the project root run
+
+    With sys.monitoring every line disables itself after its first event,
+    so covered code costs one callback per line for the whole run.
+    '''
+
+    def __init__(self, channel, options):
+        super().__init__(channel, options)
+        self.root = os.path.join(os.path.abspath(options.root or os.path.dirname(options.script)), '')
+        self.executed = collections.defaultdict(set)
+        self.tracked_files = {}
+        self.monitoring = getattr(sys, 'monitoring', None)
+
+    def is_tracked(self, filename):
+        tracked = self.tracked_files.get(filename)
+        if tracked is None:
+            path = os.path.abspath(filename)
+            tracked = (not filename.startswith('<') and path.startswith(self.root) and path != LAUNCHER_FILE)
+            self.tracked_files[filename] = tracked
+        return tracked
+
+    def monitor_line(self, code, line):
+        if self.is_tracked(code.co_filename):
+            self.executed[code.co_filename].add(line)
+        return self.monitoring.DISABLE
+
+    def trace_call(self, frame, event, arg):
+        if event == 'call' and self.is_tracked(frame.f_code.co_filename):
+            return self.trace_line
+
+    def trace_line(self, frame, event, arg):
+        if event == 'line':
+            self.executed[frame.f_code.co_filename].add(frame.f_lineno)
+        return self.trace_line
+
+    def start(self):
+        if self.monitoring is not None:
+            tool_id = self.monitoring.COVERAGE_ID
+            self.monitoring.use_tool_id(tool_id, 'pyflame-coverage')
+            self.monitoring.register_callback(tool_id, self.monitoring.events.LINE, self.monitor_line)
+            self.monitoring.set_events(tool_id, self.monitoring.events.LINE)
+        else:
+            threading.settrace(self.trace_call)
+            sys.settrace(self.trace_call)
+
+    def stop(self):
+        if self.monitoring is not None:
+            tool_id = self.monitoring.COVERAGE_ID
+            self.monitoring.set_events(tool_id, 0)
+            self.monitoring.register_callback(tool_id, self.monitoring.events.LINE, None)
+            self.monitoring.free_tool_id(tool_id)
+        else:
+            sys.settrace(None)
+            threading.settrace(None)
+        files = []
+        for filename, executed in list(self.executed.items()):
+            try:
+                executable = linecoverage.executable_lines(filename) | executed
+            except (OSError, SyntaxError, ValueError):
+                continue
+            files.append([os.path.abspath(filename), linecoverage.encode(linecoverage.bitmap_from_lines(executable)),
+                          linecoverage.encode(linecoverage.bitmap_from_lines(executed))])
+        self.channel.send('coverage', files=files)
+
+
+class Debugger(Instrument):
+    '''Stops at breakpoints and steps through the script on commands from the IDE
+
+    With sys.monitoring only code objects containing a breakpoint get line
+    events, and those stop firing on lines without one, so the script runs
+    at nearly full speed until it stops. The sys.settrace fallback only
+    traces the frames of functions that contain a breakpoint.
+    '''
+
+    max_locals = 100
+    max_repr = 200
+
+    def __init__(self, channel, options):
+        super().__init__(channel, options)
+        self.root = os.path.join(os.path.abspath(options.root or os.path.dirname(options.script)), '')
+        self.breakpoints = {os.path.abspath(file): set(lines)
+                            for file, lines in json.loads(options.breakpoints or '{}').items()}
+        self.ignored_files = {LAUNCHER_FILE, runpy.run_path.__code__.co_filename}
+        self.paths = {}
+        self.tracked_files = {}
+        self.code_lines = {}
+        self.commands = queue.Queue()
+        self.pause_lock = threading.Lock()
+        self.local = threading.local()
+        self.step_mode = None
+        self.step_frame = None
+        self.step_parent = None
+        self.step_thread = None
+        self.monitoring = getattr(sys, 'monitoring', None)
+        if self.monitoring is not None:
+            self.tool_id = self.monitoring.DEBUGGER_ID
+
+    def path(self, filename):
+        path = self.paths.get(filename)
+        if path is None:
+            path = self.paths[filename] = os.path.abspath(filename)
+        return path
+
+    def is_tracked(self, filename):
+        '''Whether stepping may stop in a file, which excludes the launcher and the standard library'''
+        tracked = self.tracked_files.get(filename)
+        if tracked is None:
+            path = self.path(filename)
+            tracked = (not filename.startswith('<') and path.startswith(self.root) and
+                       filename not in self.ignored_files)
+            self.tracked_files[filename] = tracked
+        return tracked
+
+    def is_breakpoint(self, filename, line):
+        lines = self.breakpoints.get(self.path(filename))
+        return lines is not None and line in lines
+
+    def has_breakpoint(self, code):
+        breakpoints = self.breakpoints.get(self.path(code.co_filename))
+        if not breakpoints:
+            return False
+        lines = self.code_lines.get(code)
+        if lines is None:
+            lines = self.code_lines[code] = {line for offset, line in dis.findlinestarts(code) if line}
+        return not breakpoints.isdisjoint(lines)
+
+    def start(self):
+        if self.monitoring is not None:
+            events = self.monitoring.events
+            self.monitoring.use_tool_id(self.tool_id, 'pyflame-debugger')
+            self.monitoring.register_callback(self.tool_id, events.PY_START, self.monitor_start)
+            self.monitoring.register_callback(self.tool_id, events.LINE, self.monitor_line)
+            self.monitoring.set_events(self.tool_id, events.PY_START)
+        else:
+            threading.settrace(self.trace_call)
+            sys.settrace(self.trace_call)
+        threading.Thread(target=self.receive_commands, name='pyflame-debugger', daemon=True).start()
+
+    def stop(self):
+        if self.monitoring is not None:
+            events = self.monitoring.events
+            self.monitoring.set_events(self.tool_id, 0)
+            for code in self.code_lines:
+                self.monitoring.set_local_events(self.tool_id, code, 0)
+            self.monitoring.register_callback(self.tool_id, events.PY_START, None)
+            self.monitoring.register_callback(self.tool_id, events.LINE, None)
+            self.monitoring.free_tool_id(self.tool_id)
+        else:
+            sys.settrace(None)
+            threading.settrace(None)
+
+    def monitor_start(self, code, offset):
+        if self.has_breakpoint(code):
+            self.monitoring.set_local_events(self.tool_id, code, self.monitoring.events.LINE)
+        else:
+            return self.monitoring.DISABLE
+
+    def monitor_line(self, code, line):
+        frame = sys._getframe(1)
+        reason = self.stop_reason(frame, line)
+        if reason is not None:
+            self.pause(frame, reason)
+        elif self.step_mode is None or not self.is_tracked(code.co_filename):
+            # Lines without a breakpoint only fire again when stepping restarts events
+            return self.monitoring.DISABLE
+
+    def trace_call(self, frame, event, arg):
+        if self.has_breakpoint(frame.f_code) or (self.step_mode and self.is_tracked(frame.f_code.co_filename)):
+            return self.trace_line
+
+    def trace_line(self, frame, event, arg):
+        if event == 'line':
+            reason = self.stop_reason(frame, frame.f_lineno)
+            if reason is not None:
+                self.pause(frame, reason)
+        return self.trace_line
+
+    def stop_reason(self, frame, line):
+        if getattr(self.local, 'paused', False):
+            return None
+        if self.is_breakpoint(frame.f_code.co_filename, line):
+            return 'breakpoint'
+        if self.step_mode is None or threading.get_ident() != self.step_thread or \
+                not self.is_tracked(frame.f_code.co_filename):
+            return None
+        if self.step_mode == 'into' or \
+                (self.step_mode == 'over' and frame is self.step_frame) or frame is self.step_parent:
+            return 'step'
+
+    def pause(self, frame, reason):
+        with self.pause_lock:
+            self.local.paused = True
+            try:
+                self.channel.send('paused', reason=reason, thread=threading.current_thread().name,
+                                  stack=self.describe_stack(frame))
+                command = self.commands.get()
+                self.channel.send('resumed')
+            finally:
+                self.local.paused = False
+            if command == 'continue':
+                self.step_mode = self.step_frame = self.step_parent = None
+            else:
+                self.step_mode = command[len('step_'):]
+                self.step_frame = frame
+                self.step_parent = frame.f_back
+                self.step_thread = threading.get_ident()
+            self.update_events(frame)
+
+    def update_events(self, frame=None):
+        '''Enables line events everywhere while stepping, and only where there are breakpoints otherwise'''
+        if self.monitoring is not None:
+            events = self.monitoring.events
+            self.monitoring.set_events(self.tool_id, events.PY_START | (events.LINE if self.step_mode else 0))
+            self.monitoring.restart_events()
+        elif self.step_mode:
+            # Frames that are already running only trace lines once they have a local trace function
+            while frame is not None:
+                if self.is_tracked(frame.f_code.co_filename):
+                    frame.f_trace = self.trace_line
+                frame = frame.f_back
+
+    def set_breakpoints(self, file, lines):
+        self.breakpoints[os.path.abspath(file)] = set(lines)
+        codes = set(code for code in self.code_lines if self.path(code.co_filename) == os.path.abspath(file))
+        for thread_id, frame in sys._current_frames().items():
+            while frame is not None:
+                if self.has_breakpoint(frame.f_code):
+                    codes.add(frame.f_code)
+                    if self.monitoring is None:
+                        frame.f_trace = self.trace_line
+                frame = frame.f_back
+        if self.monitoring is not None:
+            for code in codes:
+                events = self.monitoring.events.LINE if self.has_breakpoint(code) else 0
+                self.monitoring.set_local_events(self.tool_id, code, events)
+            # Code that was started before without a breakpoint has its PY_START event disabled
+            self.monitoring.restart_events()
+
+    def receive_commands(self):
+        while True:
+            try:
+                message = self.channel.receive()
+            except (OSError, ValueError):
+                message = None
+            if message is None:
+                # Run to the end once the IDE has gone
+                self.breakpoints = {}
+                self.commands.put('continue')
+                return
+            if message['type'] == 'breakpoints':
+                self.set_breakpoints(message['file'], message['lines'])
+            elif message['type'] in ('continue', 'step_over', 'step_into', 'step_out'):
+                self.commands.put(message['type'])
+
+    def describe_stack(self, frame):
+        stack = []
+        while frame is not None and frame.f_code.co_filename not in self.ignored_files:
+            stack.append({
+                'name': frame.f_code.co_name,
+                'file': frame.f_code.co_filename,
+                'line': frame.f_lineno,
+                'locals': self.describe_locals(frame),
+            })
+            frame = frame.f_back
+        return stack
+
+    def describe_locals(self, frame):
+        variables = []
+        for name, value in list(frame.f_locals.items()):
+            if name.startswith('__') and name.endswith('__'):
+                continue
+            try:
+                text = repr(value)
+            except Exception as error:
+                text = f'<repr failed: {error!r}>'
+            if len(text) > self.max_repr:
+                text = text[:self.max_repr - 3] + '...'
+            variables.append([name, type(value).__name__, text])
+            if len(variables) == self.max_locals:
+                break
+        return variables
+
+
+instruments = {
+    'run': Instrument,
+    'sample': StackSampler,
+    'cprofile': DeterministicProfiler,
+    'lines': LineTimer,
+    'memory': MemoryTracker,
+    'debug': Debugger,
+    'coverage': CoverageTracer,
+}
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='launcher.py')
+    parser.add_argument('--port', type=int, default=None)
+    parser.add_argument('--mode', choices=sorted(instruments), default='run')
+    parser.add_argument('--interval', type=float, default=0.005)
+    parser.add_argument('--root', default=None)
+    parser.add_argument('--breakpoints', default=None, help='JSON object of file to breakpoint lines')
+    parser.add_argument('script')
+    parser.add_argument('args', nargs=argparse.REMAINDER)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    script = os.path.abspath(options.script)
+    channel = Channel(options.port)
+    instrument = instruments[options.mode](channel, options)
+
+    # Make the script believe it was started directly
+    sys.argv = [script] + options.args
+    sys.path[0] = os.path.dirname(script)
+
+    instrument.start()
+    try:
+        instrument.script_globals = runpy.run_path(script, run_name='__main__')
+    finally:
+        instrument.stop()
+        channel.close()
+
+
+if __name__ == '__main__':
+    main()
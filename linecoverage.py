@@ -0,0 +1,93 @@
+'''Line coverage kept as one bitmap per file, with bit N set for line N
+
+Used by the launcher in the child process as well as the IDE, so it must
+only depend on the standard library.
+'''
+import base64
+import dis
+import os
+
+
+def bitmap_from_lines(lines):
+    lines = list(lines)
+    bitmap = bytearray(max(lines, default=0) // 8 + 1)
+    for line in lines:
+        bitmap[line >> 3] |= 1 << (line & 7)
+    return bytes(bitmap)
+
+
+def lines_from_bitmap(bitmap):
+    lines = []
+    for index, byte in enumerate(bitmap):
+        while byte:
+            bit = byte & -byte
+            lines.append(index * 8 + bit.bit_length() - 1)
+            byte ^= bit
+    return lines
+
+
+def count_bits(bitmap):
+    return sum(bin(byte).count('1') for byte in bitmap)
+
+
+def encode(bitmap):
+    return base64.b64encode(bitmap).decode('ascii')
+
+
+def decode(text):
+    return base64.b64decode(text)
+
+
+def executable_lines(path):
+    '''Line numbers that have code in them, found by compiling the file and walking its code objects'''
+    with open(path, 'rb') as file:
+        code = compile(file.read(), path, 'exec', dont_inherit=True)
+    lines = set()
+    codes = [code]
+    while codes:
+        code = codes.pop()
+        lines.update(line for offset, line in dis.findlinestarts(code) if line)
+        codes.extend(constant for constant in code.co_consts if hasattr(constant, 'co_code'))
+    return lines
+
+
+class CoverageMap:
+    '''Executable and executed line bitmaps of every measured file'''
+
+    def __init__(self):
+        self.files = {}
+
+    def load(self, files):
+        '''Takes [file, executable, executed] entries with base64 encoded bitmaps'''
+        self.files = {os.path.abspath(file): (decode(executable), decode(executed))
+                      for file, executable, executed in files}
+
+    def clear(self):
+        self.files = {}
+
+    def line_states(self, path):
+        '''{line: covered} for the executable lines of a file, empty if it was not measured'''
+        bitmaps = self.files.get(os.path.abspath(path))
+        if bitmaps is None:
+            return {}
+        executable, executed = bitmaps
+        return {line: bool(line >> 3 < len(executed) and executed[line >> 3] & (1 << (line & 7)))
+                for line in lines_from_bitmap(executable)}
+
+    def totals(self, root):
+        '''{path: (executed, executable)} for the measured files and every directory above them up to the root'''
+        root = os.path.abspath(root)
+        totals = {}
+        for path, (executable, executed) in self.files.items():
+            counts = (count_bits(executed), count_bits(executable))
+            directory = path
+            while True:
+                executed_total, executable_total = totals.get(directory, (0, 0))
+                totals[directory] = (executed_total + counts[0], executable_total + counts[1])
+                if directory == root or not directory.startswith(root):
+                    break
+                parent = os.path.dirname(directory)
+                if parent == directory:
+                    break
+                directory = parent
+        return totals
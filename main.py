@@ -1,6 +1,7 @@
 from PyQt5 import QtWidgets, QtCore
 from editor import PyFlame
 import resources
+import multiprocessing
 import sys
 
 themes = {
@@ -10,6 +11,7 @@ themes = {
 }
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()
     app = QtWidgets.QApplication(sys.argv)
     settings = QtCore.QSettings('ravenkls', 'PyFlame')
     ide = PyFlame(settings, primary_colour=themes['NIGHT'])
@@ -0,0 +1,85 @@
+from PyQt5 import QtWidgets, QtCore
+from widgets import TitledDockWidget
+import os
+
+max_listed = 5000  # Locations shown at most, as each needs the text of its line
+
+
+def location_lines(locations):
+    '''{path: lines} of the files of some (path, line, column) locations, read once each'''
+    lines = {}
+    for path in {path for path, line, column in locations}:
+        try:
+            with open(path, encoding='utf-8', errors='replace') as file:
+                lines[path] = file.read().splitlines()
+        except OSError:
+            lines[path] = []
+    return lines
+
+
+class UsagesDock(TitledDockWidget):
+    '''Lists the places in the project a name is used or defined, grouped by file'''
+
+    frame_activated = QtCore.pyqtSignal(str, int)
+
+    def __init__(self, parent=None):
+        super().__init__('Usages', parent)
+        container = QtWidgets.QWidget(self)
+        layout = QtWidgets.QVBoxLayout(container)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(0)
+
+        self.tool_bar = QtWidgets.QWidget(container)
+        self.tool_bar.setObjectName('console_toolbar')
+        tool_layout = QtWidgets.QHBoxLayout(self.tool_bar)
+        tool_layout.setContentsMargins(5, 2, 5, 2)
+        self.status_label = QtWidgets.QLabel('', self.tool_bar)
+        self.status_label.setObjectName('console_status')
+        tool_layout.addWidget(self.status_label)
+        tool_layout.addStretch()
+        layout.addWidget(self.tool_bar)
+
+        self.results_tree = QtWidgets.QTreeWidget(container)
+        self.results_tree.setObjectName('hotspots')
+        self.results_tree.setHeaderLabels(['Location', 'Line'])
+        self.results_tree.header().setSectionResizeMode(0, QtWidgets.QHeaderView.Stretch)
+        self.results_tree.setUniformRowHeights(True)
+        self.results_tree.itemActivated.connect(self.open_result)
+        layout.addWidget(self.results_tree)
+
+        self.setWidget(container)
+
+    @property
+    def root(self):
+        return os.getcwd()
+
+    def show_locations(self, title, locations):
+        '''Lists (path, line, column) locations under a title such as "Usages of name"'''
+        self.results_tree.clear()
+        shown = locations[:max_listed]
+        lines = location_lines(shown)
+        file_items = {}
+        for path, line, column in shown:
+            file_item = file_items.get(path)
+            if file_item is None:
+                file_item = file_items[path] = QtWidgets.QTreeWidgetItem([os.path.relpath(path, self.root), ''])
+                file_item.setData(0, QtCore.Qt.UserRole, (path, line))
+                file_item.setToolTip(0, path)
+                self.results_tree.addTopLevelItem(file_item)
+            text = lines[path][line - 1].strip() if 0 < line <= len(lines[path]) else ''
+            hit_item = QtWidgets.QTreeWidgetItem([text, str(line)])
+            hit_item.setData(0, QtCore.Qt.UserRole, (path, line))
+            file_item.addChild(hit_item)
+        for index, file_item in enumerate(file_items.values()):
+            file_item.setText(0, f'{file_item.text(0)} ({file_item.childCount()})')
+            file_item.setExpanded(index < 50)
+        summary = f'{title}: {len(locations)} in {len(file_items)} files' if locations else f'{title}: none found'
+        if len(locations) > len(shown):
+            summary += f' (first {len(shown)} shown)'
+        self.status_label.setText(summary)
+        self.show()
+        self.raise_()
+
+    def open_result(self, item, column=0):
+        path, line = item.data(0, QtCore.Qt.UserRole)
+        self.frame_activated.emit(path, line)
@@ -0,0 +1,137 @@
+from PyQt5 import QtWidgets, QtCore
+from concurrent.futures import ThreadPoolExecutor
+from symbolworker import parse_symbols
+from widgets import TitledDockWidget
+import weakref
+
+outline_kinds = ('class', 'function', 'method')
+
+
+def outline_symbols(source):
+    '''The classes, functions and methods of some source in order, or None if it does not parse'''
+    try:
+        symbols, references = parse_symbols(source)
+    except (SyntaxError, ValueError, RecursionError):
+        return None
+    return [symbol for symbol in symbols if symbol.kind in outline_kinds]
+
+
+class OutlineDock(TitledDockWidget):
+    '''Classes and functions of the current tab, parsed in the background a moment after typing stops
+
+    Each editor's outline is kept with the document revision it was parsed from, so switching
+    tabs or a change that is undone does not parse again. While the buffer does not parse, the
+    last outline that did is kept.
+    '''
+
+    parsed = QtCore.pyqtSignal(object, int, object)
+
+    def __init__(self, tab_widget, parent=None, delay=400):
+        super().__init__('Outline', parent)
+        self.tab_widget = tab_widget
+        self.executor = ThreadPoolExecutor(1)
+        self.editor = None
+        self.outlines = weakref.WeakKeyDictionary()  # editor: (revision, symbols)
+        self.pending = weakref.WeakKeyDictionary()  # editor: revision being parsed
+        self.collapsed = set()
+        self.parsed.connect(self.parse_finished)
+
+        self.parse_timer = QtCore.QTimer(self)
+        self.parse_timer.setSingleShot(True)
+        self.parse_timer.setInterval(delay)
+        self.parse_timer.timeout.connect(self.parse)
+
+        self.outline_tree = QtWidgets.QTreeWidget(self)
+        self.outline_tree.setObjectName('project_structure')
+        self.outline_tree.setHeaderHidden(True)
+        self.outline_tree.setUniformRowHeights(True)
+        self.outline_tree.itemActivated.connect(self.open_item)
+        self.outline_tree.itemClicked.connect(self.open_item)
+        self.outline_tree.itemCollapsed.connect(lambda item: self.collapsed.add(item.data(0, QtCore.Qt.UserRole + 1)))
+        self.outline_tree.itemExpanded.connect(lambda item: self.collapsed.discard(item.data(0, QtCore.Qt.UserRole + 1)))
+        self.setWidget(self.outline_tree)
+
+        self.tab_widget.currentChanged.connect(lambda index: self.set_editor(self.tab_widget.currentWidget()))
+        self.set_editor(self.tab_widget.currentWidget())
+
+    def set_editor(self, editor):
+        if self.editor is not None:
+            try:
+                self.editor.document().contentsChanged.disconnect(self.parse_timer.start)
+            except (TypeError, RuntimeError):
+                pass  # Already deleted along with its tab
+        self.editor = editor
+        self.collapsed = set()
+        self.outline_tree.clear()
+        if editor is None:
+            return
+        editor.document().contentsChanged.connect(self.parse_timer.start)
+        outline = self.outlines.get(editor)
+        if outline is not None:
+            self.show_outline(outline[1])
+        self.parse()
+
+    def parse(self):
+        editor = self.editor
+        if editor is None or not self.isVisible():
+            return
+        revision = editor.document().revision()
+        outline = self.outlines.get(editor)
+        if outline is not None and outline[0] == revision or self.pending.get(editor) == revision:
+            return
+        self.pending[editor] = revision
+        source = editor.toPlainText()
+
+        def done(future):
+            if future.cancelled() or future.exception() is not None:
+                return
+            try:
+                self.parsed.emit(editor, revision, future.result())
+            except RuntimeError:
+                pass  # The dock was deleted while the source was parsed
+        self.executor.submit(outline_symbols, source).add_done_callback(done)
+
+    def parse_finished(self, editor, revision, symbols):
+        if self.pending.get(editor) == revision:
+            del self.pending[editor]
+        if symbols is None:
+            # Mid edit, so keep showing the last outline that parsed, without parsing this revision again
+            previous = self.outlines.get(editor)
+            self.outlines[editor] = (revision, previous[1] if previous is not None else [])
+            return
+        self.outlines[editor] = (revision, symbols)
+        if editor is self.editor:
+            self.show_outline(symbols)
+
+    def show_outline(self, symbols):
+        scroll = self.outline_tree.verticalScrollBar().value()
+        self.outline_tree.clear()
+        items = {}
+        for symbol in symbols:
+            parent = items.get(symbol.scope)
+            item = QtWidgets.QTreeWidgetItem([f'{symbol.name}{symbol.detail}' if symbol.kind != 'class'
+                                              else f'class {symbol.name}'])
+            full_name = f'{symbol.scope}.{symbol.name}' if symbol.scope else symbol.name
+            item.setData(0, QtCore.Qt.UserRole, symbol.line)
+            item.setData(0, QtCore.Qt.UserRole + 1, full_name)
+            item.setToolTip(0, f'{symbol.kind} {full_name}, line {symbol.line}')
+            if parent is None:
+                self.outline_tree.addTopLevelItem(item)
+            else:
+                parent.addChild(item)
+            items[full_name] = item
+        for full_name, item in items.items():
+            item.setExpanded(full_name not in self.collapsed)
+        self.outline_tree.verticalScrollBar().setValue(scroll)
+
+    def open_item(self, item, column=0):
+        if self.editor is not None:
+            self.editor.go_to_line(item.data(0, QtCore.Qt.UserRole))
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.parse()
+
+    def shutdown(self):
+        self.parse_timer.stop()
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,555 @@
+from PyQt5 import QtWidgets, QtGui, QtCore
+from widgets import TitledDockWidget
+from accounting import format_bytes
+import collections
+import marshal
+import zlib
+import os
+
+
+class FlameNode:
+    '''A function in the call tree built from collapsed stacks'''
+
+    __slots__ = ('name', 'file', 'line', 'value', 'children', 'parent')
+
+    def __init__(self, name, file='', line=0, parent=None):
+        self.name = name
+        self.file = file
+        self.line = line
+        self.value = 0
+        self.children = {}
+        self.parent = parent
+
+    @classmethod
+    def from_stacks(cls, stacks):
+        root = cls('all')
+        for stack, count in stacks:
+            root.value += count
+            node = root
+            for name, file, line in stack:
+                key = (name, file, line)
+                child = node.children.get(key)
+                if child is None:
+                    child = node.children[key] = cls(name, file, line, node)
+                child.value += count
+                node = child
+        return root
+
+    @property
+    def label(self):
+        if not self.file:
+            return self.name
+        return f'{self.name} ({os.path.basename(self.file)}:{self.line})'
+
+    @property
+    def depth(self):
+        depth, nodes = 0, [(self, 1)]
+        while nodes:
+            node, node_depth = nodes.pop()
+            depth = max(depth, node_depth)
+            nodes.extend((child, node_depth + 1) for child in node.children.values())
+        return depth
+
+    def ancestors(self):
+        node, ancestors = self.parent, []
+        while node is not None:
+            ancestors.append(node)
+            node = node.parent
+        return ancestors[::-1]
+
+
+class FlameGraphWidget(QtWidgets.QWidget):
+
+    frame_activated = QtCore.pyqtSignal(str, int)
+    zoom_changed = QtCore.pyqtSignal()
+
+    row_height = 18
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.root = None
+        self.zoom_node = None
+        self.search_text = ''
+        self.node_rects = []
+        self.setMouseTracking(True)
+        font = QtGui.QFont('Consolas')
+        font.setPointSize(9)
+        self.setFont(font)
+
+    def set_root(self, root):
+        self.root = root
+        self.zoom_node = root
+        self.setMinimumHeight(root.depth * self.row_height)
+        self.update()
+
+    def zoom_to(self, node):
+        self.zoom_node = node or self.root
+        self.zoom_changed.emit()
+        self.update()
+
+    def set_search(self, text):
+        self.search_text = text.lower()
+        self.update()
+
+    def matched_value(self):
+        '''Total samples in frames matching the search, without double counting recursion'''
+        if not self.search_text or self.root is None:
+            return 0
+        total, nodes = 0, [self.root]
+        while nodes:
+            node = nodes.pop()
+            if self.search_text in node.name.lower():
+                total += node.value
+            else:
+                nodes.extend(node.children.values())
+        return total
+
+    def node_colour(self, node):
+        if self.search_text:
+            if self.search_text in node.name.lower():
+                return QtGui.QColor(0xE06C75)
+            return QtGui.QColor(0x4f5766)
+        hue_seed = zlib.crc32(node.name.encode()) % 1000 / 1000
+        return QtGui.QColor.fromHsv(int(hue_seed * 50), 150 + int(hue_seed * 60), 230)
+
+    def paintEvent(self, event):
+        painter = QtGui.QPainter(self)
+        painter.fillRect(event.rect(), self.palette().window())
+        self.node_rects = []
+        if self.root is None or not self.root.value:
+            return
+
+        width = self.width()
+        row = 0
+        for ancestor in self.zoom_node.ancestors():
+            self.draw_node(painter, ancestor, 0, width, row, dimmed=True)
+            row += 1
+
+        scale = width / self.zoom_node.value
+        pending = [(self.zoom_node, 0.0, row)]
+        while pending:
+            node, x, row = pending.pop()
+            node_width = node.value * scale
+            if node_width < 1:
+                continue
+            self.draw_node(painter, node, x, node_width, row)
+            child_x = x
+            for child in sorted(node.children.values(), key=lambda child: child.name):
+                pending.append((child, child_x, row + 1))
+                child_x += child.value * scale
+
+    def draw_node(self, painter, node, x, width, row, dimmed=False):
+        rect = QtCore.QRectF(x, row * self.row_height, width, self.row_height - 1)
+        colour = self.node_colour(node)
+        if dimmed:
+            colour = colour.darker(160)
+        painter.fillRect(rect, colour)
+        if width > 30:
+            painter.setPen(QtGui.QColor(0x000000))
+            text = painter.fontMetrics().elidedText(node.label, QtCore.Qt.ElideRight, int(width) - 6)
+            painter.drawText(rect.adjusted(3, 0, -3, 0), QtCore.Qt.AlignVCenter, text)
+        self.node_rects.append((rect, node))
+
+    def node_at(self, position):
+        for rect, node in reversed(self.node_rects):
+            if rect.contains(position):
+                return node
+
+    def mouseMoveEvent(self, event):
+        node = self.node_at(event.pos())
+        if node is None:
+            return QtWidgets.QToolTip.hideText()
+        percent = node.value / self.root.value * 100
+        QtWidgets.QToolTip.showText(event.globalPos(), f'{node.label}\n{node.value} samples ({percent:.2f}%)', self)
+
+    def mousePressEvent(self, event):
+        node = self.node_at(event.pos())
+        if event.button() == QtCore.Qt.LeftButton and node is not None:
+            self.zoom_to(node)
+        elif event.button() == QtCore.Qt.RightButton:
+            self.zoom_to(self.zoom_node.parent)
+
+    def mouseDoubleClickEvent(self, event):
+        node = self.node_at(event.pos())
+        if node is not None and node.file:
+            self.frame_activated.emit(node.file, node.line)
+
+
+class FlameGraphDock(TitledDockWidget):
+
+    frame_activated = QtCore.pyqtSignal(str, int)
+
+    def __init__(self, parent=None):
+        super().__init__('Flame Graph', parent)
+        self.samples = 0
+        self.interval = 0
+
+        container = QtWidgets.QWidget(self)
+        layout = QtWidgets.QVBoxLayout(container)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(0)
+
+        self.tool_bar = QtWidgets.QWidget(container)
+        self.tool_bar.setObjectName('console_toolbar')
+        tool_layout = QtWidgets.QHBoxLayout(self.tool_bar)
+        tool_layout.setContentsMargins(5, 2, 5, 2)
+
+        self.search_entry = QtWidgets.QLineEdit(self.tool_bar)
+        self.search_entry.setObjectName('dialog_entry')
+        self.search_entry.setPlaceholderText('Search functions')
+        self.search_entry.textChanged.connect(self.search)
+        tool_layout.addWidget(self.search_entry)
+
+        self.summary_label = QtWidgets.QLabel('', self.tool_bar)
+        self.summary_label.setObjectName('console_status')
+        tool_layout.addWidget(self.summary_label)
+        tool_layout.addStretch()
+
+        self.reset_button = QtWidgets.QPushButton('Reset Zoom', self.tool_bar)
+        self.reset_button.setObjectName('console_button')
+        tool_layout.addWidget(self.reset_button)
+        layout.addWidget(self.tool_bar)
+
+        self.flame_graph = FlameGraphWidget(container)
+        self.flame_graph.frame_activated.connect(self.frame_activated)
+        self.flame_graph.zoom_changed.connect(self.update_summary)
+        self.reset_button.clicked.connect(lambda: self.flame_graph.zoom_to(None))
+
+        scroll_area = QtWidgets.QScrollArea(container)
+        scroll_area.setWidgetResizable(True)
+        scroll_area.setWidget(self.flame_graph)
+        scroll_area.setObjectName('flame_graph')
+        layout.addWidget(scroll_area)
+
+        self.setWidget(container)
+
+    def load_profile(self, profile):
+        self.samples = profile['samples']
+        self.interval = profile['interval']
+        self.flame_graph.set_root(FlameNode.from_stacks(profile['stacks']))
+        self.search(self.search_entry.text())
+
+    def search(self, text):
+        self.flame_graph.set_search(text)
+        self.update_summary()
+
+    def update_summary(self):
+        root = self.flame_graph.root
+        if root is None:
+            return self.summary_label.setText('')
+        summary = f'{root.value} samples (~{root.value * self.interval:.2f}s)'
+        if self.flame_graph.zoom_node is not root:
+            zoom_percent = self.flame_graph.zoom_node.value / root.value * 100
+            summary += f', zoomed {zoom_percent:.1f}%'
+        if self.flame_graph.search_text:
+            matched_percent = self.flame_graph.matched_value() / root.value * 100
+            summary += f', matched {matched_percent:.1f}%'
+        self.summary_label.setText(summary)
+
+
+class ProfileStats:
+    '''Function timings in the same layout pstats uses, so they can be saved as .pstats'''
+
+    def __init__(self, stats):
+        self.stats = stats
+        self.callee_map = None
+
+    @classmethod
+    def from_entries(cls, entries):
+        stats = {}
+        for file, line, name, cc, nc, tt, ct, caller_entries in entries:
+            # Caller timings put the total calls first, unlike the function's own
+            callers = {(c_file, c_line, c_name): (c_nc, c_cc, c_tt, c_ct)
+                       for c_file, c_line, c_name, c_nc, c_cc, c_tt, c_ct in caller_entries}
+            stats[(file, line, name)] = (cc, nc, tt, ct, callers)
+        return cls(stats)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as file:
+            return cls(marshal.load(file))
+
+    def save(self, path):
+        with open(path, 'wb') as file:
+            marshal.dump(self.stats, file)
+
+    @property
+    def total_time(self):
+        return sum(timings[2] for timings in self.stats.values())
+
+    def callers(self, key):
+        return self.stats[key][4]
+
+    def callees(self, key):
+        if self.callee_map is None:
+            self.callee_map = collections.defaultdict(dict)
+            for callee, (cc, nc, tt, ct, callers) in self.stats.items():
+                for caller, timings in callers.items():
+                    self.callee_map[caller][callee] = timings
+        return self.callee_map.get(key, {})
+
+
+def format_ncalls(cc, nc):
+    return str(nc) if cc == nc else f'{nc}/{cc}'
+
+
+def format_function(key):
+    file, line, name = key
+    if file == '~':
+        return name
+    return f'{name} ({os.path.basename(file)}:{line})'
+
+
+class HotspotModel(QtCore.QAbstractTableModel):
+
+    columns = ['Function', 'ncalls', 'tottime', 'percall', 'cumtime', 'percall']
+    compare_columns = ['Δ tottime', 'Δ cumtime']
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.stats = None
+        self.baseline = None
+        self.rows = []
+        self.sort_column = 4
+        self.sort_order = QtCore.Qt.DescendingOrder
+
+    def set_stats(self, stats, baseline=None):
+        self.beginResetModel()
+        self.stats = stats
+        self.baseline = baseline
+        self.rows = []
+        for key, (cc, nc, tt, ct, callers) in stats.stats.items():
+            row = [format_function(key), nc, tt, tt / nc if nc else 0, ct, ct / cc if cc else 0]
+            if baseline is not None:
+                base_tt, base_ct = baseline.stats.get(key, (0, 0, 0, 0, None))[2:4]
+                row += [tt - base_tt, ct - base_ct]
+            self.rows.append((key, row))
+        if self.sort_column >= self.columnCount():
+            # Sorted by a Δ column of a comparison that is gone
+            self.sort_column = 4
+        self.sort_rows()
+        self.endResetModel()
+
+    def sort_rows(self):
+        reverse = self.sort_order == QtCore.Qt.DescendingOrder
+        self.rows.sort(key=lambda row: row[1][self.sort_column], reverse=reverse)
+
+    def sort(self, column, order=QtCore.Qt.AscendingOrder):
+        self.layoutAboutToBeChanged.emit()
+        self.sort_column = min(column, self.columnCount() - 1)
+        self.sort_order = order
+        self.sort_rows()
+        self.layoutChanged.emit()
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        if self.baseline is not None:
+            return len(self.columns) + len(self.compare_columns)
+        return len(self.columns)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if orientation == QtCore.Qt.Horizontal and role == QtCore.Qt.DisplayRole:
+            return (self.columns + self.compare_columns)[section]
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        key, row = self.rows[index.row()]
+        value = row[index.column()]
+        if role == QtCore.Qt.DisplayRole:
+            if index.column() == 0:
+                return value
+            if index.column() == 1:
+                cc, nc = self.stats.stats[key][:2]
+                return format_ncalls(cc, nc)
+            if index.column() >= len(self.columns):
+                return f'{value:+.6f}'
+            return f'{value:.6f}'
+        elif role == QtCore.Qt.ToolTipRole:
+            return f'{key[0]}:{key[1]}'
+        elif role == QtCore.Qt.ForegroundRole and index.column() >= len(self.columns):
+            if value > 0:
+                return QtGui.QColor(0xE06C75)
+            elif value < 0:
+                return QtGui.QColor(0x98C476)
+        elif role == QtCore.Qt.TextAlignmentRole and index.column() > 0:
+            return QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter
+
+    def key_at(self, row):
+        return self.rows[row][0]
+
+    def row_of(self, key):
+        for row, (row_key, values) in enumerate(self.rows):
+            if row_key == key:
+                return row
+        return -1
+
+
+class HotspotDock(TitledDockWidget):
+
+    frame_activated = QtCore.pyqtSignal(str, int)
+
+    def __init__(self, parent=None):
+        super().__init__('cProfile Hotspots', parent)
+        self.stats = None
+        self.previous_stats = None
+
+        container = QtWidgets.QWidget(self)
+        layout = QtWidgets.QVBoxLayout(container)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(0)
+
+        self.tool_bar = QtWidgets.QWidget(container)
+        self.tool_bar.setObjectName('console_toolbar')
+        tool_layout = QtWidgets.QHBoxLayout(self.tool_bar)
+        tool_layout.setContentsMargins(5, 2, 5, 2)
+        self.summary_label = QtWidgets.QLabel('', self.tool_bar)
+        self.summary_label.setObjectName('console_status')
+        tool_layout.addWidget(self.summary_label)
+        tool_layout.addStretch()
+        for text, callback in (('Export .pstats', self.export_stats),
+                               ('Compare with Previous', self.compare_previous),
+                               ('Compare with File...', self.compare_file),
+                               ('Clear Comparison', self.clear_comparison)):
+            button = QtWidgets.QPushButton(text, self.tool_bar)
+            button.setObjectName('console_button')
+            button.clicked.connect(callback)
+            tool_layout.addWidget(button)
+        layout.addWidget(self.tool_bar)
+
+        splitter = QtWidgets.QSplitter(QtCore.Qt.Vertical, container)
+        self.hotspot_model = HotspotModel(self)
+        self.hotspot_table = self.create_table(splitter)
+        self.hotspot_table.setModel(self.hotspot_model)
+        self.hotspot_table.setSortingEnabled(True)
+        self.hotspot_table.sortByColumn(4, QtCore.Qt.DescendingOrder)
+        self.hotspot_table.doubleClicked.connect(self.hotspot_activated)
+        self.hotspot_table.selectionModel().currentRowChanged.connect(self.show_relations)
+
+        relations = QtWidgets.QSplitter(QtCore.Qt.Horizontal, splitter)
+        self.callers_table = self.create_relation_table('Callers', relations)
+        self.callees_table = self.create_relation_table('Callees', relations)
+        splitter.setStretchFactor(0, 3)
+        splitter.setStretchFactor(1, 1)
+        layout.addWidget(splitter)
+
+        self.setWidget(container)
+
+    def create_table(self, parent):
+        table = QtWidgets.QTableView(parent)
+        table.setObjectName('hotspots')
+        table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        table.setSelectionMode(QtWidgets.QAbstractItemView.SingleSelection)
+        table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        table.verticalHeader().hide()
+        table.horizontalHeader().setSectionResizeMode(0, QtWidgets.QHeaderView.Stretch)
+        return table
+
+    def create_relation_table(self, title, parent):
+        table = QtWidgets.QTreeWidget(parent)
+        table.setObjectName('hotspots')
+        table.setRootIsDecorated(False)
+        table.setHeaderLabels([title, 'ncalls', 'tottime', 'cumtime'])
+        table.header().setSectionResizeMode(0, QtWidgets.QHeaderView.Stretch)
+        table.itemDoubleClicked.connect(self.relation_activated)
+        return table
+
+    def load_stats(self, stats):
+        self.previous_stats, self.stats = self.stats, stats
+        self.hotspot_model.set_stats(stats)
+        self.summary_label.setText(f'{len(stats.stats)} functions, {stats.total_time:.4f}s total')
+        self.callers_table.clear()
+        self.callees_table.clear()
+
+    def show_relations(self, current, previous):
+        if not current.isValid():
+            return
+        key = self.hotspot_model.key_at(current.row())
+        for table, relations in ((self.callers_table, self.stats.callers(key)),
+                                 (self.callees_table, self.stats.callees(key))):
+            table.clear()
+            for relation_key, (nc, cc, tt, ct) in sorted(relations.items(), key=lambda item: -item[1][3]):
+                item = QtWidgets.QTreeWidgetItem([format_function(relation_key), format_ncalls(cc, nc),
+                                                  f'{tt:.6f}', f'{ct:.6f}'])
+                item.setData(0, QtCore.Qt.UserRole, relation_key)
+                table.addTopLevelItem(item)
+
+    def select_function(self, key):
+        row = self.hotspot_model.row_of(key)
+        if row >= 0:
+            self.hotspot_table.selectRow(row)
+            self.hotspot_table.scrollTo(self.hotspot_model.index(row, 0))
+
+    def relation_activated(self, item, column):
+        self.select_function(tuple(item.data(0, QtCore.Qt.UserRole)))
+
+    def hotspot_activated(self, index):
+        file, line, name = self.hotspot_model.key_at(index.row())
+        if os.path.isfile(file):
+            self.frame_activated.emit(file, line)
+
+    def export_stats(self):
+        if self.stats is None:
+            return
+        path, file_type = QtWidgets.QFileDialog.getSaveFileName(self, 'Export Stats', 'profile.pstats',
+                                                                'Profile Stats (*.pstats *.prof)')
+        if path:
+            self.stats.save(path)
+
+    def compare_previous(self):
+        if self.stats is not None and self.previous_stats is not None:
+            self.hotspot_model.set_stats(self.stats, self.previous_stats)
+
+    def compare_file(self):
+        if self.stats is None:
+            return
+        path, file_type = QtWidgets.QFileDialog.getOpenFileName(self, 'Compare With', '',
+                                                                'Profile Stats (*.pstats *.prof)')
+        if path:
+            try:
+                baseline = ProfileStats.load(path)
+            except (OSError, ValueError, EOFError, TypeError):
+                return self.summary_label.setText(f'Could not read {os.path.basename(path)}')
+            self.hotspot_model.set_stats(self.stats, baseline)
+
+    def clear_comparison(self):
+        if self.stats is not None:
+            self.hotspot_model.set_stats(self.stats)
+
+
+class MemorySitesDock(TitledDockWidget):
+
+    frame_activated = QtCore.pyqtSignal(str, int)
+
+    def __init__(self, parent=None):
+        super().__init__('Memory Allocations', parent)
+
+        self.sites_tree = QtWidgets.QTreeWidget(self)
+        self.sites_tree.setObjectName('hotspots')
+        self.sites_tree.setHeaderLabels(['Location', 'Size', 'Blocks'])
+        self.sites_tree.header().setSectionResizeMode(0, QtWidgets.QHeaderView.Stretch)
+        self.sites_tree.itemDoubleClicked.connect(self.site_activated)
+        self.setWidget(self.sites_tree)
+
+    def load_sites(self, sites):
+        self.sites_tree.clear()
+        files = collections.OrderedDict()
+        for file, line, size, count in sorted(sites, key=lambda site: -site[2]):
+            files.setdefault(file, []).append((line, size, count))
+        for file, lines in sorted(files.items(), key=lambda item: -sum(size for line, size, count in item[1])):
+            total_size = sum(size for line, size, count in lines)
+            total_count = sum(count for line, size, count in lines)
+            file_item = QtWidgets.QTreeWidgetItem([file, format_bytes(total_size), str(total_count)])
+            file_item.setData(0, QtCore.Qt.UserRole, (file, 1))
+            for line, size, count in lines:
+                line_item = QtWidgets.QTreeWidgetItem([f'line {line}', format_bytes(size), str(count)])
+                line_item.setData(0, QtCore.Qt.UserRole, (file, line))
+                file_item.addChild(line_item)
+            self.sites_tree.addTopLevelItem(file_item)
+        if self.sites_tree.topLevelItemCount():
+            self.sites_tree.topLevelItem(0).setExpanded(True)
+
+    def site_activated(self, item, column):
+        file, line = item.data(0, QtCore.Qt.UserRole)
+        if os.path.isfile(file):
+            self.frame_activated.emit(file, line)
@@ -0,0 +1,214 @@
+from PyQt5 import QtWidgets, QtCore
+from ignores import IgnoreRules
+import queue
+import os
+
+
+class ProjectNode:
+
+    def __init__(self, path, is_directory, parent=None):
+        self.path = path
+        self.name = os.path.basename(path) or path
+        self.is_directory = is_directory
+        self.parent = parent
+        self.children = None  # None until the directory has been listed
+        self.listing = False
+        self.row = 0
+
+
+class DirectoryLister(QtCore.QThread):
+    '''Lists the directories asked for with os.scandir, leaving out ignored entries'''
+
+    listed = QtCore.pyqtSignal(int, str, list)
+
+    def __init__(self):
+        super().__init__()
+        self.requests = queue.Queue()
+        self.rules = None
+        self.generation = 0
+
+    def set_rules(self, rules, generation):
+        self.rules = rules
+        self.generation = generation
+
+    def request(self, path):
+        self.requests.put((self.generation, self.rules, path))
+        if not self.isRunning():
+            self.start()
+
+    def stop(self):
+        self.requests.put(None)
+        self.wait()
+
+    def run(self):
+        while True:
+            request = self.requests.get()
+            if request is None:
+                return
+            generation, rules, path = request
+            entries = []
+            try:
+                with os.scandir(path) as scanner:
+                    for entry in scanner:
+                        try:
+                            is_directory = entry.is_dir()
+                        except OSError:
+                            continue
+                        if not rules.ignored(entry.path, is_directory):
+                            entries.append((entry.name, is_directory))
+            except OSError:
+                pass
+            entries.sort(key=lambda entry: (not entry[1], entry[0].lower()))
+            self.listed.emit(generation, path, entries)
+
+
+class ProjectTreeModel(QtCore.QAbstractItemModel):
+    '''The project's files, each directory listed in the background the first time it is expanded'''
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.root = None
+        self.rules = None
+        self.generation = 0
+        self.directories = {}
+        self.icon_provider = QtWidgets.QFileIconProvider()
+        self.folder_icon = self.icon_provider.icon(QtWidgets.QFileIconProvider.Folder)
+        self.file_icon = self.icon_provider.icon(QtWidgets.QFileIconProvider.File)
+        self.lister = DirectoryLister()
+        self.lister.listed.connect(self.directory_listed)
+
+    def set_root(self, path, excludes=None):
+        self.beginResetModel()
+        self.generation += 1
+        self.rules = IgnoreRules(path, excludes)
+        self.root = ProjectNode(self.rules.root, True)
+        self.directories = {self.root.path: self.root}
+        self.lister.set_rules(self.rules, self.generation)
+        self.endResetModel()
+        self.list_directory(self.root)
+
+    def refresh(self, path=None):
+        '''Lists a directory again, or every directory listed so far, keeping what is expanded'''
+        if self.root is None:
+            return
+        if path is None:
+            self.rules.forget(self.root.path)
+            for node in list(self.directories.values()):
+                if node.children is not None:
+                    self.list_directory(node)
+        else:
+            node = self.directories.get(os.path.abspath(path))
+            if node is not None and node.children is not None:
+                if os.path.isfile(os.path.join(node.path, '.gitignore')):
+                    self.rules.forget(node.path)
+                self.list_directory(node)
+
+    def stop(self):
+        self.lister.stop()
+
+    def list_directory(self, node):
+        node.listing = True
+        self.lister.request(node.path)
+
+    def directory_listed(self, generation, path, entries):
+        node = self.directories.get(path)
+        if generation != self.generation or node is None:
+            return
+        node.listing = False
+        parent_index = self.node_index(node)
+        if node.children is None:
+            if entries:
+                self.beginInsertRows(parent_index, 0, len(entries) - 1)
+            node.children = [self.new_node(node, name, is_directory) for name, is_directory in entries]
+            self.number_rows(node)
+            if entries:
+                self.endInsertRows()
+            return
+
+        # Relisted: remove what has gone and insert what is new, leaving the rest and their expansion alone
+        listed = {(name, is_directory) for name, is_directory in entries}
+        for row in reversed(range(len(node.children))):
+            child = node.children[row]
+            if (child.name, child.is_directory) not in listed:
+                self.beginRemoveRows(parent_index, row, row)
+                del node.children[row]
+                self.forget_node(child)
+                self.number_rows(node)
+                self.endRemoveRows()
+        existing = {(child.name, child.is_directory) for child in node.children}
+        for row, (name, is_directory) in enumerate(entries):
+            if (name, is_directory) not in existing:
+                self.beginInsertRows(parent_index, row, row)
+                node.children.insert(row, self.new_node(node, name, is_directory))
+                self.number_rows(node)
+                self.endInsertRows()
+
+    def number_rows(self, node):
+        for row, child in enumerate(node.children):
+            child.row = row
+
+    def new_node(self, parent, name, is_directory):
+        child = ProjectNode(os.path.join(parent.path, name), is_directory, parent)
+        if is_directory:
+            self.directories[child.path] = child
+        return child
+
+    def forget_node(self, node):
+        self.directories.pop(node.path, None)
+        for child in node.children or ():
+            self.forget_node(child)
+
+    def node(self, index):
+        return index.internalPointer() if index.isValid() else self.root
+
+    def node_index(self, node):
+        if node is self.root or node.parent is None:
+            return QtCore.QModelIndex()
+        return self.createIndex(node.row, 0, node)
+
+    def file_path(self, index):
+        node = self.node(index)
+        return node.path if node is not None else ''
+
+    def index(self, row, column, parent=QtCore.QModelIndex()):
+        node = self.node(parent)
+        if node is None or node.children is None or not 0 <= row < len(node.children) or column != 0:
+            return QtCore.QModelIndex()
+        return self.createIndex(row, column, node.children[row])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QtCore.QModelIndex()
+        return self.node_index(index.internalPointer().parent)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        node = self.node(parent)
+        return len(node.children) if node is not None and node.children is not None else 0
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 1
+
+    def hasChildren(self, parent=QtCore.QModelIndex()):
+        node = self.node(parent)
+        if node is None or not node.is_directory:
+            return False
+        return node.children is None or bool(node.children)
+
+    def canFetchMore(self, parent):
+        node = self.node(parent)
+        return node is not None and node.is_directory and node.children is None and not node.listing
+
+    def fetchMore(self, parent):
+        self.list_directory(self.node(parent))
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        if role == QtCore.Qt.DisplayRole:
+            return node.name
+        if role == QtCore.Qt.DecorationRole:
+            return self.folder_icon if node.is_directory else self.file_icon
+        if role == QtCore.Qt.ToolTipRole:
+            return node.path
+        return None
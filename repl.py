@@ -0,0 +1,310 @@
+from PyQt5 import QtWidgets, QtGui, QtCore
+from widgets import TitledDockWidget
+from runconfig import RunConfiguration
+import subprocess
+import threading
+import itertools
+import signal
+import socket
+import codecs
+import json
+import os
+
+
+class KernelConnection(QtCore.QObject):
+    '''Starts kernel.py in a child process and exchanges JSON messages with it'''
+
+    message = QtCore.pyqtSignal(dict)
+    kernel_started = QtCore.pyqtSignal(int)
+    kernel_exited = QtCore.pyqtSignal(int)
+
+    kernel_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'kernel.py')
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.process = None
+        self.connection = None
+        self.pending_requests = []
+        self.lock = threading.Lock()
+        self.request_ids = itertools.count(1)
+
+    @property
+    def running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self, cwd, configuration=None):
+        configuration = configuration or RunConfiguration()
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+        server.settimeout(0.2)
+        port = server.getsockname()[1]
+        command = configuration.python_command() + [self.kernel_path, '--port', str(port), '--cwd', cwd]
+        try:
+            self.process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                            stdin=subprocess.DEVNULL, env=configuration.process_environment())
+        except OSError:
+            server.close()
+            self.process = None
+            raise
+        self.kernel_started.emit(self.process.pid)
+        process = self.process
+        threading.Thread(target=self.read_output, args=(process,), daemon=True).start()
+        threading.Thread(target=self.read_messages, args=(process, server), daemon=True).start()
+
+    def read_output(self, process):
+        '''Relays output written straight to the kernel's file descriptors, e.g. by C extensions'''
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        while True:
+            chunk = process.stdout.read1(65536)
+            if not chunk:
+                break
+            self.message.emit({'type': 'stream', 'id': None, 'name': 'stdout', 'text': decoder.decode(chunk)})
+
+    def read_messages(self, process, server):
+        connection = None
+        with server:
+            while connection is None:
+                try:
+                    connection, address = server.accept()
+                except socket.timeout:
+                    if process.poll() is not None:
+                        return self.process_exited(process)
+        connection.settimeout(None)
+        with self.lock:
+            self.connection = connection
+            for request in self.pending_requests:
+                connection.sendall(request)
+            self.pending_requests = []
+        with connection, connection.makefile('rb') as stream:
+            for line in stream:
+                try:
+                    self.message.emit(json.loads(line.decode()))
+                except ValueError:
+                    continue
+        with self.lock:
+            if self.connection is connection:
+                self.connection = None
+        self.process_exited(process)
+
+    def process_exited(self, process):
+        exit_code = process.wait()
+        # A kernel that was replaced by a restart exits silently
+        if process is self.process:
+            self.kernel_exited.emit(exit_code)
+
+    def send(self, message_type, **data):
+        data['type'] = message_type
+        data.setdefault('id', next(self.request_ids))
+        request = (json.dumps(data) + '\n').encode()
+        with self.lock:
+            if self.connection is None:
+                self.pending_requests.append(request)
+            else:
+                try:
+                    self.connection.sendall(request)
+                except OSError:
+                    pass
+        return data['id']
+
+    def execute(self, code, filename='<kernel>'):
+        return self.send('execute', code=code, filename=filename)
+
+    def run_file(self, path):
+        return self.send('run_file', path=os.path.abspath(path))
+
+    def interrupt(self):
+        if self.running and os.name != 'nt':
+            self.process.send_signal(signal.SIGINT)
+
+    def shutdown(self):
+        with self.lock:
+            self.pending_requests = []
+            if self.connection is not None:
+                try:
+                    self.connection.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                self.connection = None
+        if self.running:
+            self.process.kill()
+        self.process = None
+
+
+class KernelInput(QtWidgets.QPlainTextEdit):
+    '''Input box of the kernel console: Enter runs, Shift+Enter adds a line, Up/Down walk the history'''
+
+    submitted = QtCore.pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.history = []
+        self.history_index = 0
+        self.setObjectName('console')
+        self.setPlaceholderText('>>> Enter Python code, Shift+Enter for a new line')
+        self.setMaximumHeight(80)
+
+    def keyPressEvent(self, event):
+        if event.key() in (QtCore.Qt.Key_Return, QtCore.Qt.Key_Enter) and \
+                not event.modifiers() & QtCore.Qt.ShiftModifier:
+            code = self.toPlainText()
+            if code.strip():
+                self.history.append(code)
+                self.history_index = len(self.history)
+                self.clear()
+                self.submitted.emit(code)
+        elif event.key() == QtCore.Qt.Key_Up and self.textCursor().blockNumber() == 0 and self.history:
+            self.history_index = max(self.history_index - 1, 0)
+            self.setPlainText(self.history[self.history_index])
+        elif event.key() == QtCore.Qt.Key_Down and self.history and \
+                self.textCursor().blockNumber() == self.blockCount() - 1:
+            self.history_index = min(self.history_index + 1, len(self.history))
+            self.setPlainText(self.history[self.history_index] if self.history_index < len(self.history) else '')
+        else:
+            super().keyPressEvent(event)
+
+
+class KernelConsoleDock(TitledDockWidget):
+    '''Interactive console backed by a persistent kernel process'''
+
+    kernel_reset = QtCore.pyqtSignal()  # The kernel restarted or exited, losing everything run in it
+
+    def __init__(self, parent=None):
+        super().__init__('Python Console', parent)
+        self.requests = {}
+        self.pending_output = []
+        self.configuration = None
+
+        container = QtWidgets.QWidget(self)
+        layout = QtWidgets.QVBoxLayout(container)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(0)
+
+        self.tool_bar = QtWidgets.QWidget(container)
+        self.tool_bar.setObjectName('console_toolbar')
+        tool_layout = QtWidgets.QHBoxLayout(self.tool_bar)
+        tool_layout.setContentsMargins(5, 2, 5, 2)
+        self.status_label = QtWidgets.QLabel('Not Started', self.tool_bar)
+        self.status_label.setObjectName('console_status')
+        tool_layout.addWidget(self.status_label)
+        tool_layout.addStretch()
+        for text, callback in (('Interrupt', self.interrupt), ('Restart', self.restart)):
+            button = QtWidgets.QPushButton(text, self.tool_bar)
+            button.setObjectName('console_button')
+            button.clicked.connect(callback)
+            tool_layout.addWidget(button)
+        layout.addWidget(self.tool_bar)
+
+        self.output_label = QtWidgets.QPlainTextEdit(container)
+        self.output_label.setReadOnly(True)
+        self.output_label.setObjectName('console')
+        layout.addWidget(self.output_label)
+
+        self.input_box = KernelInput(container)
+        self.input_box.submitted.connect(self.execute)
+        layout.addWidget(self.input_box)
+        self.setWidget(container)
+
+        self.flush_timer = QtCore.QTimer(self)
+        self.flush_timer.setInterval(50)
+        self.flush_timer.timeout.connect(self.flush_output)
+
+        self.kernel = KernelConnection(self)
+        self.kernel.message.connect(self.kernel_message)
+        self.kernel.kernel_exited.connect(self.kernel_exited)
+
+    def ensure_kernel(self):
+        '''Starts the kernel if it is not running, returning whether it could be'''
+        if not self.kernel.running:
+            self.requests = {}
+            configuration = self.configuration
+            try:
+                self.kernel.start(configuration and configuration.cwd() or os.getcwd(), configuration)
+            except OSError as error:
+                self.write(f'Could not start the kernel: {error}\n')
+                self.update_status('Not Started')
+                self.show()
+                return False
+            self.update_status('Starting')
+        self.show()
+        self.raise_()
+        return True
+
+    def update_status(self, status=None):
+        if status is None:
+            status = f'Busy ({len(self.requests)} queued)' if self.requests else 'Idle'
+        self.status_label.setText(status)
+
+    def write(self, text):
+        self.pending_output.append(text)
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    def flush_output(self):
+        self.flush_timer.stop()
+        if not self.pending_output:
+            return
+        text = ''.join(self.pending_output)
+        self.pending_output = []
+        scroll_bar = self.output_label.verticalScrollBar()
+        at_bottom = scroll_bar.value() == scroll_bar.maximum()
+        cursor = self.output_label.textCursor()
+        cursor.movePosition(QtGui.QTextCursor.End)
+        cursor.insertText(text)
+        if at_bottom:
+            scroll_bar.setValue(scroll_bar.maximum())
+
+    def echo(self, code):
+        lines = code.rstrip('\n').split('\n')
+        self.write('>>> ' + '\n... '.join(lines) + '\n')
+
+    def execute(self, code, filename='<kernel>', label=None, echo=None):
+        if not self.ensure_kernel():
+            return None
+        if echo is None:
+            self.echo(code)
+        else:
+            self.write(echo)
+        request_id = self.kernel.execute(code, filename)
+        self.requests[request_id] = label
+        self.update_status()
+        return request_id
+
+    def run_file(self, path):
+        if not self.ensure_kernel():
+            return None
+        self.write(f'>>> run {path}\n')
+        request_id = self.kernel.run_file(path)
+        self.requests[request_id] = os.path.basename(path)
+        self.update_status()
+        return request_id
+
+    def kernel_message(self, message):
+        if message['type'] == 'ready':
+            self.write(f"Python {message['version'].split()[0]} kernel started (PID {message['pid']})\n")
+            self.update_status()
+        elif message['type'] == 'stream':
+            self.write(message['text'])
+        elif message['type'] == 'result':
+            self.write(message['value'] + '\n')
+        elif message['type'] == 'done':
+            label = self.requests.pop(message['id'], None)
+            if label:
+                outcome = 'failed after' if message['error'] else 'finished in'
+                self.write(f"[{label} {outcome} {message['time']:.4f}s]\n")
+            self.update_status()
+
+    def kernel_exited(self, exit_code):
+        self.requests = {}
+        self.write(f'Kernel exited with code {exit_code}\n')
+        self.update_status('Not Started')
+        self.kernel_reset.emit()
+
+    def interrupt(self):
+        self.kernel.interrupt()
+
+    def restart(self):
+        self.kernel.shutdown()
+        self.output_label.clear()
+        self.ensure_kernel()
+        self.kernel_reset.emit()
@@ -0,0 +1,254 @@
+from PyQt5 import QtWidgets
+import shutil
+import shlex
+import json
+import os
+
+
+class RunConfiguration:
+    '''How a script is started: interpreter, its flags, arguments, environment and working directory'''
+
+    def __init__(self, name='Default', interpreter='python', arguments='', environment=None, working_directory='',
+                 optimize=0, python_optimize='', x_options='', unbuffered=False):
+        self.name = name
+        self.interpreter = interpreter
+        self.arguments = arguments
+        self.environment = dict(environment or {})
+        self.working_directory = working_directory
+        self.optimize = optimize
+        self.python_optimize = python_optimize
+        self.x_options = x_options
+        self.unbuffered = unbuffered
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def to_dict(self):
+        return dict(vars(self))
+
+    @property
+    def virtualenv(self):
+        '''The interpreter may be given as the directory of a virtualenv'''
+        return self.interpreter if os.path.isdir(self.interpreter) else None
+
+    def interpreter_path(self):
+        if self.virtualenv:
+            if os.name == 'nt':
+                return os.path.join(self.virtualenv, 'Scripts', 'python.exe')
+            return os.path.join(self.virtualenv, 'bin', 'python')
+        return self.interpreter or 'python'
+
+    def python_command(self):
+        '''The interpreter and its flags, to be followed by a script'''
+        command = [self.interpreter_path()]
+        if self.optimize:
+            command.append('-' + 'O' * self.optimize)
+        if self.unbuffered:
+            command.append('-u')
+        for option in self.x_options.split():
+            command += ['-X', option]
+        return command
+
+    def script_arguments(self):
+        return shlex.split(self.arguments)
+
+    def process_environment(self, **extra):
+        environment = dict(os.environ)
+        if self.virtualenv:
+            environment['VIRTUAL_ENV'] = self.virtualenv
+            environment['PATH'] = os.path.dirname(self.interpreter_path()) + os.pathsep + environment.get('PATH', '')
+        environment.update(self.environment)
+        if self.python_optimize:
+            environment['PYTHONOPTIMIZE'] = str(self.python_optimize)
+        if self.unbuffered:
+            environment['PYTHONUNBUFFERED'] = '1'
+        environment.update(extra)
+        return environment
+
+    def cwd(self):
+        return self.working_directory or None
+
+    def describe(self):
+        command = ' '.join(shlex.quote(part) for part in self.python_command())
+        try:
+            arguments = ' '.join(shlex.quote(part) for part in self.script_arguments())
+        except ValueError:
+            arguments = self.arguments  # Saved before arguments were checked, so shown as typed
+        return f'{self.name}: {command} {arguments}'.rstrip()
+
+    def problem(self):
+        '''Why scripts could not be started with this configuration, or None'''
+        if shutil.which(self.interpreter_path()) is None:
+            return f'The interpreter {self.interpreter_path()} was not found'
+        if self.working_directory and not os.path.isdir(self.working_directory):
+            return f'The working directory {self.working_directory} does not exist'
+        try:
+            self.script_arguments()
+        except ValueError as error:
+            return f'The arguments cannot be split: {error}'
+        return None
+
+
+def load_configurations(settings):
+    try:
+        configurations = [RunConfiguration.from_dict(data)
+                          for data in json.loads(settings.value('run_configurations', '[]'))]
+    except (ValueError, TypeError):
+        configurations = []
+    if not any(configuration.name == 'Default' for configuration in configurations):
+        configurations.insert(0, RunConfiguration())
+    return configurations
+
+
+def save_configurations(settings, configurations):
+    settings.setValue('run_configurations', json.dumps([configuration.to_dict() for configuration in configurations]))
+
+
+class RunConfigurationDialog(QtWidgets.QDialog):
+    '''Edits the list of saved run configurations'''
+
+    def __init__(self, configurations, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle('Run Configurations')
+        self.configurations = [RunConfiguration.from_dict(configuration.to_dict()) for configuration in configurations]
+        self.current = None
+
+        layout = QtWidgets.QHBoxLayout(self)
+        list_layout = QtWidgets.QVBoxLayout()
+        self.configuration_list = QtWidgets.QListWidget(self)
+        self.configuration_list.currentRowChanged.connect(self.select)
+        list_layout.addWidget(self.configuration_list)
+        buttons = QtWidgets.QHBoxLayout()
+        for text, callback in (('Add', self.add), ('Duplicate', self.duplicate), ('Remove', self.remove)):
+            button = QtWidgets.QPushButton(text, self)
+            button.clicked.connect(callback)
+            buttons.addWidget(button)
+        list_layout.addLayout(buttons)
+        layout.addLayout(list_layout)
+
+        form_layout = QtWidgets.QVBoxLayout()
+        form = QtWidgets.QFormLayout()
+        self.name_entry = QtWidgets.QLineEdit(self)
+        form.addRow('Name', self.name_entry)
+        interpreter_layout = QtWidgets.QHBoxLayout()
+        self.interpreter_entry = QtWidgets.QLineEdit(self)
+        self.interpreter_entry.setPlaceholderText('python, an interpreter path or a virtualenv directory')
+        interpreter_layout.addWidget(self.interpreter_entry)
+        browse_button = QtWidgets.QPushButton('...', self)
+        browse_button.clicked.connect(self.browse_interpreter)
+        interpreter_layout.addWidget(browse_button)
+        form.addRow('Interpreter', interpreter_layout)
+        self.arguments_entry = QtWidgets.QLineEdit(self)
+        form.addRow('Arguments', self.arguments_entry)
+        self.directory_entry = QtWidgets.QLineEdit(self)
+        self.directory_entry.setPlaceholderText('Project directory')
+        form.addRow('Working directory', self.directory_entry)
+        self.environment_entry = QtWidgets.QPlainTextEdit(self)
+        self.environment_entry.setPlaceholderText('NAME=value, one per line')
+        self.environment_entry.setMaximumHeight(90)
+        form.addRow('Environment', self.environment_entry)
+        self.optimize_entry = QtWidgets.QComboBox(self)
+        self.optimize_entry.addItems(['None', '-O', '-OO'])
+        form.addRow('Optimisation', self.optimize_entry)
+        self.python_optimize_entry = QtWidgets.QComboBox(self)
+        self.python_optimize_entry.addItems(['', '1', '2'])
+        form.addRow('PYTHONOPTIMIZE', self.python_optimize_entry)
+        self.x_options_entry = QtWidgets.QLineEdit(self)
+        self.x_options_entry.setPlaceholderText('e.g. dev importtime frozen_modules=off')
+        form.addRow('-X options', self.x_options_entry)
+        self.unbuffered_checkbox = QtWidgets.QCheckBox('Unbuffered output (-u)', self)
+        form.addRow('', self.unbuffered_checkbox)
+        form_layout.addLayout(form)
+        button_box = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel)
+        button_box.accepted.connect(self.accept)
+        button_box.rejected.connect(self.reject)
+        form_layout.addWidget(button_box)
+        layout.addLayout(form_layout)
+
+        for configuration in self.configurations:
+            self.configuration_list.addItem(configuration.name)
+        self.configuration_list.setCurrentRow(0)
+
+    def select(self, row):
+        self.store()
+        self.current = self.configurations[row] if 0 <= row < len(self.configurations) else None
+        if self.current is None:
+            return
+        self.name_entry.setText(self.current.name)
+        self.name_entry.setEnabled(self.current.name != 'Default')
+        self.interpreter_entry.setText(self.current.interpreter)
+        self.arguments_entry.setText(self.current.arguments)
+        self.directory_entry.setText(self.current.working_directory)
+        self.environment_entry.setPlainText('\n'.join(f'{name}={value}'
+                                                      for name, value in self.current.environment.items()))
+        self.optimize_entry.setCurrentIndex(self.current.optimize)
+        self.python_optimize_entry.setCurrentText(str(self.current.python_optimize))
+        self.x_options_entry.setText(self.current.x_options)
+        self.unbuffered_checkbox.setChecked(self.current.unbuffered)
+
+    def store(self):
+        '''Copies the form into the configuration being edited'''
+        if self.current is None:
+            return
+        name = self.name_entry.text().strip()
+        if name and not any(configuration.name == name for configuration in self.configurations
+                            if configuration is not self.current):
+            self.current.name = name
+        self.current.interpreter = self.interpreter_entry.text().strip() or 'python'
+        self.current.arguments = self.arguments_entry.text()
+        self.current.working_directory = self.directory_entry.text().strip()
+        environment = {}
+        for line in self.environment_entry.toPlainText().splitlines():
+            name, separator, value = line.partition('=')
+            if separator and name.strip():
+                environment[name.strip()] = value
+        self.current.environment = environment
+        self.current.optimize = self.optimize_entry.currentIndex()
+        self.current.python_optimize = self.python_optimize_entry.currentText()
+        self.current.x_options = self.x_options_entry.text()
+        self.current.unbuffered = self.unbuffered_checkbox.isChecked()
+        row = self.configurations.index(self.current)
+        self.configuration_list.item(row).setText(self.current.name)
+
+    def add_configuration(self, configuration):
+        names = {existing.name for existing in self.configurations}
+        base_name = configuration.name
+        number = 2
+        while configuration.name in names:
+            configuration.name = f'{base_name} {number}'
+            number += 1
+        self.configurations.append(configuration)
+        self.configuration_list.addItem(configuration.name)
+        self.configuration_list.setCurrentRow(len(self.configurations) - 1)
+
+    def add(self):
+        self.add_configuration(RunConfiguration('New Configuration'))
+
+    def duplicate(self):
+        self.store()
+        if self.current is not None:
+            self.add_configuration(RunConfiguration.from_dict(self.current.to_dict()))
+
+    def remove(self):
+        if self.current is None or self.current.name == 'Default':
+            return
+        row = self.configurations.index(self.current)
+        self.current = None
+        del self.configurations[row]
+        self.configuration_list.takeItem(row)
+
+    def browse_interpreter(self):
+        path, file_type = QtWidgets.QFileDialog.getOpenFileName(self, 'Select Interpreter')
+        if path:
+            self.interpreter_entry.setText(path)
+
+    def accept(self):
+        self.store()
+        for row, configuration in enumerate(self.configurations):
+            problem = configuration.problem()
+            if problem is not None:
+                self.configuration_list.setCurrentRow(row)
+                QtWidgets.QMessageBox.warning(self, 'Run Configurations', f'{configuration.name}: {problem}.')
+                return
+        super().accept()
@@ -0,0 +1,291 @@
+from PyQt5 import QtWidgets, QtCore
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from widgets import TitledDockWidget
+from trigrams import TrigramIndex, build_segment, required_trigrams
+import multiprocessing
+import searchworker
+import queue
+import re
+import os
+
+chunk_size = 4 << 20  # Bytes of files given to a worker at a time
+chunk_files = 256
+
+
+def file_chunks(paths):
+    '''Splits the files into chunks of roughly equal size, so every worker stays busy until the end'''
+    chunk, size = [], 0
+    for path in paths:
+        try:
+            size += os.path.getsize(path)
+        except OSError:
+            continue
+        chunk.append(path)
+        if size >= chunk_size or len(chunk) >= chunk_files:
+            yield chunk
+            chunk, size = [], 0
+    if chunk:
+        yield chunk
+
+
+class SearchThread(QtCore.QThread):
+    '''Hands chunks of files to a process pool and passes on the matches of each file as they come back'''
+
+    file_matched = QtCore.pyqtSignal(str, list)
+    progress = QtCore.pyqtSignal(int, int)
+
+    def __init__(self, executor, paths, pattern, regex=False, case_sensitive=False, whole_word=False,
+                 trigram_index=None):
+        super().__init__()
+        self.executor = executor
+        self.paths = paths
+        self.query = (pattern, regex, case_sensitive, whole_word)
+        self.trigram_index = trigram_index
+        self.narrowed = False
+        self.cancelled = False
+        self.error = None
+        self.futures = []
+        self.matched_files = 0
+        self.searched_files = 0
+
+    def run(self):
+        try:
+            self.search()
+        except Exception as error:
+            # From the index or a worker; escaping the thread would take the whole IDE down with it
+            self.error = error
+        finally:
+            for future in self.futures:
+                future.cancel()
+
+    def search(self):
+        trigrams = required_trigrams(self.query[0], self.query[1]) if self.trigram_index is not None else None
+        if trigrams:
+            self.paths = self.trigram_index.candidates(trigrams, self.paths)
+            self.narrowed = True
+        self.futures = [self.executor.submit(searchworker.search_files, chunk, *self.query)
+                        for chunk in file_chunks(self.paths)]
+        for future in as_completed(self.futures):
+            if self.cancelled:
+                break
+            if future.cancelled():
+                continue
+            results, searched = future.result()
+            self.searched_files += searched
+            for path, hits in results:
+                self.matched_files += 1
+                self.file_matched.emit(path, hits)
+            self.progress.emit(self.searched_files, self.matched_files)
+
+    def stop(self):
+        self.cancelled = True
+        for future in self.futures:
+            future.cancel()
+
+
+class TrigramIndexThread(QtCore.QThread):
+    '''Builds trigram index segments for batches of files in a process pool, one batch at a time'''
+
+    def __init__(self, executor, trigram_index):
+        super().__init__()
+        self.executor = executor
+        self.trigram_index = trigram_index
+        self.requests = queue.Queue()
+        self.cancelled = False
+
+    def request(self, paths):
+        self.trigram_index.queue(paths)
+        self.requests.put((self.trigram_index.generation, paths))
+        if not self.isRunning():
+            self.start()
+
+    def run(self):
+        while not self.cancelled:
+            request = self.requests.get()
+            if request is None:
+                return
+            generation, paths = request
+            if generation != self.trigram_index.generation:
+                continue
+            futures = [self.executor.submit(build_segment, chunk) for chunk in file_chunks(paths)]
+            for future in as_completed(futures):
+                if self.cancelled:
+                    break
+                if not future.cancelled() and future.exception() is None:
+                    self.trigram_index.add_segment(*future.result(), generation=generation)
+            for future in futures:
+                future.cancel()
+
+    def stop(self):
+        self.cancelled = True
+        self.requests.put(None)
+        self.wait()
+
+
+class FindInFilesDock(TitledDockWidget):
+    '''Searches the files of the project for text or a regular expression'''
+
+    frame_activated = QtCore.pyqtSignal(str, int)
+
+    def __init__(self, project_index, index_executor, parent=None, workers=None, use_index=True):
+        super().__init__('Find in Files', parent)
+        self.project_index = project_index
+        self.index_executor = index_executor
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = None
+        self.search_thread = None
+        self.trigram_index = TrigramIndex() if use_index else None
+        self.index_thread = None
+        self.file_items = {}
+        self.hit_count = 0
+
+        container = QtWidgets.QWidget(self)
+        layout = QtWidgets.QVBoxLayout(container)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(0)
+
+        self.tool_bar = QtWidgets.QWidget(container)
+        self.tool_bar.setObjectName('console_toolbar')
+        tool_layout = QtWidgets.QHBoxLayout(self.tool_bar)
+        tool_layout.setContentsMargins(5, 2, 5, 2)
+        self.query_entry = QtWidgets.QLineEdit(self.tool_bar)
+        self.query_entry.setPlaceholderText('Find in project')
+        self.query_entry.returnPressed.connect(self.search)
+        tool_layout.addWidget(self.query_entry)
+        self.regex_checkbox = QtWidgets.QCheckBox('Regex', self.tool_bar)
+        self.case_checkbox = QtWidgets.QCheckBox('Match Case', self.tool_bar)
+        self.word_checkbox = QtWidgets.QCheckBox('Words', self.tool_bar)
+        self.case_checkbox.setToolTip('Without it, case is only ignored for ASCII letters')
+        self.word_checkbox.setToolTip('Word boundaries only know ASCII letters, digits and _')
+        self.regex_checkbox.setToolTip('Files are searched as UTF-8 bytes, so matching is ASCII only and '
+                                       'escapes such as \\N{...} and \\uXXXX are not supported')
+        for checkbox in (self.regex_checkbox, self.case_checkbox, self.word_checkbox):
+            tool_layout.addWidget(checkbox)
+        for text, callback in (('Search', self.search), ('Stop', self.stop)):
+            button = QtWidgets.QPushButton(text, self.tool_bar)
+            button.setObjectName('console_button')
+            button.clicked.connect(callback)
+            tool_layout.addWidget(button)
+        self.status_label = QtWidgets.QLabel('', self.tool_bar)
+        self.status_label.setObjectName('console_status')
+        tool_layout.addWidget(self.status_label)
+        layout.addWidget(self.tool_bar)
+
+        self.results_tree = QtWidgets.QTreeWidget(container)
+        self.results_tree.setObjectName('hotspots')
+        self.results_tree.setHeaderLabels(['Match', 'Line'])
+        self.results_tree.header().setSectionResizeMode(0, QtWidgets.QHeaderView.Stretch)
+        self.results_tree.setUniformRowHeights(True)
+        self.results_tree.itemActivated.connect(self.open_result)
+        layout.addWidget(self.results_tree)
+
+        self.setWidget(container)
+
+        if self.trigram_index is not None:
+            self.project_index.ready.connect(self.rebuild_index)
+            self.project_index.files_changed.connect(self.update_index)
+            if self.project_index.file_index is not None:
+                self.rebuild_index()
+
+    @property
+    def root(self):
+        return os.getcwd()
+
+    def rebuild_index(self):
+        self.trigram_index.clear()
+        if self.index_thread is None:
+            # Indexing runs in the background pool rather than the search pool, so it never holds up a search
+            self.index_thread = TrigramIndexThread(self.index_executor, self.trigram_index)
+        self.index_thread.request(self.project_index.paths())
+
+    def update_index(self, changed, removed):
+        self.trigram_index.remove(removed)
+        if self.trigram_index.wasteful:
+            self.rebuild_index()
+        elif changed and self.index_thread is not None:
+            # Before the first build there is no thread, and that build will read the files anyway
+            self.index_thread.request(changed)
+
+    def start_search(self, text=''):
+        '''Shows the dock with the query box focused, starting from the given text'''
+        if text:
+            self.query_entry.setText(text)
+        self.show()
+        self.raise_()
+        self.query_entry.setFocus()
+        self.query_entry.selectAll()
+
+    def search(self):
+        pattern = self.query_entry.text()
+        if not pattern:
+            return
+        try:
+            # The bytes expression the workers search with, which accepts less than a str one
+            searchworker.compile_query(pattern, self.regex_checkbox.isChecked(), self.case_checkbox.isChecked(),
+                                       self.word_checkbox.isChecked())
+        except re.error as error:
+            self.status_label.setText(f'Invalid expression: {error}')
+            return
+        self.stop()
+        if self.executor is None:
+            # Spawned, as forking a process with Qt's threads running is not safe
+            self.executor = ProcessPoolExecutor(self.workers, multiprocessing.get_context('spawn'))
+        self.results_tree.clear()
+        self.file_items = {}
+        self.hit_count = 0
+        self.search_thread = SearchThread(self.executor, self.project_index.paths(), pattern,
+                                          self.regex_checkbox.isChecked(), self.case_checkbox.isChecked(),
+                                          self.word_checkbox.isChecked(), self.trigram_index)
+        self.search_thread.file_matched.connect(self.add_file)
+        self.search_thread.progress.connect(self.show_progress)
+        self.search_thread.finished.connect(self.search_finished)
+        self.status_label.setText('Searching...')
+        self.search_thread.start()
+
+    def stop(self):
+        if self.search_thread is not None and self.search_thread.isRunning():
+            self.search_thread.stop()
+            self.search_thread.wait()
+
+    def shutdown(self):
+        self.stop()
+        if self.index_thread is not None:
+            self.index_thread.stop()
+            self.index_thread = None
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+    def add_file(self, path, hits):
+        if self.sender() is not self.search_thread:
+            return  # Still queued from a search that was stopped
+        file_item = QtWidgets.QTreeWidgetItem([f'{os.path.relpath(path, self.root)} ({len(hits)})', ''])
+        file_item.setData(0, QtCore.Qt.UserRole, (path, hits[0][0]))
+        file_item.setToolTip(0, path)
+        for line, column, text in hits:
+            hit_item = QtWidgets.QTreeWidgetItem([text.strip(), str(line)])
+            hit_item.setData(0, QtCore.Qt.UserRole, (path, line))
+            file_item.addChild(hit_item)
+        self.results_tree.addTopLevelItem(file_item)
+        file_item.setExpanded(len(self.file_items) < 50)
+        self.file_items[path] = file_item
+        self.hit_count += len(hits)
+
+    def show_progress(self, searched, matched):
+        self.status_label.setText(f'{self.hit_count} matches in {matched} files ({searched} searched)')
+
+    def search_finished(self):
+        thread = self.sender()
+        if thread is not self.search_thread:
+            return
+        if thread.error is not None:
+            self.status_label.setText(f'Search failed: {thread.error}')
+            return
+        summary = f'{self.hit_count} matches in {thread.matched_files} of {thread.searched_files} files'
+        if thread.narrowed:
+            summary += ' picked by the trigram index'
+        self.status_label.setText(f"{summary}{' (stopped)' if thread.cancelled else ''}")
+
+    def open_result(self, item, column=0):
+        path, line = item.data(0, QtCore.Qt.UserRole)
+        self.frame_activated.emit(path, line)
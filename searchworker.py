@@ -0,0 +1,74 @@
+'''Searches the text of project files on behalf of the IDE's find in files
+
+Runs in worker processes, so it only depends on the standard library.
+'''
+import mmap
+import re
+
+binary_probe_size = 8192
+
+
+def compile_query(pattern, regex=False, case_sensitive=False, whole_word=False):
+    '''Bytes expression for a search, so files can be searched without decoding them
+
+    Bytes expressions only know ASCII, so ignoring case and whole words (\\b, \\w) only
+    apply to ASCII letters, and str-only escapes such as \\N{...} and \\uXXXX raise re.error.
+    '''
+    expression = pattern.encode('utf-8')
+    if not regex:
+        expression = re.escape(expression)
+    if whole_word:
+        expression = rb'\b(?:' + expression + rb')\b'
+    return re.compile(expression, re.MULTILINE | (0 if case_sensitive else re.IGNORECASE))
+
+
+def is_binary(data):
+    return b'\0' in data[:binary_probe_size]
+
+
+def search_file(path, expression, max_hits=1000, max_line_length=300):
+    '''[(line, column, text)] of the matches in a file, or None if it is binary or unreadable'''
+    try:
+        with open(path, 'rb') as file:
+            try:
+                data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # Empty files cannot be mapped
+                return []
+            with data:
+                if is_binary(data):
+                    return None
+                hits = []
+                line = 1
+                counted = 0
+                last_line_start = -1
+                for match in expression.finditer(data):
+                    start = match.start()
+                    line_start = data.rfind(b'\n', 0, start) + 1
+                    if line_start == last_line_start:
+                        continue  # One hit per line is enough to jump to it
+                    line += data[counted:line_start].count(b'\n')
+                    counted = last_line_start = line_start
+                    line_end = data.find(b'\n', start)
+                    text = data[line_start:line_end if line_end != -1 else len(data)]
+                    column = len(data[line_start:start].decode('utf-8', 'replace'))
+                    hits.append((line, column, text[:max_line_length].decode('utf-8', 'replace').rstrip()))
+                    if len(hits) >= max_hits:
+                        break
+                return hits
+    except OSError:
+        return None
+
+
+def search_files(paths, pattern, regex=False, case_sensitive=False, whole_word=False, max_hits=1000):
+    '''[(path, hits)] for the files of a chunk with matches, and how many of them were text files'''
+    expression = compile_query(pattern, regex, case_sensitive, whole_word)
+    results = []
+    searched = 0
+    for path in paths:
+        hits = search_file(path, expression, max_hits)
+        if hits is None:
+            continue
+        searched += 1
+        if hits:
+            results.append((path, hits))
+    return results, searched
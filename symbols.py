@@ -0,0 +1,342 @@
+from PyQt5 import QtCore
+from concurrent.futures import as_completed
+from symbolworker import index_files, load_data, data_version
+import threading
+import sqlite3
+import queue
+import time
+import os
+
+store_lifetime = 30 * 24 * 60 * 60  # Seconds an entry no project has used is kept for
+chunk_files = 64
+
+
+def module_name(path, root):
+    '''Dotted module name of a file relative to the project root, or None outside it'''
+    relative = os.path.relpath(path, root)
+    if relative.startswith('..') or not relative.endswith('.py'):
+        return None
+    parts = relative[:-3].split(os.sep)
+    if parts[-1] == '__init__':
+        parts.pop()
+    return '.'.join(parts)
+
+
+class SymbolStore:
+    '''Parsed symbols and references of Python files keyed by content hash, shared by every project'''
+
+    def __init__(self, database):
+        os.makedirs(os.path.dirname(os.path.abspath(database)), exist_ok=True)
+        self.connection = sqlite3.connect(database, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        if self.connection.execute('PRAGMA user_version').fetchone()[0] != data_version:
+            # Stored by a version of the parser that collected different symbols
+            with self.connection:
+                self.connection.execute('DROP TABLE IF EXISTS symbols')
+                self.connection.execute(f'PRAGMA user_version = {data_version}')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS symbols (hash TEXT PRIMARY KEY, data TEXT, used REAL)')
+        with self.connection:
+            self.connection.execute('DELETE FROM symbols WHERE used < ?', (time.time() - store_lifetime,))
+
+    def load(self, hashes):
+        '''{hash: data} of the hashes that are stored, where data is None for files that did not parse'''
+        found = {}
+        hashes = list(hashes)
+        for start in range(0, len(hashes), 500):
+            batch = hashes[start:start + 500]
+            marks = ', '.join('?' * len(batch))
+            found.update(self.connection.execute(f'SELECT hash, data FROM symbols WHERE hash IN ({marks})', batch))
+        with self.connection:
+            self.connection.executemany('UPDATE symbols SET used = ? WHERE hash = ?',
+                                        [(time.time(), digest) for digest in found])
+        return found
+
+    def save(self, entries):
+        with self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO symbols VALUES (?, ?, ?)',
+                                        [(digest, data, time.time()) for digest, data in entries])
+
+    def close(self):
+        self.connection.close()
+
+
+class SymbolIndex:
+    '''Symbols and references of every Python file in the project, with the files each name appears in'''
+
+    def __init__(self, root=None):
+        self.lock = threading.Lock()
+        self.root = root
+        self.generation = 0
+        self.files = {}
+        self.defined = {}
+        self.referenced = {}
+        self.modules = {}
+
+    def clear(self, root):
+        with self.lock:
+            self.generation += 1
+            self.root = root
+            self.files = {}
+            self.defined = {}
+            self.referenced = {}
+            self.modules = {}
+
+    def set_file(self, path, digest, symbols, references, generation=None):
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                return  # Parsed for the project as it was before it was cleared
+            self.forget(path)
+            self.files[path] = (digest, symbols, references)
+            for symbol in symbols:
+                self.defined.setdefault(symbol.name, set()).add(path)
+            for name in references:
+                self.referenced.setdefault(name, set()).add(path)
+            module = module_name(path, self.root)
+            if module:
+                self.modules[module] = path
+
+    def remove(self, paths):
+        with self.lock:
+            for path in paths:
+                self.forget(path)
+
+    def forget(self, path):
+        entry = self.files.pop(path, None)
+        if entry is None:
+            return
+        digest, symbols, references = entry
+        for name in {symbol.name for symbol in symbols}:
+            self.discard(self.defined, name, path)
+        for name in references:
+            self.discard(self.referenced, name, path)
+        module = module_name(path, self.root)
+        if module and self.modules.get(module) == path:
+            del self.modules[module]
+
+    @staticmethod
+    def discard(names, name, path):
+        paths = names.get(name)
+        if paths is not None:
+            paths.discard(path)
+            if not paths:
+                del names[name]
+
+    def file_hash(self, path):
+        entry = self.files.get(path)
+        return entry[0] if entry is not None else None
+
+    def symbols(self, path):
+        entry = self.files.get(path)
+        return entry[1] if entry is not None else []
+
+    def definitions(self, name):
+        '''[(path, symbol)] of everything named name defined anywhere in the project'''
+        with self.lock:
+            return [(path, symbol) for path in self.defined.get(name, ()) for symbol in self.files[path][1]
+                    if symbol.name == name]
+
+    def usages(self, name):
+        '''[(path, line, column)] of every place name is used'''
+        with self.lock:
+            found = []
+            for path in self.referenced.get(name, ()):
+                positions = self.files[path][2][name]
+                found += [(path, positions[index], positions[index + 1]) for index in range(0, len(positions), 2)]
+            return sorted(found)
+
+    def names(self):
+        with self.lock:
+            return list(self.defined)
+
+    def find_definitions(self, name, path, line, attribute=False):
+        '''([(path, symbol or None)], resolved) of what a name used at a line of a file may refer to
+
+        A plain name is looked up in the scopes around the line, following imports into the
+        project's modules, and when found that one definition is given with resolved True. An
+        attribute, or a name the file does not bind, could be any definition in the project, so
+        all of them are given, those in the same file first. A symbol of None stands for a
+        whole module.
+        '''
+        with self.lock:
+            if not attribute:
+                symbol = self.visible_definition(name, path, line)
+                if symbol is not None and symbol.kind == 'import':
+                    return [self.resolve_import(symbol.detail, path) or (path, symbol)], True
+                if symbol is not None:
+                    return [(path, symbol)], True
+            # Parameters are only seen from inside their function, so they cannot be what this is
+            found = [(found_path, symbol) for found_path in self.defined.get(name, ())
+                     for symbol in self.files[found_path][1]
+                     if symbol.name == name and symbol.kind not in ('import', 'parameter')]
+            return sorted(found, key=lambda item: (item[0] != path, attribute and not item[1].scope,
+                                                   item[0], item[1].line)), False
+
+    def visible_definition(self, name, path, line):
+        '''The definition of name in a file that a use of it at a line sees, or None'''
+        symbols = self.symbols(path)
+        # Scopes of the functions around the line; class bodies are not seen from inside their methods
+        scopes = {''}
+        for symbol in symbols:
+            if symbol.kind in ('function', 'method') and symbol.line <= line <= symbol.end_line:
+                scopes.add(f'{symbol.scope}.{symbol.name}' if symbol.scope else symbol.name)
+        enclosing = max(scopes, key=len)
+        for symbol in symbols:
+            if symbol.kind == 'class' and symbol.line < line <= symbol.end_line:
+                class_scope = f'{symbol.scope}.{symbol.name}' if symbol.scope else symbol.name
+                if len(class_scope) > len(enclosing):
+                    scopes.add(class_scope)
+        candidates = [symbol for symbol in symbols if symbol.name == name and symbol.scope in scopes]
+        if not candidates:
+            return None
+        # The innermost scope, then the last definition before the line, else the first after it
+        return max(candidates, key=lambda symbol: (len(symbol.scope), symbol.line <= line,
+                                                   symbol.line if symbol.line <= line else -symbol.line))
+
+    def resolve_module(self, module, path):
+        '''Path of the project module a dotted name imported by a file refers to, or None
+
+        Leading dots make the name relative to the file's package. Absolute names are tried from
+        the project root, then as the tail of a module in a subdirectory such as src.
+        '''
+        dotted = module.lstrip('.')
+        level = len(module) - len(dotted)
+        if level:
+            package = module_name(path, self.root)
+            if package is None:
+                return None
+            parts = package.split('.') if package else []
+            if os.path.basename(path) != '__init__.py':
+                parts.pop()
+            if level - 1 > len(parts):
+                return None
+            parts = parts[:len(parts) - level + 1] + ([dotted] if dotted else [])
+            return self.modules.get('.'.join(parts))
+        found = self.modules.get(dotted)
+        if found is None and dotted:
+            suffix = f'.{dotted}'
+            found = next((found_path for name, found_path in self.modules.items() if name.endswith(suffix)), None)
+        return found
+
+    def resolve_import(self, detail, path, depth=0):
+        '''(path, symbol or None) an imported name refers to, following re-exports, or None outside the project'''
+        module_path = self.resolve_module(detail, path)
+        if module_path is not None:
+            return module_path, None
+        dotted = detail.lstrip('.')
+        module, _, name = dotted.rpartition('.')
+        module = detail[:len(detail) - len(dotted)] + module
+        if not module:
+            return None
+        module_path = self.resolve_module(module, path)
+        if module_path is None:
+            return None
+        symbols = [symbol for symbol in self.symbols(module_path) if symbol.name == name and not symbol.scope]
+        if not symbols:
+            return module_path, None
+        symbol = min(symbols, key=lambda symbol: (symbol.kind == 'import', symbol.line))
+        if symbol.kind == 'import' and depth < 8:
+            return self.resolve_import(symbol.detail, module_path, depth + 1) or (module_path, symbol)
+        return module_path, symbol
+
+
+class SymbolIndexThread(QtCore.QThread):
+    '''Fills the symbol index from the store, parsing only files whose content hash it has not seen'''
+
+    files_indexed = QtCore.pyqtSignal(list)
+
+    def __init__(self, executor, database, symbol_index):
+        super().__init__()
+        self.executor = executor
+        self.database = database
+        self.symbol_index = symbol_index
+        self.requests = queue.Queue()
+        self.cancelled = False
+
+    def request(self, paths_and_hashes):
+        self.requests.put((self.symbol_index.generation, paths_and_hashes))
+        if not self.isRunning():
+            self.start()
+
+    def run(self):
+        store = SymbolStore(self.database)
+        while not self.cancelled:
+            request = self.requests.get()
+            if request is None:
+                break
+            generation, paths_and_hashes = request
+            if generation != self.symbol_index.generation:
+                continue
+            stored = store.load({digest for path, digest in paths_and_hashes if digest})
+            indexed, missing = [], []
+            for path, digest in paths_and_hashes:
+                if generation != self.symbol_index.generation:
+                    break  # The project changed, and set_file drops anything added for it meanwhile
+                if digest in stored:
+                    self.add(path, digest, stored[digest], generation)
+                    indexed.append(path)
+                else:
+                    missing.append(path)
+            if indexed:
+                self.files_indexed.emit(indexed)
+            if generation != self.symbol_index.generation:
+                continue
+            futures = [self.executor.submit(index_files, missing[start:start + chunk_files])
+                       for start in range(0, len(missing), chunk_files)]
+            for future in as_completed(futures):
+                if self.cancelled or generation != self.symbol_index.generation:
+                    break
+                if future.cancelled() or future.exception() is not None:
+                    continue
+                results = future.result()
+                store.save([(digest, data) for path, digest, data in results])
+                for path, digest, data in results:
+                    self.add(path, digest, data, generation)
+                self.files_indexed.emit([path for path, digest, data in results])
+            for future in futures:
+                future.cancel()
+        store.close()
+
+    def add(self, path, digest, data, generation):
+        symbols, references = load_data(data) if data is not None else ([], {})
+        self.symbol_index.set_file(path, digest, symbols, references, generation)
+
+    def stop(self):
+        self.cancelled = True
+        self.requests.put(None)
+        self.wait()
+
+
+class ProjectSymbols(QtCore.QObject):
+    '''Keeps the symbol index of the open project in step with its file index'''
+
+    files_indexed = QtCore.pyqtSignal(list)
+
+    def __init__(self, project_index, executor, database, parent=None):
+        super().__init__(parent)
+        self.project_index = project_index
+        self.index = SymbolIndex()
+        self.thread = SymbolIndexThread(executor, database, self.index)
+        self.thread.files_indexed.connect(self.files_indexed)
+        self.project_index.ready.connect(self.rebuild)
+        self.project_index.files_changed.connect(self.update)
+        if self.project_index.file_index is not None:
+            self.rebuild()
+
+    def python_files(self, paths):
+        file_index = self.project_index.file_index
+        return [(path, file_index.file_hash(path)) for path in paths if path.endswith('.py')]
+
+    def rebuild(self):
+        # Clearing moves the index to a new generation, which drops the requests made so far
+        self.index.clear(self.project_index.root)
+        self.thread.request(self.python_files(self.project_index.paths()))
+
+    def update(self, changed, removed):
+        self.index.remove(removed)
+        changed = [(path, digest) for path, digest in self.python_files(changed)
+                   if digest is None or digest != self.index.file_hash(path)]
+        if changed:
+            self.thread.request(changed)
+
+    def stop(self):
+        self.thread.stop()
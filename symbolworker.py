@@ -0,0 +1,191 @@
+'''Finds the symbols defined in Python source and the names it refers to
+
+Used in worker processes and threads, so it only depends on the standard library.
+
+A symbol is (name, kind, line, column, end_line, scope, detail) where kind is one of
+class, function, method, parameter, variable or import, scope is the dotted name of the
+class or function it is defined in, and detail is a function's parameters or the dotted
+target of an import, with leading dots kept for relative imports. Names bound by except
+clauses, comprehensions and := are variables of the scope around them.
+'''
+from collections import namedtuple
+import warnings
+import hashlib
+import json
+import ast
+
+Symbol = namedtuple('Symbol', 'name kind line column end_line scope detail')
+data_version = 2  # Bumped whenever what is collected changes, so stored data is parsed again
+
+
+def parameters(node):
+    arguments = node.args
+    names = [argument.arg for argument in getattr(arguments, 'posonlyargs', []) + arguments.args]
+    if arguments.vararg:
+        names.append(f'*{arguments.vararg.arg}')
+    elif arguments.kwonlyargs:
+        names.append('*')
+    names += [argument.arg for argument in arguments.kwonlyargs]
+    if arguments.kwarg:
+        names.append(f'**{arguments.kwarg.arg}')
+    return f"({', '.join(names)})"
+
+
+def parameter_nodes(node):
+    arguments = node.args
+    nodes = getattr(arguments, 'posonlyargs', []) + arguments.args + arguments.kwonlyargs
+    return nodes + [argument for argument in (arguments.vararg, arguments.kwarg) if argument is not None]
+
+
+def target_names(target):
+    '''(name, node) for every plain name bound by an assignment target'''
+    if isinstance(target, ast.Name):
+        yield target.id, target
+    elif isinstance(target, (ast.Tuple, ast.List)):
+        for element in target.elts:
+            yield from target_names(element)
+    elif isinstance(target, ast.Starred):
+        yield from target_names(target.value)
+
+
+class SymbolCollector(ast.NodeVisitor):
+
+    def __init__(self):
+        self.symbols = []
+        self.references = {}
+        self.scopes = []
+        self.in_class = [False]
+
+    def add(self, name, kind, node, detail=''):
+        end_line = getattr(node, 'end_lineno', None)
+        if end_line is None:
+            # Before Python 3.8, where only the first line of a node is known
+            end_line = max(getattr(child, 'lineno', 0) for child in ast.walk(node))
+        self.symbols.append(Symbol(name, kind, node.lineno, node.col_offset, end_line, '.'.join(self.scopes), detail))
+
+    def visit_ClassDef(self, node):
+        self.add(node.name, 'class', node)
+        for child in node.decorator_list + node.bases + node.keywords:
+            self.visit(child)
+        self.scopes.append(node.name)
+        self.in_class.append(True)
+        for child in node.body:
+            self.visit(child)
+        self.in_class.pop()
+        self.scopes.pop()
+
+    def visit_FunctionDef(self, node):
+        self.add(node.name, 'method' if self.in_class[-1] else 'function', node, parameters(node))
+        for child in node.decorator_list + [node.args] + ([node.returns] if node.returns else []):
+            self.visit(child)
+        self.scopes.append(node.name)
+        self.in_class.append(False)
+        for argument in parameter_nodes(node):
+            self.add(argument.arg, 'parameter', argument)
+        for child in node.body:
+            self.visit(child)
+        self.in_class.pop()
+        self.scopes.pop()
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_assignment(self, node, targets):
+        for target in targets:
+            for name, name_node in target_names(target):
+                self.add(name, 'variable', name_node)
+        self.generic_visit(node)
+
+    def visit_Assign(self, node):
+        self.visit_assignment(node, node.targets)
+
+    def visit_AnnAssign(self, node):
+        self.visit_assignment(node, [node.target])
+
+    def visit_AugAssign(self, node):
+        self.generic_visit(node)
+
+    def visit_For(self, node):
+        self.visit_assignment(node, [node.target])
+
+    visit_AsyncFor = visit_For
+
+    def visit_withitem(self, node):
+        if node.optional_vars is not None:
+            self.visit_assignment(node, [node.optional_vars])
+        else:
+            self.generic_visit(node)
+
+    def visit_ExceptHandler(self, node):
+        if node.name:
+            self.add(node.name, 'variable', node)
+        self.generic_visit(node)
+
+    def visit_comprehension(self, node):
+        self.visit_assignment(node, [node.target])
+
+    def visit_NamedExpr(self, node):
+        self.visit_assignment(node, [node.target])
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            name = alias.asname or alias.name.split('.')[0]
+            self.add(name, 'import', node, alias.name if alias.asname else alias.name.split('.')[0])
+
+    def visit_ImportFrom(self, node):
+        module = '.' * node.level + (node.module or '')
+        for alias in node.names:
+            if alias.name != '*':
+                separator = '' if module.endswith('.') else '.'
+                self.add(alias.asname or alias.name, 'import', node, f'{module}{separator}{alias.name}')
+
+    def reference(self, name, line, column):
+        positions = self.references.get(name)
+        if positions is None:
+            positions = self.references[name] = []
+        positions += (line, column)
+
+    def visit_Name(self, node):
+        self.reference(node.id, node.lineno, node.col_offset)
+
+    def visit_Attribute(self, node):
+        self.generic_visit(node)
+        end_column = getattr(node, 'end_col_offset', None)
+        if end_column is not None and getattr(node, 'end_lineno', node.lineno) == node.lineno:
+            self.reference(node.attr, node.lineno, end_column - len(node.attr))
+
+
+def parse_symbols(source, filename='<unknown>'):
+    '''(symbols, references) of some source, raising SyntaxError if it does not parse
+
+    References map each name used to a flat list of line, column pairs.
+    '''
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')  # Invalid escapes and the like are the file's business
+        tree = ast.parse(source, filename)
+    collector = SymbolCollector()
+    collector.visit(tree)
+    return collector.symbols, collector.references
+
+
+def index_files(paths):
+    '''[(path, content hash, json data or None)] for a chunk of files, where the data holds symbols and references'''
+    results = []
+    for path in paths:
+        try:
+            with open(path, 'rb') as file:
+                source = file.read()
+        except OSError:
+            continue
+        digest = hashlib.sha1(source).hexdigest()
+        try:
+            symbols, references = parse_symbols(source, path)
+        except (SyntaxError, ValueError, RecursionError):
+            results.append((path, digest, None))
+            continue
+        results.append((path, digest, json.dumps([symbols, references])))
+    return results
+
+
+def load_data(data):
+    symbols, references = json.loads(data)
+    return [Symbol(*symbol) for symbol in symbols], references
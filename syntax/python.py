@@ -2,17 +2,16 @@
 from PyQt5.QtGui import QColor, QTextCharFormat
 from PyQt5.QtCore import QRegExp
 
-expressions = {
-    'keywords': [QRegExp(r'\b' + x + r'\b') for x in [
+keywords = [
         'and', 'assert', 'break', 'class', 'continue', 'def',
         'del', 'elif', 'else', 'except', 'finally',
         'for', 'from', 'global', 'if', 'import', 'in',
         'is', 'lambda', 'not', 'or', 'pass', 'raise',
         'return', 'try', 'while', 'yield', 'with',
         'None', 'True', 'False', 'as'
-    ]],
+    ]
 
-    'builtins': [QRegExp(r'\b' + x + r'\b') for x in [
+builtins = [
         'abs', 'all', 'any', 'ascii', 'bin', 'bool', 'breakpoint',
         'bytearray', 'bytes', 'callable', 'chr', '@classmethod', 'compile',
         'complex', 'delattr', 'dict', 'dir', 'divmod', 'enumerate', 'eval',
@@ -22,7 +21,12 @@ expressions = {
         'oct', 'open', 'ord', 'pow', 'print', 'property', 'range', 'repr', 'reversed', 'round',
         'set', 'setattr', 'slice', 'sorted', 'staticmethod', 'str', 'sum', 'super', 'tuple',
         'type', 'vars', 'zip', '__import__'
-    ]],
+    ]
+
+expressions = {
+    'keywords': [QRegExp(r'\b' + x + r'\b') for x in keywords],
+
+    'builtins': [QRegExp(r'\b' + x + r'\b') for x in builtins],
 
     'comments': [QRegExp(x) for x in [
         r'#.*'
@@ -62,6 +66,9 @@ expressions = {
 # Default width to indent at
 indent_width = 4
 
+# Comment which starts a new code cell
+cell_marker = QRegExp(r'^\s*#\s*%%')
+
 # What line should trigger an indent on newline
 indent_expressions = [
     # Functions
@@ -98,4 +105,10 @@ theme = {
     'comments': QColor(0x808080),
     'numbers': QColor(0xD2945D),
     'self': QColor(0xE06C75),
+    'cell_separator': QColor(0x61AFEF),
+    'error_line': QColor(0x6B2F36),
+    'breakpoint': QColor(0xE06C75),
+    'execution_line': QColor(0xE5C07B),
+    'covered_line': QColor(0x98C379),
+    'uncovered_line': QColor(0xE06C75),
 }
\ No newline at end of file
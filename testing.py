@@ -0,0 +1,338 @@
+from PyQt5 import QtWidgets, QtGui, QtCore
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from widgets import TitledDockWidget
+from runconfig import RunConfiguration
+from ignores import IgnoreRules
+import subprocess
+import tempfile
+import hashlib
+import json
+import ast
+import os
+
+outcome_colours = {
+    'passed': 0x98C379,
+    'cached': 0x7F9F6F,
+    'failed': 0xE06C75,
+    'error': 0xE06C75,
+    'skipped': 0xE5C07B,
+}
+
+
+def is_test_file(name):
+    return name.endswith('.py') and (name.startswith('test_') or name.endswith('_test.py'))
+
+
+def find_tests(path):
+    '''(name, line) of the tests in a file, found without importing it'''
+    with open(path, 'rb') as file:
+        tree = ast.parse(file.read(), path)
+    tests = []
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name.startswith('test'):
+            tests.append((node.name, node.lineno))
+        elif isinstance(node, ast.ClassDef):
+            bases = [getattr(base, 'attr', getattr(base, 'id', '')) for base in node.bases]
+            if node.name.startswith('Test') or any(base.endswith('TestCase') for base in bases):
+                for item in node.body:
+                    if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)) and item.name.startswith('test'):
+                        tests.append((f'{node.name}::{item.name}', item.lineno))
+    return tests
+
+
+def discover_tests(root, excludes=None):
+    '''[(file, [(name, line), ...]), ...] for every test file under the root the project does not ignore'''
+    discovered = []
+    for directory, directories, files in IgnoreRules(root, excludes).walk():
+        for entry in files:
+            if is_test_file(entry.name):
+                try:
+                    tests = find_tests(entry.path)
+                except (SyntaxError, ValueError, OSError):
+                    tests = []
+                discovered.append((entry.path, tests))
+    return sorted(discovered)
+
+
+class TestCache:
+    '''The tests of each file that passed, valid while none of the project files they imported have changed'''
+
+    def __init__(self, entries=None):
+        self.entries = entries if entries is not None else {}
+        self.hashes = {}
+
+    def file_hash(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        key = (stat.st_mtime_ns, stat.st_size)
+        cached = self.hashes.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        with open(path, 'rb') as file:
+            digest = hashlib.sha1(file.read()).hexdigest()
+        self.hashes[path] = (key, digest)
+        return digest
+
+    def cached_passes(self, file):
+        entry = self.entries.get(file)
+        if entry is None:
+            return set()
+        for path, digest in entry['dependencies'].items():
+            if self.file_hash(path) != digest:
+                return set()
+        return set(entry['passed'])
+
+    def update(self, file, dependencies, passed):
+        self.entries[file] = {
+            'dependencies': {path: self.file_hash(path) for path in dependencies},
+            'passed': sorted(passed),
+        }
+
+
+class TestRunThread(QtCore.QThread):
+    '''Discovers the tests of a project and runs each test file in its own worker process'''
+
+    tests_discovered = QtCore.pyqtSignal(list)
+    test_result = QtCore.pyqtSignal(dict)
+
+    worker_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'testworker.py')
+
+    def __init__(self, root, cache, workers=4, only_affected=False, discover_only=False, configuration=None,
+                 excludes=None):
+        super().__init__()
+        self.root = root
+        self.excludes = excludes
+        self.configuration = configuration or RunConfiguration()
+        self.cache = cache
+        self.workers = max(1, workers)
+        self.only_affected = only_affected
+        self.discover_only = discover_only
+        self.cancelled = False
+        self.processes = set()
+
+    def run(self):
+        discovered = discover_tests(self.root, self.excludes)
+        self.tests_discovered.emit(discovered)
+        if self.discover_only:
+            return
+
+        jobs = []
+        for file, tests in discovered:
+            cached = self.cache.cached_passes(file) if self.only_affected else set()
+            for name, line in tests:
+                if name in cached:
+                    self.test_result.emit({'file': file, 'name': name, 'outcome': 'cached',
+                                           'message': 'Passed before, nothing it imports has changed',
+                                           'output': '', 'time': 0})
+            names = [name for name, line in tests if name not in cached]
+            if not names and tests:
+                continue
+            # A file with nothing cached runs whole, so tests the discovery missed still run
+            jobs.append((file, names if cached else [], cached))
+
+        with ThreadPoolExecutor(self.workers) as executor:
+            futures = [executor.submit(self.run_file, file, names, cached) for file, names, cached in jobs]
+            for future in as_completed(futures):
+                file, passed, dependencies = future.result()
+                if dependencies is not None:
+                    self.cache.update(file, dependencies, passed)
+
+    def run_file(self, file, names, cached):
+        if self.cancelled:
+            return file, set(), None
+        passed = set(cached)
+        dependencies = None
+        with tempfile.TemporaryFile() as errors:
+            command = self.configuration.python_command() + [self.worker_path, '--root', self.root, file] + names
+            try:
+                process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=errors, stdin=subprocess.DEVNULL,
+                                           env=self.configuration.process_environment())
+            except OSError as error:
+                self.test_result.emit({'file': file, 'name': None, 'outcome': 'error', 'time': 0, 'output': '',
+                                       'message': f'Could not start the test worker: {error}'})
+                return file, passed, None
+            self.processes.add(process)
+            for line in process.stdout:
+                try:
+                    message = json.loads(line.decode())
+                except ValueError:
+                    continue
+                if message['type'] == 'result':
+                    message['file'] = file
+                    if message['outcome'] == 'passed':
+                        passed.add(message['name'])
+                    self.test_result.emit(message)
+                elif message['type'] == 'dependencies':
+                    dependencies = message['files']
+            process.wait()
+            self.processes.discard(process)
+            if dependencies is None and not self.cancelled:
+                errors.seek(0)
+                output = errors.read().decode(errors='replace')
+                self.test_result.emit({'file': file, 'name': None, 'outcome': 'error', 'time': 0, 'output': output,
+                                       'message': f'Test worker exited with code {process.returncode}'})
+        return file, passed, dependencies
+
+    def stop(self):
+        self.cancelled = True
+        for process in list(self.processes):
+            process.kill()
+
+
+class TestRunnerDock(TitledDockWidget):
+
+    frame_activated = QtCore.pyqtSignal(str, int)
+
+    def __init__(self, settings, parent=None, excludes=None):
+        super().__init__('Tests', parent)
+        self.settings = settings
+        self.excludes = excludes
+        self.run_thread = None
+        self.configuration = None
+        self.file_items = {}
+        self.test_items = {}
+        self.counts = {}
+        try:
+            self.caches = json.loads(self.settings.value('test_cache', '{}'))
+        except ValueError:
+            self.caches = {}
+
+        container = QtWidgets.QWidget(self)
+        layout = QtWidgets.QVBoxLayout(container)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(0)
+
+        self.tool_bar = QtWidgets.QWidget(container)
+        self.tool_bar.setObjectName('console_toolbar')
+        tool_layout = QtWidgets.QHBoxLayout(self.tool_bar)
+        tool_layout.setContentsMargins(5, 2, 5, 2)
+        self.status_label = QtWidgets.QLabel('', self.tool_bar)
+        self.status_label.setObjectName('console_status')
+        tool_layout.addWidget(self.status_label)
+        tool_layout.addStretch()
+        for text, callback in (('Discover', self.discover), ('Run All', self.run_all),
+                               ('Run Affected', self.run_affected), ('Stop', self.stop)):
+            button = QtWidgets.QPushButton(text, self.tool_bar)
+            button.setObjectName('console_button')
+            button.clicked.connect(callback)
+            tool_layout.addWidget(button)
+        layout.addWidget(self.tool_bar)
+
+        splitter = QtWidgets.QSplitter(QtCore.Qt.Vertical, container)
+        self.tests_tree = QtWidgets.QTreeWidget(splitter)
+        self.tests_tree.setObjectName('hotspots')
+        self.tests_tree.setHeaderLabels(['Test', 'Result', 'Time'])
+        self.tests_tree.header().setSectionResizeMode(0, QtWidgets.QHeaderView.Stretch)
+        self.tests_tree.currentItemChanged.connect(self.show_details)
+        self.tests_tree.itemDoubleClicked.connect(self.test_activated)
+        self.details = QtWidgets.QPlainTextEdit(splitter)
+        self.details.setObjectName('console')
+        self.details.setReadOnly(True)
+        layout.addWidget(splitter)
+
+        self.setWidget(container)
+
+    @property
+    def root(self):
+        return os.getcwd()
+
+    def discover(self):
+        self.start(discover_only=True)
+
+    def run_all(self):
+        self.start()
+
+    def run_affected(self):
+        self.start(only_affected=True)
+
+    def start(self, only_affected=False, discover_only=False):
+        if self.run_thread is not None and self.run_thread.isRunning():
+            return
+        # Passes under one interpreter say nothing about another
+        cache_key = self.root if self.configuration is None else f'{self.root} [{self.configuration.name}]'
+        cache = TestCache(self.caches.setdefault(cache_key, {}))
+        workers = int(self.settings.value('test_workers', os.cpu_count() or 1))
+        self.run_thread = TestRunThread(self.root, cache, workers, only_affected, discover_only, self.configuration,
+                                        self.excludes)
+        self.run_thread.tests_discovered.connect(self.load_tests)
+        self.run_thread.test_result.connect(self.add_result)
+        self.run_thread.finished.connect(self.run_finished)
+        self.counts = {}
+        self.status_label.setText('Discovering...' if discover_only else 'Running...')
+        self.show()
+        self.raise_()
+        self.run_thread.start()
+
+    def stop(self):
+        if self.run_thread is not None:
+            self.run_thread.stop()
+
+    def load_tests(self, discovered):
+        self.tests_tree.clear()
+        self.details.clear()
+        self.file_items = {}
+        self.test_items = {}
+        for file, tests in discovered:
+            file_item = QtWidgets.QTreeWidgetItem([os.path.relpath(file, self.root), '', ''])
+            file_item.setData(0, QtCore.Qt.UserRole, (file, 1))
+            self.file_items[file] = file_item
+            class_items = {}
+            for name, line in tests:
+                parent = file_item
+                if '::' in name:
+                    class_name, method = name.split('::', 1)
+                    parent = class_items.get(class_name)
+                    if parent is None:
+                        parent = class_items[class_name] = QtWidgets.QTreeWidgetItem([class_name, '', ''])
+                        parent.setData(0, QtCore.Qt.UserRole, (file, line))
+                        file_item.addChild(parent)
+                else:
+                    method = name
+                test_item = QtWidgets.QTreeWidgetItem([method, '', ''])
+                test_item.setData(0, QtCore.Qt.UserRole, (file, line))
+                parent.addChild(test_item)
+                self.test_items[file, name] = test_item
+            self.tests_tree.addTopLevelItem(file_item)
+        self.status_label.setText(f'{len(self.test_items)} tests in {len(discovered)} files')
+
+    def add_result(self, result):
+        file, name = result['file'], result['name']
+        item = self.test_items.get((file, name))
+        if item is None:
+            # Errors importing the file, or tests the discovery did not see
+            item = QtWidgets.QTreeWidgetItem([name or '<import>', '', ''])
+            item.setData(0, QtCore.Qt.UserRole, (file, 1))
+            self.file_items[file].addChild(item)
+            self.test_items[file, name] = item
+        outcome = result['outcome']
+        item.setText(1, outcome)
+        item.setText(2, f"{result['time'] * 1000:.1f}ms" if outcome != 'cached' else '')
+        item.setForeground(1, QtGui.QColor(outcome_colours[outcome]))
+        item.setData(1, QtCore.Qt.UserRole, result)
+        if outcome in ('failed', 'error'):
+            parent = item.parent()
+            while parent is not None:
+                parent.setExpanded(True)
+                parent.setForeground(1, QtGui.QColor(outcome_colours['failed']))
+                parent.setText(1, 'failed')
+                parent = parent.parent()
+        self.counts[outcome] = self.counts.get(outcome, 0) + 1
+        self.status_label.setText(', '.join(f'{count} {outcome}' for outcome, count in sorted(self.counts.items())))
+
+    def run_finished(self):
+        self.settings.setValue('test_cache', json.dumps(self.caches))
+        if not self.run_thread.discover_only:
+            summary = self.status_label.text() or 'No tests ran'
+            self.status_label.setText(f"{summary}{' (stopped)' if self.run_thread.cancelled else ''}")
+
+    def show_details(self, item, previous):
+        self.details.clear()
+        result = item.data(1, QtCore.Qt.UserRole) if item is not None else None
+        if result:
+            self.details.setPlainText('\n'.join(part for part in (result['message'], result['output']) if part))
+
+    def test_activated(self, item, column):
+        file, line = item.data(0, QtCore.Qt.UserRole)
+        self.frame_activated.emit(file, line)
@@ -0,0 +1,60 @@
+import unittest
+import ansi
+
+
+class AnsiParserTest(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = ansi.AnsiParser()
+
+    def test_plain_text(self):
+        self.assertEqual(self.parser.feed('hello'), [('text', 'hello', ansi.DEFAULT_STYLE)])
+
+    def test_colours_and_reset(self):
+        operations = self.parser.feed('\x1b[1;31mred\x1b[0m plain')
+        self.assertEqual(operations, [('text', 'red', ansi.Style(1, None, True, False, False)),
+                                      ('text', ' plain', ansi.DEFAULT_STYLE)])
+
+    def test_extended_colours(self):
+        self.parser.feed('\x1b[38;5;208;48;2;1;2;3m')
+        self.assertEqual(self.parser.style, ansi.Style(208, (1, 2, 3), False, False, False))
+
+    def test_sequence_split_across_chunks(self):
+        self.assertEqual(self.parser.feed('a\x1b[3'), [('text', 'a', ansi.DEFAULT_STYLE)])
+        self.assertEqual(self.parser.feed('2mb'), [('text', 'b', ansi.Style(2, None, False, False, False))])
+
+    def test_osc_split_across_chunks(self):
+        self.assertEqual(self.parser.feed('\x1b]0;title'), [])
+        self.assertEqual(self.parser.feed('\x07text'), [('text', 'text', ansi.DEFAULT_STYLE)])
+
+    def test_osc_ended_by_string_terminator(self):
+        self.assertEqual(self.parser.feed('\x1b]0;title\x1b\\text'), [('text', 'text', ansi.DEFAULT_STYLE)])
+
+    def test_cursor_and_erase_operations(self):
+        operations = self.parser.feed('1\r\x1b[2K\x1b[A\x1b[3G\b')
+        self.assertEqual(operations, [('text', '1', ansi.DEFAULT_STYLE), ('carriage_return',), ('erase_line', 2),
+                                      ('cursor_up', 1), ('cursor_column', 3), ('backspace',)])
+
+    def test_private_modes_are_ignored(self):
+        self.assertEqual(self.parser.feed('\x1b[?25lx'), [('text', 'x', ansi.DEFAULT_STYLE)])
+
+    def test_overlong_pending_sequence_is_shown(self):
+        text = '\x1b]' + 'x' * ansi.MAX_PENDING
+        self.assertEqual(self.parser.feed(text), [('text', text, ansi.DEFAULT_STYLE)])
+
+
+class ColourValueTest(unittest.TestCase):
+
+    def test_palette(self):
+        self.assertEqual(ansi.colour_value(1), ansi.BASE_COLOURS[1])
+        self.assertEqual(ansi.colour_value(16), 0x000000)
+        self.assertEqual(ansi.colour_value(231), 0xFFFFFF)
+        self.assertEqual(ansi.colour_value(232), 0x080808)
+
+    def test_true_colour(self):
+        self.assertEqual(ansi.colour_value((0x12, 0x34, 0x56)), 0x123456)
+
+    def test_out_of_range_values_are_clamped(self):
+        self.assertEqual(ansi.colour_value(300), ansi.colour_value(255))
+        self.assertEqual(ansi.colour_value(-1), ansi.colour_value(0))
+        self.assertEqual(ansi.colour_value((300, -5, 16)), 0xFF0010)
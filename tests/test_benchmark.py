@@ -0,0 +1,55 @@
+import unittest
+
+try:
+    import benchmark
+except ImportError:  # PyQt5 and the editor's other dependencies are not installed
+    benchmark = None
+
+
+@unittest.skipIf(benchmark is None, 'needs PyQt5')
+class SummariseTest(unittest.TestCase):
+
+    def test_statistics(self):
+        result = benchmark.summarise([3.0, 1.0, 2.0, 4.0])
+        self.assertEqual((result['min'], result['max'], result['median'], result['mean']), (1.0, 4.0, 2.5, 2.5))
+        self.assertEqual(result['timings'], [3.0, 1.0, 2.0, 4.0])
+        self.assertEqual(sum(result['histogram']), 4)
+
+    def test_outliers(self):
+        result = benchmark.summarise([1.0, 1.1, 1.0, 0.9, 1.0, 5.0])
+        self.assertEqual(result['outliers'], [5.0])
+
+    def test_single_timing(self):
+        result = benchmark.summarise([2.0])
+        self.assertEqual(result['stdev'], 0.0)
+        self.assertEqual(result['histogram'][0], 1)
+
+    def test_percentile_interpolates(self):
+        self.assertEqual(benchmark.percentile([1.0, 2.0, 3.0, 4.0], 0.5), 2.5)
+
+
+@unittest.skipIf(benchmark is None, 'needs PyQt5')
+class CompareTest(unittest.TestCase):
+
+    @staticmethod
+    def result(median, stdev=0.0):
+        return {'median': median, 'stdev': stdev}
+
+    def test_slower_beyond_noise(self):
+        change, significant = benchmark.compare(self.result(1.5, 0.01), self.result(1.0, 0.01))
+        self.assertAlmostEqual(change, 0.5)
+        self.assertTrue(significant)
+
+    def test_within_noise(self):
+        change, significant = benchmark.compare(self.result(1.05, 0.1), self.result(1.0, 0.1))
+        self.assertFalse(significant)
+
+    def test_zero_baseline(self):
+        self.assertEqual(benchmark.compare(self.result(1.0), self.result(0.0)), (None, True))
+        self.assertEqual(benchmark.compare(self.result(0.0), self.result(0.0)), (0.0, False))
+
+    def test_describe_change(self):
+        self.assertEqual(benchmark.describe_change(self.result(0.5, 0.01), self.result(1.0, 0.01)),
+                         'vs baseline median 1.00000s: -50.0% (faster)')
+        self.assertEqual(benchmark.describe_change(self.result(1.0), self.result(0.0)),
+                         'vs baseline median 0.00000s: no relative change (slower)')
@@ -0,0 +1,50 @@
+import unittest
+import os
+import fuzzy
+
+ROOT = os.path.abspath(os.path.join(os.sep, 'project'))
+
+
+def project_paths(*relative_paths):
+    return [os.path.join(ROOT, *path.split('/')) for path in relative_paths]
+
+
+class PathMatcherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.matcher = fuzzy.PathMatcher(project_paths(
+            'editor.py', 'widgets.py', 'syntax/python.py', 'docs/editor_guide.md', 'tests/test_editor.py',
+            'src/EditorWindow.py'), ROOT)
+
+    def matched(self, query, count=50):
+        return [entry.relative for entry, positions in self.matcher.match(query, count)]
+
+    def test_empty_query_lists_shortest_first(self):
+        self.assertEqual(self.matched('', 2), ['editor.py', 'widgets.py'])
+
+    def test_characters_in_order(self):
+        self.assertEqual(set(self.matched('wdg')), {'widgets.py'})
+        self.assertEqual(self.matched('zzz'), [])
+
+    def test_file_name_prefix_ranks_first(self):
+        self.assertEqual(self.matched('edit')[0], 'editor.py')
+
+    def test_word_starts(self):
+        self.assertIn('src/EditorWindow.py', self.matched('ew'))
+
+    def test_separators_and_case_are_ignored(self):
+        self.assertEqual(self.matched('Syntax\\Python')[0], 'syntax/python.py')
+
+    def test_positions_mark_the_matched_characters(self):
+        entry, positions = self.matcher.match('wid')[0]
+        self.assertEqual([entry.lowered[position] for position in positions], list('wid'))
+
+    def test_narrowing_then_widening(self):
+        self.assertEqual(set(self.matched('py')) & {'docs/editor_guide.md'}, set())
+        self.assertIn('docs/editor_guide.md', self.matched('md'))
+
+    def test_limit_keeps_file_name_matches(self):
+        # Shorter paths that only match in their directories would otherwise fill the limit
+        paths = project_paths(*[f'target{index}/module.py' for index in range(30)], 'a/b/c/d/e/f/target.py')
+        matcher = fuzzy.PathMatcher(paths, ROOT, limit=5)
+        self.assertEqual(matcher.match('target')[0][0].relative, 'a/b/c/d/e/f/target.py')
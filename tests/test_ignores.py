@@ -0,0 +1,78 @@
+import tempfile
+import unittest
+import re
+import os
+import ignores
+
+
+class GlobTest(unittest.TestCase):
+
+    def matches(self, glob, path):
+        return re.fullmatch(ignores.glob_expression(glob), path) is not None
+
+    def test_wildcards_stay_within_a_component(self):
+        self.assertTrue(self.matches('*.py', 'module.py'))
+        self.assertFalse(self.matches('*.py', 'package/module.py'))
+        self.assertTrue(self.matches('file?.txt', 'file1.txt'))
+        self.assertFalse(self.matches('file?.txt', 'file/.txt'))
+
+    def test_double_star(self):
+        self.assertTrue(self.matches('**/build', 'build'))
+        self.assertTrue(self.matches('**/build', 'a/b/build'))
+        self.assertTrue(self.matches('docs/**', 'docs/a/b.md'))
+
+    def test_character_classes_and_escapes(self):
+        self.assertTrue(self.matches('*.py[co]', 'module.pyc'))
+        self.assertFalse(self.matches('*.py[!co]', 'module.pyc'))
+        self.assertTrue(self.matches(r'\*.txt', '*.txt'))
+        self.assertFalse(self.matches(r'\*.txt', 'a.txt'))
+
+
+class IgnoreRulesTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = os.path.realpath(directory.name)
+        self.write('.gitignore', '# comment\n*.log\nbuild/\n/top.txt\n!keep.log\n')
+        self.write('package/.gitignore', 'generated_*.py\n')
+        for name in ('main.py', 'debug.log', 'keep.log', 'top.txt', 'build/output.py', 'package/top.txt',
+                     'package/module.py', 'package/generated_table.py', 'node_modules/library.js'):
+            self.write(name, '')
+
+    def write(self, name, text):
+        path = os.path.join(self.root, *name.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as file:
+            file.write(text)
+
+    def path(self, name):
+        return os.path.join(self.root, *name.split('/'))
+
+    def walked(self, rules):
+        return sorted(os.path.relpath(entry.path, self.root).replace(os.sep, '/')
+                      for directory, directories, files in rules.walk() for entry in files)
+
+    def test_gitignore_files_and_default_excludes(self):
+        self.assertEqual(self.walked(ignores.IgnoreRules(self.root)),
+                         ['.gitignore', 'keep.log', 'main.py', 'package/.gitignore', 'package/module.py',
+                          'package/top.txt'])
+
+    def test_directory_only_patterns(self):
+        rules = ignores.IgnoreRules(self.root)
+        self.assertTrue(rules.ignored(self.path('build'), True))
+        self.assertFalse(rules.ignored(self.path('build'), False))
+
+    def test_user_excludes_replace_the_defaults(self):
+        walked = self.walked(ignores.IgnoreRules(self.root, ['*.js', 'main.py']))
+        self.assertNotIn('main.py', walked)
+        self.assertNotIn('node_modules/library.js', walked)
+        self.assertIn('package/module.py', walked)
+
+    def test_forget_rereads_changed_gitignore_files(self):
+        rules = ignores.IgnoreRules(self.root)
+        self.assertFalse(rules.ignored(self.path('package/module.py'), False))
+        self.write('package/.gitignore', 'module.py\n')
+        self.assertFalse(rules.ignored(self.path('package/module.py'), False))
+        rules.forget(self.path('package'))
+        self.assertTrue(rules.ignored(self.path('package/module.py'), False))
@@ -0,0 +1,59 @@
+import tempfile
+import unittest
+import os
+import linecoverage
+
+
+class BitmapTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        lines = [1, 2, 7, 8, 9, 64, 1000]
+        bitmap = linecoverage.bitmap_from_lines(lines)
+        self.assertEqual(linecoverage.lines_from_bitmap(bitmap), lines)
+        self.assertEqual(linecoverage.count_bits(bitmap), len(lines))
+        self.assertEqual(linecoverage.decode(linecoverage.encode(bitmap)), bitmap)
+
+    def test_empty(self):
+        self.assertEqual(linecoverage.lines_from_bitmap(linecoverage.bitmap_from_lines([])), [])
+
+
+class ExecutableLinesTest(unittest.TestCase):
+
+    def test_nested_code(self):
+        source = 'import os\n\n\ndef function():\n    # comment\n    return 1\n\n\nclass Class:\n    value = 2\n'
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'module.py')
+            with open(path, 'w') as file:
+                file.write(source)
+            lines = linecoverage.executable_lines(path)
+        self.assertTrue({1, 4, 6, 9, 10} <= lines)
+        self.assertFalse({2, 3, 5, 7, 8} & lines)
+
+
+class CoverageMapTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = os.path.abspath(os.path.join(os.sep, 'project'))
+        self.first = os.path.join(self.root, 'package', 'first.py')
+        self.second = os.path.join(self.root, 'package', 'second.py')
+        self.coverage = linecoverage.CoverageMap()
+
+        def entry(path, executable, executed):
+            return [path, linecoverage.encode(linecoverage.bitmap_from_lines(executable)),
+                    linecoverage.encode(linecoverage.bitmap_from_lines(executed))]
+        self.coverage.load([entry(self.first, [1, 2, 3, 4], [1, 3]), entry(self.second, [1, 5], [1, 5])])
+
+    def test_line_states(self):
+        self.assertEqual(self.coverage.line_states(self.first), {1: True, 2: False, 3: True, 4: False})
+        self.assertEqual(self.coverage.line_states(os.path.join(self.root, 'other.py')), {})
+
+    def test_totals_add_up_to_the_root(self):
+        totals = self.coverage.totals(self.root)
+        self.assertEqual(totals[self.first], (2, 4))
+        self.assertEqual(totals[os.path.join(self.root, 'package')], (4, 6))
+        self.assertEqual(totals[self.root], (4, 6))
+        self.assertNotIn(os.path.dirname(self.root), totals)
+
+    def test_clear(self):
+        self.coverage.clear()
+        self.assertEqual(self.coverage.line_states(self.first), {})
@@ -0,0 +1,57 @@
+import tempfile
+import unittest
+import re
+import os
+import searchworker
+
+
+class SearchWorkerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, data):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'wb') as file:
+            file.write(data)
+        return path
+
+    def search(self, data, pattern, **options):
+        return searchworker.search_file(self.write('file.txt', data), searchworker.compile_query(pattern, **options))
+
+    def test_plain_text_is_escaped(self):
+        self.assertEqual(self.search(b'a.b\naxb\n', 'a.b'), [(1, 0, 'a.b')])
+
+    def test_regex(self):
+        self.assertEqual(self.search(b'one 1\ntwo 22\n', r'\d+$', regex=True), [(1, 4, 'one 1'), (2, 4, 'two 22')])
+
+    def test_case_and_whole_word(self):
+        data = b'Name\nname\nnames\n'
+        self.assertEqual(len(self.search(data, 'name')), 3)
+        self.assertEqual(len(self.search(data, 'name', case_sensitive=True)), 2)
+        self.assertEqual(self.search(data, 'name', case_sensitive=True, whole_word=True), [(2, 0, 'name')])
+
+    def test_one_hit_per_line(self):
+        self.assertEqual(self.search(b'x x x\n\nx\n', 'x'), [(1, 0, 'x x x'), (3, 0, 'x')])
+
+    def test_columns_count_characters(self):
+        self.assertEqual(self.search('ééx\n'.encode('utf-8'), 'x'), [(1, 2, 'ééx')])
+
+    def test_max_hits(self):
+        path = self.write('many.txt', b'x\n' * 10)
+        self.assertEqual(len(searchworker.search_file(path, searchworker.compile_query('x'), max_hits=3)), 3)
+
+    def test_binary_empty_and_missing_files(self):
+        self.assertIsNone(self.search(b'x\0x', 'x'))
+        self.assertEqual(self.search(b'', 'x'), [])
+        self.assertIsNone(searchworker.search_file(os.path.join(self.directory.name, 'missing'),
+                                                   searchworker.compile_query('x')))
+
+    def test_str_only_escapes_are_rejected(self):
+        with self.assertRaises(re.error):
+            searchworker.compile_query(r'\N{BULLET}', regex=True)
+
+    def test_search_files_counts_text_files(self):
+        paths = [self.write('hit.txt', b'needle\n'), self.write('miss.txt', b'hay\n'), self.write('bin', b'\0needle')]
+        self.assertEqual(searchworker.search_files(paths, 'needle'), ([(paths[0], [(1, 0, 'needle')])], 2))
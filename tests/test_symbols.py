@@ -0,0 +1,133 @@
+import tempfile
+import sqlite3
+import unittest
+import os
+from symbolworker import parse_symbols, data_version
+
+try:
+    from symbols import SymbolIndex, SymbolStore, module_name
+except ImportError:  # PyQt5 and the editor's other dependencies are not installed
+    SymbolIndex = None
+
+ROOT = os.path.abspath(os.sep + 'project')
+
+
+def project_path(*parts):
+    return os.path.join(ROOT, *parts)
+
+
+@unittest.skipIf(SymbolIndex is None, 'needs PyQt5')
+class SymbolIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = SymbolIndex(ROOT)
+
+    def add(self, path, source, generation=None):
+        symbols, references = parse_symbols(source)
+        self.index.set_file(path, 'digest', symbols, references, generation)
+
+    def test_module_name(self):
+        self.assertEqual(module_name(project_path('package', 'module.py'), ROOT), 'package.module')
+        self.assertEqual(module_name(project_path('package', '__init__.py'), ROOT), 'package')
+        self.assertIsNone(module_name(project_path('notes.txt'), ROOT))
+        self.assertIsNone(module_name(os.path.abspath(os.sep + 'elsewhere.py'), ROOT))
+
+    def test_names_and_usages(self):
+        first, second = project_path('first.py'), project_path('second.py')
+        self.add(first, 'def run():\n    pass\n')
+        self.add(second, 'from first import run\n\nrun()\n')
+        self.assertEqual(sorted(self.index.names()), ['run'])
+        self.assertEqual(self.index.usages('run'), [(second, 3, 0)])
+        definitions = sorted((path, symbol.kind) for path, symbol in self.index.definitions('run'))
+        self.assertEqual(definitions, [(first, 'function'), (second, 'import')])
+
+    def test_forget(self):
+        path = project_path('first.py')
+        self.add(path, 'def run():\n    run()\n')
+        self.index.remove([path])
+        self.assertEqual(self.index.names(), [])
+        self.assertEqual(self.index.usages('run'), [])
+        self.assertEqual(self.index.modules, {})
+        self.assertIsNone(self.index.file_hash(path))
+
+    def test_set_file_replaces_previous_contents(self):
+        path = project_path('first.py')
+        self.add(path, 'def run():\n    pass\n')
+        self.add(path, 'def stop():\n    pass\n')
+        self.assertEqual(self.index.names(), ['stop'])
+
+    def test_stale_generation_is_ignored(self):
+        generation = self.index.generation
+        self.index.clear(ROOT)
+        self.add(project_path('first.py'), 'def run():\n    pass\n', generation)
+        self.assertEqual(self.index.names(), [])
+        self.add(project_path('first.py'), 'def run():\n    pass\n', self.index.generation)
+        self.assertEqual(self.index.names(), ['run'])
+
+
+@unittest.skipIf(SymbolIndex is None, 'needs PyQt5')
+class SymbolStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.database = os.path.join(directory.name, 'symbols.sqlite')
+
+    def open_store(self):
+        store = SymbolStore(self.database)
+        self.addCleanup(store.close)
+        return store
+
+    def test_load_and_save(self):
+        store = self.open_store()
+        store.save([('one', '[[], {}]'), ('broken', None)])
+        self.assertEqual(store.load(['one', 'broken', 'missing']), {'one': '[[], {}]', 'broken': None})
+
+    def test_other_data_version_is_dropped(self):
+        self.open_store().save([('one', '[[], {}]')])
+        connection = sqlite3.connect(self.database)
+        with connection:
+            connection.execute(f'PRAGMA user_version = {data_version - 1}')
+        connection.close()
+        self.assertEqual(self.open_store().load(['one']), {})
+
+
+@unittest.skipIf(SymbolIndex is None, 'needs PyQt5')
+class FindDefinitionsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = SymbolIndex(ROOT)
+        self.add(project_path('package', '__init__.py'), 'from .tasks import run\n')
+        self.add(project_path('package', 'tasks.py'), 'def run(count):\n    return count\n')
+        self.add(project_path('main.py'), 'from package import run\nimport package.tasks\n\n'
+                                          'def count():\n    pass\n\nrun(1)\npackage.tasks.run(2)\n')
+
+    def add(self, path, source):
+        symbols, references = parse_symbols(source)
+        self.index.set_file(path, 'digest', symbols, references)
+
+    def find(self, name, path, line, attribute=False):
+        found, resolved = self.index.find_definitions(name, path, line, attribute)
+        return [(found_path, symbol and (symbol.name, symbol.kind)) for found_path, symbol in found], resolved
+
+    def test_parameter_in_its_function(self):
+        self.assertEqual(self.find('count', project_path('package', 'tasks.py'), 2),
+                         ([(project_path('package', 'tasks.py'), ('count', 'parameter'))], True))
+
+    def test_import_followed_through_re_export(self):
+        self.assertEqual(self.find('run', project_path('main.py'), 7),
+                         ([(project_path('package', 'tasks.py'), ('run', 'function'))], True))
+
+    def test_imported_module(self):
+        self.assertEqual(self.find('package', project_path('main.py'), 8),
+                         ([(project_path('package', '__init__.py'), None)], True))
+
+    def test_attribute_lists_candidates_without_parameters(self):
+        # The function in main.py comes first; the parameter named count cannot be meant
+        self.assertEqual(self.find('count', project_path('main.py'), 8, attribute=True),
+                         ([(project_path('main.py'), ('count', 'function'))], False))
+        self.assertEqual(self.find('run', project_path('main.py'), 8, attribute=True),
+                         ([(project_path('package', 'tasks.py'), ('run', 'function'))], False))
+
+    def test_unbound_name_is_unresolved(self):
+        self.assertEqual(self.find('missing', project_path('main.py'), 7), ([], False))
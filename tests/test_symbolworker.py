@@ -0,0 +1,100 @@
+import tempfile
+import unittest
+import sys
+import os
+import symbolworker
+
+SOURCE = '''import os.path
+from . import sibling as alias
+from ..package.module import name
+
+
+class Shape(Base):
+    size = 1
+
+    def area(self, scale, *args, factor=2, **options):
+        result = [item for item in args]
+        try:
+            pass
+        except OSError as error:
+            pass
+        return self.size
+
+
+def main():
+    with open(__file__) as file, lock:
+        for index, (key, value) in enumerate(file):
+            pass
+'''
+
+
+class ParseSymbolsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.symbols, self.references = symbolworker.parse_symbols(SOURCE)
+
+    def symbol(self, name, scope):
+        return next(symbol for symbol in self.symbols if symbol.name == name and symbol.scope == scope)
+
+    def test_definitions(self):
+        shape = self.symbol('Shape', '')
+        self.assertEqual((shape.kind, shape.line, shape.end_line), ('class', 6, 15))
+        area = self.symbol('area', 'Shape')
+        self.assertEqual((area.kind, area.detail), ('method', '(self, scale, *args, factor, **options)'))
+        self.assertEqual(self.symbol('main', '').kind, 'function')
+        self.assertEqual(self.symbol('size', 'Shape').kind, 'variable')
+
+    def test_imports(self):
+        self.assertEqual(self.symbol('os', '').detail, 'os')
+        self.assertEqual(self.symbol('alias', '').detail, '.sibling')
+        self.assertEqual(self.symbol('name', '').detail, '..package.module.name')
+
+    def test_parameters(self):
+        parameters = {symbol.name for symbol in self.symbols if symbol.kind == 'parameter'}
+        self.assertEqual(parameters, {'self', 'scale', 'args', 'factor', 'options'})
+        self.assertEqual(self.symbol('scale', 'Shape.area').line, 9)
+
+    def test_local_bindings(self):
+        for name in ('result', 'item', 'error'):
+            self.assertEqual(self.symbol(name, 'Shape.area').kind, 'variable', name)
+        for name in ('file', 'index', 'key', 'value'):
+            self.assertEqual(self.symbol(name, 'main').kind, 'variable', name)
+
+    @unittest.skipIf(sys.version_info < (3, 8), 'assignment expressions need Python 3.8')
+    def test_assignment_expressions(self):
+        symbols, references = symbolworker.parse_symbols('def function(values):\n    if (total := sum(values)):\n'
+                                                         '        return total\n')
+        self.assertIn(('total', 'variable', 2, 'function'),
+                      [(symbol.name, symbol.kind, symbol.line, symbol.scope) for symbol in symbols])
+
+    def test_references(self):
+        # Flat line, column pairs
+        self.assertEqual(self.references['Base'], [6, 12])
+        self.assertIn('enumerate', self.references)
+
+    @unittest.skipIf(sys.version_info < (3, 8), 'attribute positions need Python 3.8')
+    def test_attribute_references(self):
+        # Recorded at the attribute name, after the dot
+        self.assertEqual(self.references['size'], [7, 4, 15, 20])
+
+    def test_syntax_errors_raise(self):
+        with self.assertRaises(SyntaxError):
+            symbolworker.parse_symbols('def broken(:\n')
+
+
+class IndexFilesTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            good = os.path.join(directory, 'good.py')
+            bad = os.path.join(directory, 'bad.py')
+            with open(good, 'w') as file:
+                file.write('def function(argument):\n    return argument\n')
+            with open(bad, 'w') as file:
+                file.write('def (\n')
+            results = symbolworker.index_files([good, bad, os.path.join(directory, 'missing.py')])
+        self.assertEqual([path for path, digest, data in results], [good, bad])
+        self.assertIsNone(results[1][2])
+        symbols, references = symbolworker.load_data(results[0][2])
+        self.assertEqual(symbols, symbolworker.parse_symbols('def function(argument):\n    return argument\n')[0])
+        self.assertEqual(references, {'argument': [2, 11]})
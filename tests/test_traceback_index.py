@@ -0,0 +1,46 @@
+import unittest
+
+try:
+    from widgets import TracebackIndex
+except ImportError:  # PyQt5 and the editor's other dependencies are not installed
+    TracebackIndex = None
+
+TRACEBACK = '''Traceback (most recent call last):
+  File "/project/main.py", line 12, in <module>
+    run()
+  File "/project/tasks.py", line 3, in run
+    raise ValueError('bad')
+ValueError: bad'''
+
+
+@unittest.skipIf(TracebackIndex is None, 'needs PyQt5')
+class TracebackIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = TracebackIndex()
+
+    def feed(self, text):
+        return [self.index.feed_line(line) for line in text.splitlines()]
+
+    def test_frames_and_exception(self):
+        matches = self.feed(TRACEBACK)
+        self.assertEqual([match.group('path') for match in matches if match], ['/project/main.py', '/project/tasks.py'])
+        self.assertEqual(self.index.last_traceback,
+                         ([('/project/main.py', 12), ('/project/tasks.py', 3)], 'ValueError: bad'))
+
+    def test_link_span(self):
+        match = self.index.feed_line('  File "/project/main.py", line 12, in <module>')
+        self.assertEqual(match.group('link'), 'File "/project/main.py", line 12')
+
+    def test_later_traceback_replaces_earlier(self):
+        self.feed(TRACEBACK)
+        self.feed('Traceback (most recent call last):\n  File "/project/other.py", line 1, in <module>\nKeyError: 1')
+        self.assertEqual(self.index.last_traceback, ([('/project/other.py', 1)], 'KeyError: 1'))
+
+    def test_syntax_error_without_header(self):
+        self.feed('  File "/project/broken.py", line 4\n    def (\n        ^\nSyntaxError: invalid syntax')
+        self.assertEqual(self.index.last_traceback, ([('/project/broken.py', 4)], 'SyntaxError: invalid syntax'))
+
+    def test_ordinary_output(self):
+        self.assertEqual(self.feed('hello\nworld'), [None, None])
+        self.assertIsNone(self.index.last_traceback)
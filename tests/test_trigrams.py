@@ -0,0 +1,102 @@
+import tempfile
+import unittest
+import os
+import searchworker
+import trigrams
+
+
+def naive_trigrams(data):
+    data = data.lower()
+    return {int.from_bytes(data[index:index + 3], 'little') for index in range(len(data) - 2)}
+
+
+class TrigramSetTest(unittest.TestCase):
+
+    def test_matches_a_plain_scan(self):
+        for data in (b'', b'ab', b'abc', b'abcd', b'Hello, World!', bytes(range(256)) * 3):
+            self.assertEqual(trigrams.trigram_set(data), naive_trigrams(data), data)
+
+
+class RequiredTrigramsTest(unittest.TestCase):
+
+    def test_literal_runs(self):
+        self.assertEqual(trigrams.literal_runs(r'foo\.bar'), ['foo.bar'])
+        self.assertEqual(trigrams.literal_runs(r'abc\d+def(ghi)?'), ['abc', 'def'])
+        self.assertEqual(trigrams.literal_runs(r'(?:xyz)+'), ['xyz'])
+
+    def test_required_trigrams(self):
+        self.assertEqual(trigrams.required_trigrams('Abcd'), naive_trigrams(b'abcd'))
+        self.assertIsNone(trigrams.required_trigrams('ab'))
+        self.assertIsNone(trigrams.required_trigrams('a|bcdef', regex=True))
+        self.assertIsNone(trigrams.required_trigrams('(unbalanced', regex=True))
+
+
+class TrigramIndexTest(unittest.TestCase):
+
+    contents = {
+        'first.py': b'def search_files(paths):\n    return paths\n',
+        'second.py': b'class Segment:\n    pass\n',
+        'notes.txt': b'Search the files quickly\n',
+        'binary.bin': b'\0search_files',
+    }
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.paths = {}
+        for name, data in self.contents.items():
+            self.paths[name] = os.path.join(directory.name, name)
+            self.write(name, data)
+        self.index = trigrams.TrigramIndex()
+        self.index.add_segment(*trigrams.build_segment(sorted(self.paths.values())))
+
+    def write(self, name, data):
+        with open(self.paths[name], 'wb') as file:
+            file.write(data)
+
+    def candidates(self, pattern, regex=False):
+        required = trigrams.required_trigrams(pattern, regex)
+        paths = sorted(self.paths.values())
+        # As in a search, a query without trigrams is not narrowed
+        return {os.path.basename(path) for path in (self.index.candidates(required, paths) if required else paths)}
+
+    def test_narrows_by_content(self):
+        self.assertEqual(self.candidates('search_files'), {'first.py'})
+        self.assertEqual(self.candidates('SEARCH'), {'first.py', 'notes.txt'})
+        self.assertEqual(self.candidates(r'class \w+:', regex=True), {'second.py'})
+
+    def test_never_drops_a_file_with_a_match(self):
+        for pattern, regex in (('search', False), ('paths', False), (r'se\w+ch', True), (r'def (search|class)', True),
+                               ('return paths', False), ('pass', False)):
+            expression = searchworker.compile_query(pattern, regex)
+            matching = {name for name, path in self.paths.items() if searchworker.search_file(path, expression)}
+            self.assertLessEqual(matching, self.candidates(pattern, regex), pattern)
+
+    def test_updated_and_removed_files(self):
+        self.write('second.py', b'def search_files():\n    pass\n')
+        self.index.add_segment(*trigrams.build_segment([self.paths['second.py']]))
+        self.assertEqual(self.candidates('search_files'), {'first.py', 'second.py'})
+        self.assertEqual(self.candidates('Segment'), set())
+        self.index.remove([self.paths['first.py']])
+        # Files the index does not hold are searched, as they may be new
+        self.assertEqual(self.candidates('Segment'), {'first.py'})
+
+    def test_pending_files_are_searched(self):
+        self.index.queue([self.paths['second.py']])
+        self.assertIn('second.py', self.candidates('search_files'))
+
+    def test_segments_built_before_a_clear_are_dropped(self):
+        generation = self.index.generation
+        self.index.clear()
+        self.index.add_segment(*trigrams.build_segment([self.paths['first.py']]), generation)
+        self.assertEqual(self.index.live, 0)
+
+    def test_wasteful(self):
+        index = trigrams.TrigramIndex()
+        names = [f'file{number}.py' for number in range(1500)]
+        for name in names:
+            index.add_segment([name, 'shared.py'], {}, [])
+        self.assertEqual((index.live, index.dead), (1501, 1499))
+        self.assertFalse(index.wasteful)
+        index.remove(names[:1000])
+        self.assertTrue(index.wasteful)
@@ -0,0 +1,189 @@
+'''Runs the tests of one file on behalf of the IDE's test runner
+
+Like launcher.py this runs in the child process and only uses the standard library.
+
+    python testworker.py --root ROOT file [name ...]
+
+Test names are 'function' or 'Class::method'; without any the whole file
+runs. unittest.TestCase classes run as usual, and pytest style test
+functions and Test classes without fixtures are wrapped so they run too.
+Results are written to stdout as JSON lines, while anything the tests
+print goes to stderr.
+'''
+import argparse
+import importlib.util
+import inspect
+import io
+import json
+import os
+import sys
+import time
+import traceback
+import unittest
+
+
+class StreamingResult(unittest.TestResult):
+    '''Sends the outcome and captured output of every test as soon as it has run'''
+
+    def __init__(self, send, names):
+        super().__init__()
+        self.send = send
+        self.names = names
+        self.outcome = None
+        self.message = ''
+        self.reported = set()
+
+    def startTest(self, test):
+        super().startTest(test)
+        self.outcome = 'passed'
+        self.message = ''
+        self.start_time = time.perf_counter()
+        self.saved_streams = sys.stdout, sys.stderr
+        sys.stdout = sys.stderr = self.output = io.StringIO()
+
+    def stopTest(self, test):
+        sys.stdout, sys.stderr = self.saved_streams
+        self.send('result', name=self.names[test], outcome=self.outcome, message=self.message,
+                  output=self.output.getvalue(), time=time.perf_counter() - self.start_time)
+        self.reported.add(test)
+        super().stopTest(test)
+
+    def fail_with(self, outcome, error):
+        self.outcome = outcome
+        self.message += ''.join(traceback.format_exception(*error))
+
+    def addFailure(self, test, error):
+        super().addFailure(test, error)
+        self.fail_with('failed', error)
+
+    def addError(self, test, error):
+        super().addError(test, error)
+        if test in self.names:
+            self.fail_with('error', error)
+        else:
+            self.fixture_error(test.description, error)
+
+    def fixture_error(self, description, error):
+        '''Reports a setUpClass, setUpModule or tear down of either that failed outside any test
+
+        The tests it held back are reported as errors, and a failure after they have all run
+        gets an entry of its own.
+        '''
+        message = f'{description} failed\n' + ''.join(traceback.format_exception(*error))
+        # Described as "setUpClass (module.Class)" or "setUpModule (module)"
+        scope = description.partition(' (')[2].rstrip(')')
+        held_back = [test for test in self.names if test not in self.reported and scope in (
+            type(test).__module__, f'{type(test).__module__}.{type(test).__qualname__}')]
+        for test in held_back or [None]:
+            self.send('result', name=self.names[test] if test is not None else description, outcome='error',
+                      message=message, output='', time=0)
+            self.reported.add(test)
+
+    def addSubTest(self, test, subtest, error):
+        super().addSubTest(test, subtest, error)
+        if error is not None:
+            self.message += f'{subtest.id()}\n'
+            self.fail_with('failed', error)
+
+    def addSkip(self, test, reason):
+        super().addSkip(test, reason)
+        self.outcome = 'skipped'
+        self.message = reason
+
+    def addUnexpectedSuccess(self, test):
+        super().addUnexpectedSuccess(test)
+        self.outcome = 'failed'
+        self.message = 'Unexpected success of a test marked as an expected failure'
+
+
+def plain_test(function, name):
+    '''Wraps a pytest style test so unittest can run it'''
+    if inspect.signature(function).parameters:
+        def needs_fixtures():
+            raise unittest.SkipTest(f'{name} needs pytest fixtures')
+        function = needs_fixtures
+    return unittest.FunctionTestCase(function, description=name)
+
+
+def class_method_test(test_class, method):
+    def run_method():
+        instance = test_class()
+        if hasattr(instance, 'setup_method'):
+            instance.setup_method(getattr(instance, method))
+        try:
+            getattr(instance, method)()
+        finally:
+            if hasattr(instance, 'teardown_method'):
+                instance.teardown_method(getattr(instance, method))
+    return unittest.FunctionTestCase(run_method, description=f'{test_class.__name__}::{method}')
+
+
+def collect_tests(module, selected):
+    '''Suite of the module's tests and the name of every test in it'''
+    suite = unittest.TestSuite()
+    names = {}
+
+    def add(test, name):
+        if not selected or name in selected:
+            suite.addTest(test)
+            names[test] = name
+
+    for attribute, value in list(vars(module).items()):
+        if inspect.isclass(value) and value.__module__ == module.__name__:
+            if issubclass(value, unittest.TestCase):
+                for test in unittest.defaultTestLoader.loadTestsFromTestCase(value):
+                    add(test, f'{attribute}::{test._testMethodName}')
+            elif attribute.startswith('Test'):
+                for method in sorted(name for name in vars(value) if name.startswith('test')):
+                    add(class_method_test(value, method), f'{attribute}::{method}')
+        elif inspect.isfunction(value) and attribute.startswith('test') and value.__module__ == module.__name__:
+            add(plain_test(value, attribute), attribute)
+    return suite, names
+
+
+def project_files(root):
+    '''Files of the project imported by the tests, which decide whether a cached pass is still valid'''
+    files = set()
+    for module in list(sys.modules.values()):
+        path = getattr(module, '__file__', None)
+        if path and os.path.abspath(path).startswith(root) and path.endswith('.py'):
+            files.add(os.path.abspath(path))
+    return sorted(files)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='testworker.py')
+    parser.add_argument('--root', default=os.getcwd())
+    parser.add_argument('file')
+    parser.add_argument('names', nargs='*')
+    options = parser.parse_args(argv)
+
+    # Keep the real stdout for results and send everything else to stderr
+    protocol = os.fdopen(os.dup(1), 'w', buffering=1)
+    os.dup2(2, 1)
+
+    def send(message_type, **data):
+        data['type'] = message_type
+        protocol.write(json.dumps(data) + '\n')
+
+    root = os.path.join(os.path.abspath(options.root), '')
+    path = os.path.abspath(options.file)
+    os.chdir(root)
+    sys.path[0:1] = [os.path.dirname(path), root]
+    name = os.path.splitext(os.path.basename(path))[0]
+    try:
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+        suite, names = collect_tests(module, set(options.names))
+    except BaseException:
+        send('result', name=None, outcome='error', message=traceback.format_exc(), output='', time=0)
+    else:
+        suite.run(StreamingResult(send, names))
+    send('dependencies', files=project_files(root))
+    protocol.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+'''Trigram index of project files, which narrows a search down to the files that can match
+
+Segments are built in worker processes, so this only depends on the standard library.
+'''
+from array import array
+import threading
+import os
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Before Python 3.11
+    import sre_parse
+
+max_indexed_size = 8 << 20
+binary_probe_size = 8192
+
+
+def trigram_set(data):
+    '''Every three byte sequence of the lowered data, each packed into a little endian int
+
+    The trigrams starting at every fourth byte are copied into the low three bytes of 32 bit
+    words with slice assignments, so only the set is built per trigram rather than Python code.
+    '''
+    data = data.lower()
+    trigrams = set()
+    for offset in range(4):
+        count = (len(data) - offset + 1) // 4
+        if count <= 0:
+            continue
+        words = bytearray(4 * count)
+        for byte in range(3):
+            words[byte::4] = data[offset + byte::4][:count]
+        trigrams.update(array('I', words))
+    return trigrams
+
+
+def build_segment(paths):
+    '''Reads a chunk of files and returns (paths, postings, unindexed) for it
+
+    Postings map each trigram to the positions in paths of the files holding it. Binary files
+    are indexed with no trigrams so they are never searched; files too big to index are
+    returned as unindexed, and are always searched.
+    '''
+    indexed, unindexed = [], []
+    postings = {}
+    for path in paths:
+        try:
+            with open(path, 'rb') as file:
+                if max_indexed_size < os.fstat(file.fileno()).st_size:
+                    unindexed.append(path)
+                    continue
+                data = file.read()
+        except OSError:
+            continue
+        file_id = len(indexed)
+        indexed.append(path)
+        if b'\0' in data[:binary_probe_size]:
+            continue
+        for trigram in trigram_set(data):
+            file_ids = postings.get(trigram)
+            if file_ids is None:
+                file_ids = postings[trigram] = array('I')
+            file_ids.append(file_id)
+    return indexed, {trigram: file_ids.tobytes() for trigram, file_ids in postings.items()}, unindexed
+
+
+def literal_runs(pattern):
+    '''Literal strings that every match of a regular expression must contain'''
+    runs = []
+    run = []
+
+    def end_run():
+        if run:
+            runs.append(''.join(run))
+            run.clear()
+
+    def walk(parsed):
+        for op, value in parsed:
+            if op is sre_parse.LITERAL:
+                run.append(chr(value))
+                continue
+            end_run()
+            if op is sre_parse.SUBPATTERN:
+                walk(value[-1])
+                end_run()
+            elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and value[0] >= 1:
+                walk(value[2])
+                end_run()
+    walk(sre_parse.parse(pattern))
+    end_run()
+    return runs
+
+
+def required_trigrams(pattern, regex=False):
+    '''Trigrams that any file with a match must contain, or None when the query has none to narrow by'''
+    try:
+        runs = literal_runs(pattern) if regex else [pattern]
+    except Exception:
+        return None
+    trigrams = set()
+    for run in runs:
+        data = run.encode('utf-8')
+        if len(data) >= 3:
+            trigrams.update(trigram_set(data))
+    return trigrams or None
+
+
+class Segment:
+
+    def __init__(self, paths, postings):
+        self.paths = paths
+        self.postings = postings
+        self.dead = set()
+
+    def candidates(self, trigrams):
+        '''Paths of the live files in this segment holding every one of the trigrams'''
+        file_ids = None
+        # Intersect from the rarest trigram, so the sets only shrink
+        for posting in sorted((self.postings.get(trigram, b'') for trigram in trigrams), key=len):
+            if not posting:
+                return []
+            ids = array('I')
+            ids.frombytes(posting)
+            file_ids = set(ids) if file_ids is None else file_ids.intersection(ids)
+            if not file_ids:
+                return []
+        return [self.paths[file_id] for file_id in file_ids if file_id not in self.dead]
+
+
+class TrigramIndex:
+    '''Segments of indexed files, where updating a file marks its old entry dead and adds a new segment'''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.segments = []
+        self.locations = {}
+        self.pending = set()
+        self.live = 0
+        self.dead = 0
+        self.generation = 0
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.segments = []
+            self.locations = {}
+            self.pending = set()
+            self.live = self.dead = 0
+
+    def queue(self, paths):
+        with self.lock:
+            self.pending.update(paths)
+
+    def remove(self, paths):
+        with self.lock:
+            for path in paths:
+                self.forget(path)
+
+    def forget(self, path):
+        location = self.locations.pop(path, None)
+        if location is not None:
+            segment, file_id = location
+            segment.dead.add(file_id)
+            self.live -= 1
+            self.dead += 1
+
+    def add_segment(self, paths, postings, unindexed, generation=None):
+        segment = Segment(paths, postings)
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                return  # Built for the index as it was before it was cleared
+            for file_id, path in enumerate(paths):
+                self.forget(path)
+                self.locations[path] = (segment, file_id)
+                self.pending.discard(path)
+            for path in unindexed:
+                self.forget(path)
+                self.pending.discard(path)
+            self.segments.append(segment)
+            self.live += len(paths)
+            # Drop segments with nothing live left in them
+            for segment in [segment for segment in self.segments if len(segment.dead) == len(segment.paths)]:
+                self.segments.remove(segment)
+                self.dead -= len(segment.dead)
+
+    def candidates(self, trigrams, paths):
+        '''Those of the paths that may match: indexed files holding every trigram, and files not indexed yet'''
+        with self.lock:
+            matching = set()
+            for segment in self.segments:
+                matching.update(segment.candidates(trigrams))
+            return [path for path in paths
+                    if path in matching or path not in self.locations or path in self.pending]
+
+    @property
+    def wasteful(self):
+        '''Whether more entries are dead than live, so a rebuild would save memory'''
+        return self.dead > max(self.live, 1000)
+
@@ -0,0 +1,108 @@
+from PyQt5 import QtCore
+import os
+
+max_watched_directories = 4000  # Watches are a limited resource (inotify's is 8192 by default) shared with other programs
+
+
+class FileWatcher(QtCore.QObject):
+    '''Watches the open files and the project's directories, acting on changes once they settle
+
+    Changed files are reloaded in their tabs when those have no unsaved edits, and changed
+    directories are listed again by the project tree and the file index. Events are gathered
+    until none have come for a moment, or for at most max_delay during a long storm such as
+    a checkout of another branch.
+    '''
+
+    def __init__(self, tab_widget, project_index, project_structure, parent=None, delay=300, max_delay=2000):
+        super().__init__(parent)
+        self.tab_widget = tab_widget
+        self.project_index = project_index
+        self.project_structure = project_structure
+        self.max_delay = max_delay
+        self.changed_files = set()
+        self.changed_directories = set()
+
+        self.watcher = QtCore.QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self.file_changed)
+        self.watcher.directoryChanged.connect(self.directory_changed)
+        self.settle_timer = QtCore.QTimer(self)
+        self.settle_timer.setSingleShot(True)
+        self.settle_timer.setInterval(delay)
+        self.settle_timer.timeout.connect(self.apply_changes)
+        self.pending_since = QtCore.QElapsedTimer()
+
+        self.tab_widget.open_files_changed.connect(self.watch_open_files)
+        self.project_index.ready.connect(self.watch_project)
+        self.project_index.files_changed.connect(self.watch_new_directories)
+        self.watch_open_files()
+        if self.project_index.file_index is not None:
+            self.watch_project()
+
+    def watch_open_files(self):
+        watched = set(self.watcher.files())
+        open_files = {os.path.abspath(path) for path in self.tab_widget.open_editors}
+        if watched - open_files:
+            self.watcher.removePaths(list(watched - open_files))
+        existing = [path for path in open_files - watched if os.path.isfile(path)]
+        if existing:
+            self.watcher.addPaths(existing)
+
+    def watch_project(self):
+        '''Watches the project root and the directories holding its files, the shallowest first'''
+        if self.watcher.directories():
+            self.watcher.removePaths(self.watcher.directories())
+        root = self.project_index.root
+        directories = {root}
+        for path in self.project_index.paths():
+            directory = os.path.dirname(path)
+            while directory not in directories and directory.startswith(root):
+                directories.add(directory)
+                directory = os.path.dirname(directory)
+        directories = sorted(directories, key=lambda directory: (directory.count(os.sep), directory))
+        self.watcher.addPaths(directories[:max_watched_directories])
+
+    def watch_new_directories(self, changed, removed):
+        root = self.project_index.root
+        if root is None:
+            return
+        watched = set(self.watcher.directories())
+        new = set()
+        for path in changed:
+            directory = os.path.dirname(path)
+            while directory not in watched and directory not in new and directory.startswith(root):
+                new.add(directory)
+                directory = os.path.dirname(directory)
+        new = sorted(new, key=lambda directory: directory.count(os.sep))[:max(0, max_watched_directories - len(watched))]
+        if new:
+            self.watcher.addPaths(new)
+
+    def file_changed(self, path):
+        self.changed_files.add(path)
+        self.schedule()
+
+    def directory_changed(self, path):
+        self.changed_directories.add(path)
+        self.schedule()
+
+    def schedule(self):
+        if not self.settle_timer.isActive():
+            self.pending_since.start()
+            self.settle_timer.start()
+        elif self.pending_since.elapsed() < self.max_delay:
+            self.settle_timer.start()  # Wait for the changes to settle, but not forever
+
+    def apply_changes(self):
+        files, self.changed_files = self.changed_files, set()
+        directories, self.changed_directories = self.changed_directories, set()
+        for path in files:
+            self.tab_widget.reload_file(path)
+        # Files replaced by a rename or deleted and created again are no longer watched
+        self.watch_open_files()
+        for directory in directories:
+            self.project_structure.refresh(directory)
+        if directories:
+            self.project_index.update_directories(directories)
+        root = self.project_index.root
+        project_files = [path for path in files if root is not None and path.startswith(os.path.join(root, ''))]
+        if project_files:
+            self.project_index.update(project_files)
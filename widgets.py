@@ -1,30 +1,57 @@
 from PyQt5 import QtWidgets, QtGui, QtCore
 from itertools import accumulate
 from bidict import MutableBidict
-from code import InteractiveConsole
 from io import StringIO
 import contextlib
+import html
+import collections
+import codecs
+import threading
+import socket
+import json
 import time
 import autopep8
 import syntax
 import subprocess
 import chardet
+from runconfig import RunConfiguration
+from projecttree import ProjectTreeModel
+from completion import BufferCompletions
+import accounting
+import ansi
+import struct
 import re
 import os
 
+try:
+    import pty
+    import fcntl
+    import termios
+except ImportError:  # Windows has no pseudo-terminals
+    pty = None
 
-class RunConsoleDock(QtWidgets.QDockWidget):
-    def __init__(self, parent=None):
-        self.scroll_bar_at_bottom = False
 
-        super().__init__('Run Console', parent)
+def file_stamp(path):
+    '''(size, modification time) of a file, or None if it cannot be read'''
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class TitledDockWidget(QtWidgets.QDockWidget):
+    '''Dock widget with the themed title bar and close button'''
+
+    def __init__(self, title, parent=None):
+        super().__init__(title, parent)
 
         self.title_bar = QtWidgets.QWidget(self)
         self.title_bar.setObjectName('dock_title')
         title_layout = QtWidgets.QHBoxLayout(self.title_bar)
         title_layout.setContentsMargins(5, 0, 5, 0)
 
-        self.title_label = QtWidgets.QLabel('Run Console', self.title_bar)
+        self.title_label = QtWidgets.QLabel(title, self.title_bar)
         self.title_label.setObjectName('dock_title_label')
         size_policy = QtWidgets.QSizePolicy()
         size_policy.setHorizontalPolicy(QtWidgets.QSizePolicy.Expanding)
@@ -39,87 +66,775 @@ class RunConsoleDock(QtWidgets.QDockWidget):
         self.title_bar.setLayout(title_layout)
         self.setTitleBarWidget(self.title_bar)
 
-        self.output_label = QtWidgets.QPlainTextEdit(self)
-        self.output_label.setReadOnly(True)
-        self.output_label.setObjectName('console')
 
-        self.setWidget(self.output_label)
+class RunConsoleDock(TitledDockWidget):
+
+    location_activated = QtCore.pyqtSignal(str, int)
+    traceback_found = QtCore.pyqtSignal(list, str)
+
+    def __init__(self, parent=None, max_workers=4):
+        super().__init__('Run Console', parent)
+
+        self.run_manager = RunManager(max_workers, self)
+
+        self.console_tabs = QtWidgets.QTabWidget(self)
+        self.console_tabs.setObjectName('console_tabs')
+        self.console_tabs.setTabsClosable(True)
+        self.console_tabs.setMovable(True)
+        self.console_tabs.tabCloseRequested.connect(self.close_console_tab)
+        self.setWidget(self.console_tabs)
+
+    @property
+    def current_console(self):
+        return self.console_tabs.currentWidget()
+
+    def run_script(self, file, use_pty=False, configuration=None):
+        script_thread = RunScriptThread(file, use_pty, configuration)
+        return self.add_run(script_thread)
+
+    def add_run(self, script_thread):
+        console_tab = RunConsoleTab(script_thread, self.console_tabs)
+        index = self.console_tabs.addTab(console_tab, os.path.basename(script_thread.file))
+        self.console_tabs.setCurrentIndex(index)
+        console_tab.status_changed.connect(lambda status: self.update_tab_title(console_tab))
+        console_tab.location_activated.connect(self.location_activated)
+        console_tab.traceback_found.connect(self.traceback_found)
+        self.run_manager.submit(script_thread)
+        self.show()
+        return console_tab
+
+    def update_tab_title(self, console_tab):
+        index = self.console_tabs.indexOf(console_tab)
+        if index >= 0:
+            name = os.path.basename(console_tab.script_thread.file)
+            self.console_tabs.setTabText(index, f'{name} [{console_tab.status}]')
+
+    def close_console_tab(self, index):
+        console_tab = self.console_tabs.widget(index)
+        self.run_manager.cancel(console_tab.script_thread)
+        self.console_tabs.removeTab(index)
+        console_tab.deleteLater()
+
+    def stop_all(self, timeout=3000):
+        '''Kills every run and waits a while for their threads, so none is left running as the IDE exits'''
+        active = list(self.run_manager.active)
+        for script_thread in list(self.run_manager.pending) + active:
+            self.run_manager.cancel(script_thread)
+        for script_thread in active:
+            script_thread.wait(timeout)
+
+
+class RunConsoleTab(QtWidgets.QWidget):
+
+    status_changed = QtCore.pyqtSignal(str)
+    location_activated = QtCore.pyqtSignal(str, int)
+    traceback_found = QtCore.pyqtSignal(list, str)
+
+    max_lines = 20000
+
+    def __init__(self, script_thread, parent=None):
+        super().__init__(parent)
+        self.script_thread = script_thread
+        self.scroll_bar_at_bottom = True
+        self.pending_output = []
+        self.status = 'Queued'
+
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(0)
+
+        self.tool_bar = QtWidgets.QWidget(self)
+        self.tool_bar.setObjectName('console_toolbar')
+        tool_layout = QtWidgets.QHBoxLayout(self.tool_bar)
+        tool_layout.setContentsMargins(5, 2, 5, 2)
+
+        self.status_label = QtWidgets.QLabel(self.status, self.tool_bar)
+        self.status_label.setObjectName('console_status')
+        tool_layout.addWidget(self.status_label)
+
+        self.pid_label = QtWidgets.QLabel('', self.tool_bar)
+        self.pid_label.setObjectName('console_status')
+        tool_layout.addWidget(self.pid_label)
+        tool_layout.addStretch()
+
+        self.error_button = QtWidgets.QPushButton('Go to Error', self.tool_bar)
+        self.error_button.setObjectName('console_button')
+        self.error_button.setEnabled(False)
+        self.error_button.clicked.connect(self.go_to_error)
+        tool_layout.addWidget(self.error_button)
+
+        self.stop_button = QtWidgets.QPushButton('Stop', self.tool_bar)
+        self.stop_button.setObjectName('console_button')
+        self.stop_button.clicked.connect(self.script_thread.stop)
+        tool_layout.addWidget(self.stop_button)
+
+        self.kill_button = QtWidgets.QPushButton('Kill', self.tool_bar)
+        self.kill_button.setObjectName('console_button')
+        self.kill_button.clicked.connect(self.script_thread.kill)
+        tool_layout.addWidget(self.kill_button)
+
+        layout.addWidget(self.tool_bar)
+
+        self.output_label = ConsoleOutput(self)
+        self.output_label.setMaximumBlockCount(self.max_lines)
+        self.output_label.link_activated.connect(self.open_link)
+        self.console_writer = ConsoleWriter(self.output_label)
+        layout.addWidget(self.output_label)
+
+        # Lines before this cursor have been checked for traceback frames
+        self.traceback_index = TracebackIndex()
+        self.scan_cursor = QtGui.QTextCursor(self.output_label.document())
+        self.scan_cursor.setKeepPositionOnInsert(True)
+        self.link_format = QtGui.QTextCharFormat()
+        self.link_format.setAnchor(True)
+        self.link_format.setForeground(QtGui.QColor(0x61AFEF))
+        self.link_format.setFontUnderline(True)
+
+        # Output arrives in small chunks, so it is batched and flushed on a timer
+        self.flush_timer = QtCore.QTimer(self)
+        self.flush_timer.setInterval(50)
+        self.flush_timer.timeout.connect(self.flush_output)
+
+        self.script_thread.stdout.connect(self.queue_output)
+        self.script_thread.process_started.connect(self.process_started)
+        self.script_thread.process_finished.connect(self.process_finished)
+        if accounting.live_sampling_supported:
+            self.add_resource_charts()
+        self.update_output(f'Queued {script_thread.file}...\n')
+
+    def add_panel(self, widget):
+        '''Show a widget, such as a live chart, between the toolbar and the output'''
+        self.layout().insertWidget(1, widget)
+
+    def set_status(self, status):
+        self.status = status
+        self.status_label.setText(status)
+        self.status_changed.emit(status)
+
+    def queue_output(self, text):
+        self.pending_output.append(text)
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    def flush_output(self):
+        self.flush_timer.stop()
+        if self.pending_output:
+            text = ''.join(self.pending_output)
+            self.pending_output = []
+            self.update_output(text)
 
     def update_output(self, text):
         scroll_bar = self.output_label.verticalScrollBar()
-        self.output_label.insertPlainText(text)
+        self.scroll_bar_at_bottom = scroll_bar.value() == scroll_bar.maximum()
+        self.console_writer.write(text)
+        self.index_tracebacks()
         if self.scroll_bar_at_bottom:
-            self.output_label.verticalScrollBar().setValue(self.output_label.verticalScrollBar().maximum())
-        if scroll_bar.value() == scroll_bar.maximum():
-            self.scroll_bar_at_bottom = True
+            scroll_bar.setValue(scroll_bar.maximum())
+
+    def index_tracebacks(self):
+        '''Links the traceback frames in the lines completed since the last update'''
+        last_traceback = self.traceback_index.last_traceback
+        block = self.scan_cursor.block()
+        # The last line may still be written to, so it is checked once it is complete
+        while block.next().isValid():
+            match = self.traceback_index.feed_line(block.text())
+            if match is not None:
+                path, line = match.group('path', 'line')
+                self.link_format.setAnchorHref(f'{line}:{path}')
+                cursor = QtGui.QTextCursor(block)
+                cursor.setPosition(block.position() + match.start('link'))
+                cursor.setPosition(block.position() + match.end('link'), QtGui.QTextCursor.KeepAnchor)
+                cursor.mergeCharFormat(self.link_format)
+            block = block.next()
+        self.scan_cursor.setPosition(block.position())
+
+        if self.traceback_index.last_traceback is not last_traceback:
+            frames, message = self.traceback_index.last_traceback
+            self.error_button.setEnabled(True)
+            self.traceback_found.emit(frames, message)
+
+    def open_link(self, href):
+        line, separator, path = href.partition(':')
+        self.location_activated.emit(path, int(line))
+
+    def go_to_error(self):
+        '''Opens the innermost frame of the last traceback that is in a file of the project'''
+        if self.traceback_index.last_traceback is None:
+            return
+        frames = self.traceback_index.last_traceback[0]
+        for path, line in reversed(frames):
+            if os.path.isfile(path) and os.path.abspath(path) != LauncherScriptThread.launcher_path:
+                return self.location_activated.emit(path, line)
+
+    def process_started(self, pid):
+        self.console_writer.clear()
+        self.traceback_index = TracebackIndex()
+        self.scan_cursor.setPosition(0)
+        self.error_button.setEnabled(False)
+        self.update_output(f'Executing {self.script_thread.file} ({self.script_thread.configuration.describe()})...\n')
+        self.pid_label.setText(f'PID {pid}')
+        self.set_status('Running')
+
+    def process_finished(self, exit_code, time_taken):
+        self.flush_output()
+        self.stop_button.setEnabled(False)
+        self.kill_button.setEnabled(False)
+        if self.script_thread.stop_requested:
+            status = 'Stopped'
+        elif exit_code == 0:
+            status = 'Finished'
         else:
-            self.scroll_bar_at_bottom = False
+            status = 'Failed'
+        self.update_output(f'\nProcess finished with exit code {exit_code}\n'
+                           f'Time Elapsed: {round(time_taken, 5)}s\n')
+        if self.script_thread.usage:
+            self.update_output(accounting.format_usage(self.script_thread.usage) + '\n')
+        self.set_status(f'{status} ({exit_code})')
+
+    def add_resource_charts(self):
+        charts = QtWidgets.QWidget(self)
+        charts_layout = QtWidgets.QHBoxLayout(charts)
+        charts_layout.setContentsMargins(0, 0, 0, 0)
+        cpu_chart = LiveChart([('CPU', 0x98C476)], lambda value: f'{value:.0f}%', parent=charts)
+        rss_chart = LiveChart([('RSS', 0x61AFEF)], accounting.format_bytes, parent=charts)
+        charts_layout.addWidget(cpu_chart)
+        charts_layout.addWidget(rss_chart)
+        self.add_panel(charts)
+
+        previous = {}
+
+        def add_sample(usage):
+            if previous:
+                elapsed = usage['wall'] - previous['wall']
+                cpu_time = usage['user'] + usage['system'] - previous['user'] - previous['system']
+                cpu_chart.add_point((100 * cpu_time / elapsed if elapsed else 0,))
+            previous.update(usage)
+            rss_chart.add_point((usage.get('rss', 0),))
+        self.script_thread.resources_sampled.connect(add_sample)
+
+
+class TracebackIndex:
+    '''Collects the frames of the tracebacks in console output, one complete line at a time'''
+
+    frame_expression = re.compile(r'^\s*(?P<link>File "(?P<path>[^"]+)", line (?P<line>\d+))')
+
+    def __init__(self):
+        self.current = None
+        self.last_traceback = None
+
+    def feed_line(self, text):
+        '''Returns the match for a frame line, or None for any other line'''
+        if text.startswith('Traceback (most recent call last):'):
+            self.current = []
+            return None
+        match = self.frame_expression.match(text)
+        if match is not None:
+            frame = (match.group('path'), int(match.group('line')))
+            # Syntax errors in the script itself are reported without a header
+            if self.current is None:
+                self.current = []
+            self.current.append(frame)
+        elif self.current and text[:1].strip():
+            # The first unindented line after the frames is the exception
+            self.last_traceback = (self.current, text.strip())
+            self.current = None
+        return match
+
+
+class ConsoleOutput(QtWidgets.QPlainTextEdit):
+    '''Read-only console text whose anchors, such as traceback frames, can be clicked'''
+
+    link_activated = QtCore.pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setReadOnly(True)
+        self.setObjectName('console')
+        self.viewport().setMouseTracking(True)
+
+    def anchor_at(self, position):
+        cursor = self.cursorForPosition(position)
+        # The cursor's format is that of the character before it
+        if position.x() >= self.cursorRect(cursor).x() and not cursor.atBlockEnd():
+            cursor.movePosition(QtGui.QTextCursor.Right)
+        return cursor.charFormat().anchorHref()
+
+    def mouseMoveEvent(self, event):
+        super().mouseMoveEvent(event)
+        shape = QtCore.Qt.PointingHandCursor if self.anchor_at(event.pos()) else QtCore.Qt.IBeamCursor
+        self.viewport().setCursor(shape)
+
+    def mouseReleaseEvent(self, event):
+        super().mouseReleaseEvent(event)
+        if event.button() == QtCore.Qt.LeftButton and not self.textCursor().hasSelection():
+            href = self.anchor_at(event.pos())
+            if href:
+                self.link_activated.emit(href)
+
+
+class ConsoleWriter:
+    '''Applies terminal output, including ANSI colours and cursor movement, to a console's document
+
+    Text is written with a persistent cursor so carriage returns overwrite the
+    current line in place, which keeps progress bars on a single line.
+    '''
+
+    special_characters = re.compile('[\x1b\r\b]')
+
+    def __init__(self, text_edit):
+        self.text_edit = text_edit
+        self.parser = ansi.AnsiParser()
+        self.formats = {}
+        self.cursor = QtGui.QTextCursor(text_edit.document())
+        self.cursor.movePosition(QtGui.QTextCursor.End)
+
+    def clear(self):
+        self.text_edit.clear()
+        self.parser = ansi.AnsiParser()
+        self.cursor = QtGui.QTextCursor(self.text_edit.document())
+
+    def char_format(self, style):
+        char_format = self.formats.get(style)
+        if char_format is None:
+            char_format = QtGui.QTextCharFormat()
+            if style.foreground is not None:
+                char_format.setForeground(QtGui.QColor(ansi.colour_value(style.foreground)))
+            if style.background is not None:
+                char_format.setBackground(QtGui.QColor(ansi.colour_value(style.background)))
+            if style.bold:
+                char_format.setFontWeight(QtGui.QFont.Bold)
+            char_format.setFontItalic(style.italic)
+            char_format.setFontUnderline(style.underline)
+            self.formats[style] = char_format
+        return char_format
+
+    def write(self, text):
+        # Terminals end lines with \r\n, which is the same as a plain newline here
+        text = text.replace('\r\n', '\n')
+        # Plain output appended at the end needs no parsing at all
+        if not self.parser.pending and self.cursor.atEnd() and not self.special_characters.search(text):
+            return self.cursor.insertText(text, self.char_format(self.parser.style))
+
+        cursor = self.cursor
+        cursor.beginEditBlock()
+        for operation in self.parser.feed(text):
+            name = operation[0]
+            if name == 'text':
+                self.insert_text(operation[1], self.char_format(operation[2]))
+            elif name == 'carriage_return':
+                cursor.movePosition(QtGui.QTextCursor.StartOfBlock)
+            elif name == 'backspace':
+                if not cursor.atBlockStart():
+                    cursor.movePosition(QtGui.QTextCursor.Left)
+            elif name == 'erase_line':
+                self.erase_line(operation[1])
+            elif name == 'erase_display' and operation[1] in (2, 3):
+                cursor.select(QtGui.QTextCursor.Document)
+                cursor.removeSelectedText()
+            elif name == 'cursor_up':
+                self.move_lines(QtGui.QTextCursor.PreviousBlock, operation[1])
+            elif name == 'cursor_down':
+                self.move_lines(QtGui.QTextCursor.NextBlock, operation[1])
+            elif name == 'cursor_column':
+                cursor.movePosition(QtGui.QTextCursor.StartOfBlock)
+                cursor.movePosition(QtGui.QTextCursor.Right, n=min(operation[1] - 1, cursor.block().length() - 1))
+        cursor.endEditBlock()
+
+    def insert_text(self, text, char_format):
+        cursor = self.cursor
+        if cursor.atEnd():
+            return cursor.insertText(text, char_format)
+        for index, line in enumerate(text.split('\n')):
+            if index:
+                if cursor.block().next().isValid():
+                    cursor.movePosition(QtGui.QTextCursor.NextBlock)
+                else:
+                    cursor.movePosition(QtGui.QTextCursor.EndOfBlock)
+                    cursor.insertBlock()
+            if line:
+                # Overwrite what is already on the line, like a terminal does
+                remaining = cursor.block().length() - 1 - cursor.positionInBlock()
+                cursor.movePosition(QtGui.QTextCursor.Right, QtGui.QTextCursor.KeepAnchor, min(len(line), remaining))
+                cursor.insertText(line, char_format)
+
+    def erase_line(self, mode):
+        cursor = self.cursor
+        column = cursor.positionInBlock()
+        if mode == 0:
+            cursor.movePosition(QtGui.QTextCursor.EndOfBlock, QtGui.QTextCursor.KeepAnchor)
+            cursor.removeSelectedText()
+        elif mode == 1:
+            cursor.movePosition(QtGui.QTextCursor.StartOfBlock, QtGui.QTextCursor.KeepAnchor)
+            cursor.insertText(' ' * column)
+        elif mode == 2:
+            cursor.movePosition(QtGui.QTextCursor.StartOfBlock)
+            cursor.movePosition(QtGui.QTextCursor.EndOfBlock, QtGui.QTextCursor.KeepAnchor)
+            cursor.insertText(' ' * column)
+
+    def move_lines(self, direction, count):
+        column = self.cursor.positionInBlock()
+        for _ in range(count):
+            if not self.cursor.movePosition(direction):
+                break
+        self.cursor.movePosition(QtGui.QTextCursor.StartOfBlock)
+        self.cursor.movePosition(QtGui.QTextCursor.Right, n=min(column, self.cursor.block().length() - 1))
+
+
+class LiveChart(QtWidgets.QWidget):
+    '''Small line chart for values streamed from a running process'''
+
+    def __init__(self, series, format_value=str, max_points=600, parent=None):
+        super().__init__(parent)
+        self.series = series
+        self.format_value = format_value
+        self.points = collections.deque(maxlen=max_points)
+        self.setObjectName('live_chart')
+        self.setMinimumHeight(60)
+        self.setMaximumHeight(90)
+
+    def add_point(self, values):
+        self.points.append(values)
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QtGui.QPainter(self)
+        painter.fillRect(self.rect(), QtGui.QColor(0x21252B))
+        if not self.points:
+            return
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        maximum = max(max(values) for values in self.points) or 1
+        chart_height = self.height() - 18
+        step = self.width() / max(len(self.points) - 1, 1)
+        for index, (name, colour) in enumerate(self.series):
+            path = QtGui.QPainterPath()
+            for x, values in enumerate(self.points):
+                point = QtCore.QPointF(x * step, 16 + chart_height * (1 - values[index] / maximum))
+                if x:
+                    path.lineTo(point)
+                else:
+                    path.moveTo(point)
+            painter.setPen(QtGui.QPen(QtGui.QColor(colour), 1.5))
+            painter.drawPath(path)
+
+        legend = '   '.join(f'{name}: {self.format_value(value)}'
+                            for (name, colour), value in zip(self.series, self.points[-1]))
+        painter.setPen(QtGui.QColor(0xA9B7C6))
+        painter.drawText(5, 12, legend)
 
-    def run_script(self, file):
-        self.script_thread = RunScriptThread(file)
-        self.script_thread.stdout.connect(self.update_output)
-        self.script_thread.finished_stdout.connect(self.output_label.setPlainText)
-        self.script_thread.start()
+
+class RunHistoryDock(TitledDockWidget):
+    '''Compares the resource usage of the last runs of a file'''
+
+    columns = ['Started', 'Mode', 'Configuration', 'Exit', 'Wall', 'User', 'Sys', 'Peak RSS', 'Ctx Switches', 'I/O']
+
+    def __init__(self, settings, parent=None, history_size=10):
+        super().__init__('Run History', parent)
+        self.settings = settings
+        self.history_size = history_size
+        self.current_file = None
+        try:
+            self.history = json.loads(self.settings.value('run_history', '{}'))
+        except ValueError:
+            self.history = {}
+
+        self.history_table = QtWidgets.QTreeWidget(self)
+        self.history_table.setObjectName('hotspots')
+        self.history_table.setRootIsDecorated(False)
+        self.history_table.setHeaderLabels(self.columns)
+        self.setWidget(self.history_table)
+
+    def record(self, script_thread):
+        if script_thread.process is None:
+            return
+        path = os.path.abspath(script_thread.file)
+        entry = dict(script_thread.usage, started=script_thread.started_at, mode=script_thread.mode,
+                     configuration=script_thread.configuration.name, exit_code=script_thread.process.returncode)
+        runs = self.history.setdefault(path, [])
+        runs.append(entry)
+        del runs[:-self.history_size]
+        self.settings.setValue('run_history', json.dumps(self.history))
+        if path == self.current_file:
+            self.show_file(path)
+
+    def show_file(self, path):
+        self.current_file = path and os.path.abspath(path)
+        self.history_table.clear()
+        runs = self.history.get(self.current_file, [])
+        fastest = min((run['wall'] for run in runs if run['exit_code'] == 0), default=None)
+        for run in reversed(runs):
+            io = ''
+            if 'read_bytes' in run:
+                io = f"{accounting.format_bytes(run['read_bytes'])} / {accounting.format_bytes(run['write_bytes'])}"
+            elif 'read_blocks' in run:
+                io = f"{run['read_blocks']} / {run['write_blocks']} blocks"
+            item = QtWidgets.QTreeWidgetItem([
+                time.strftime('%H:%M:%S', time.localtime(run['started'])),
+                run['mode'],
+                run.get('configuration', 'Default'),
+                str(run['exit_code']),
+                f"{run['wall']:.4f}s",
+                f"{run['user']:.3f}s" if 'user' in run else '',
+                f"{run['system']:.3f}s" if 'system' in run else '',
+                accounting.format_bytes(run['peak_rss']) if 'peak_rss' in run else '',
+                f"{run['voluntary_switches']} / {run['involuntary_switches']}" if 'voluntary_switches' in run else '',
+                io,
+            ])
+            if fastest is not None and run['exit_code'] == 0 and run['wall'] > fastest:
+                item.setToolTip(4, f"+{(run['wall'] / fastest - 1) * 100:.1f}% slower than the fastest run")
+            self.history_table.addTopLevelItem(item)
+
+
+class RunManager(QtCore.QObject):
+    '''Runs scripts concurrently, queueing any beyond the worker limit'''
+
+    run_started = QtCore.pyqtSignal(object)
+    run_finished = QtCore.pyqtSignal(object)
+
+    def __init__(self, max_workers=4, parent=None):
+        super().__init__(parent)
+        self.max_workers = max(1, max_workers)
+        self.pending = collections.deque()
+        self.active = []
+
+    def set_max_workers(self, max_workers):
+        self.max_workers = max(1, max_workers)
+        self.start_pending()
+
+    def submit(self, script_thread):
+        script_thread.finished.connect(lambda: self.thread_finished(script_thread))
+        self.pending.append(script_thread)
+        self.start_pending()
+
+    def start_pending(self):
+        while self.pending and len(self.active) < self.max_workers:
+            script_thread = self.pending.popleft()
+            self.active.append(script_thread)
+            script_thread.start()
+            self.run_started.emit(script_thread)
+
+    def cancel(self, script_thread):
+        if script_thread in self.pending:
+            self.pending.remove(script_thread)
+            script_thread.stop_requested = True
+            script_thread.process_finished.emit(-1, 0)
+        elif script_thread in self.active:
+            script_thread.kill()
+
+    def thread_finished(self, script_thread):
+        if script_thread in self.active:
+            self.active.remove(script_thread)
+            self.run_finished.emit(script_thread)
+        self.start_pending()
 
 
 class RunScriptThread(QtCore.QThread):
 
     stdout = QtCore.pyqtSignal(str)
-    finished_stdout = QtCore.pyqtSignal(str)
+    process_started = QtCore.pyqtSignal(int)
+    process_finished = QtCore.pyqtSignal(int, float)
+    resources_sampled = QtCore.pyqtSignal(dict)
+
+    mode = 'run'
+    sample_interval = 0.25
+    terminal_rows = 24
+    terminal_columns = 120
 
-    def __init__(self, file):
+    def __init__(self, file, use_pty=False, configuration=None):
         super().__init__()
         self.file = file
-        self.total_stdout = f'Executing {file}...\n'
-        self.next_stdout = self.total_stdout
+        self.use_pty = use_pty
+        self.configuration = configuration or RunConfiguration()
+        self.process = None
+        self.stop_requested = False
+        self.exited = threading.Event()
+        self.usage = {}
+        self.started_at = None
 
-    def run(self):
-        self.finished_stdout.emit(self.next_stdout)
-        start_time = time.time()
-        process = subprocess.Popen('python "' + self.file + '"', stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        emits = 0
-        while process.poll() is None:
-            next_line = process.stdout.readline()
-            self.total_stdout += next_line.decode()
-            self.next_stdout += next_line.decode()
-            if round(time.time() - start_time, 1) > emits * 0.2:
-                self.stdout.emit(self.next_stdout)
-                self.next_stdout = ''
-                emits += 1
-        time_taken = time.time() - start_time
-        cleanup, errors = process.communicate()
-        final_string = self.total_stdout + cleanup.decode()
-        if errors:
-            final_string += '\n' + errors.decode() + '\n'
-        self.finished_stdout.emit(final_string + '\nTime Elapsed: {}s\n'.format(round(time_taken, 5)))
-
-
-class ProjectStructureDock(QtWidgets.QDockWidget):
+    def command(self):
+        # The configuration may run the script from another directory
+        return self.configuration.python_command() + [os.path.abspath(self.file)] + self.configuration.script_arguments()
 
-    file_opened = QtCore.pyqtSignal(str)
+    def prepare(self):
+        pass
 
-    def __init__(self, parent=None):
-        super().__init__('Project Structure', parent)
+    def cleanup(self):
+        pass
 
-        self.title_bar = QtWidgets.QWidget(self)
-        self.title_bar.setObjectName('dock_title')
-        title_layout = QtWidgets.QHBoxLayout(self.title_bar)
-        title_layout.setContentsMargins(5, 0, 5, 0)
+    def run(self):
+        if self.stop_requested:
+            return
+        self.prepare()
+        self.started_at = time.time()
+        start_time = time.perf_counter()
+        try:
+            if self.use_pty and pty is not None:
+                read_output = self.start_terminal_process()
+            else:
+                self.process = subprocess.Popen(self.command(), stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                                stdin=subprocess.DEVNULL, env=self.configuration.process_environment(),
+                                                cwd=self.configuration.cwd())
+                read_output = self.process.stdout.read1
+        except (OSError, ValueError) as error:
+            # A missing interpreter or working directory, or arguments with unbalanced quotes
+            self.stdout.emit(f'Could not start {self.file}: {error}\n')
+            self.exited.set()
+            self.cleanup()
+            self.process_finished.emit(-1, 0.0)
+            return
+        if self.stop_requested:
+            # Stopped while the process was starting, when stop() had no process to end yet
+            self.process.kill()
+        self.process_started.emit(self.process.pid)
+        sampler = None
+        if accounting.live_sampling_supported:
+            sampler = threading.Thread(target=self.sample_resources, args=(start_time,), daemon=True)
+            sampler.start()
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        while True:
+            chunk = read_output(65536)
+            if not chunk:
+                break
+            self.stdout.emit(decoder.decode(chunk))
+        remaining = decoder.decode(b'', final=True)
+        if remaining:
+            self.stdout.emit(remaining)
+        rusage = accounting.wait_with_usage(self.process)
+        time_taken = time.perf_counter() - start_time
+        self.exited.set()
+        if sampler is not None:
+            sampler.join()
+        self.usage.update(rusage or {})
+        self.usage['wall'] = time_taken
+        self.cleanup()
+        self.process_finished.emit(self.process.returncode, time_taken)
+
+    def start_terminal_process(self):
+        '''Runs the process on a pseudo-terminal so it line buffers and draws progress bars as it would in a shell'''
+        master, slave = pty.openpty()
+        fcntl.ioctl(slave, termios.TIOCSWINSZ, struct.pack('HHHH', self.terminal_rows, self.terminal_columns, 0, 0))
+        environment = self.configuration.process_environment(TERM='xterm-256color', COLUMNS=str(self.terminal_columns))
+        try:
+            self.process = subprocess.Popen(self.command(), stdout=slave, stderr=slave, stdin=subprocess.DEVNULL,
+                                            env=environment, cwd=self.configuration.cwd())
+        except (OSError, ValueError):
+            os.close(master)
+            raise
+        finally:
+            os.close(slave)
+
+        def read_output(size):
+            try:
+                chunk = os.read(master, size)
+            except OSError:
+                chunk = b''  # Linux raises EIO once the last process using the terminal has gone
+            if not chunk:
+                os.close(master)
+            return chunk
+        return read_output
+
+    def sample_resources(self, start_time):
+        while not self.exited.wait(self.sample_interval):
+            usage = accounting.read_process_usage(self.process.pid)
+            if usage is None or self.exited.is_set():
+                break
+            usage['wall'] = time.perf_counter() - start_time
+            # I/O counters are only available from /proc, so keep the last reading
+            self.usage = dict(usage)
+            self.resources_sampled.emit(usage)
+
+    def stop(self):
+        self.stop_requested = True
+        if self.process and not self.exited.is_set():
+            self.process.terminate()
+
+    def kill(self):
+        self.stop_requested = True
+        if self.process and not self.exited.is_set():
+            self.process.kill()
+
+
+class LauncherScriptThread(RunScriptThread):
+    '''Runs a script through launcher.py and relays the messages it sends back'''
+
+    message = QtCore.pyqtSignal(dict)
+    launcher_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'launcher.py')
+
+    def __init__(self, file, mode, use_pty=False, configuration=None, **options):
+        super().__init__(file, use_pty, configuration)
+        self.mode = mode
+        self.options = options
+        self.server = None
+        self.reader = None
+        self.connection = None
+        self.pending_requests = []
+        self.lock = threading.Lock()
+
+    def command(self):
+        port = self.server.getsockname()[1]
+        command = self.configuration.python_command() + [self.launcher_path, '--port', str(port), '--mode', self.mode]
+        for name, value in self.options.items():
+            command += ['--' + name.replace('_', '-'), str(value)]
+        return command + [os.path.abspath(self.file)] + self.configuration.script_arguments()
+
+    def prepare(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(1)
+        self.server.settimeout(0.2)
+        self.reader = threading.Thread(target=self.read_messages, daemon=True)
+        self.reader.start()
+
+    def cleanup(self):
+        # Results are sent just before the child exits, so wait for them to arrive
+        self.reader.join(5)
+        self.server.close()
+
+    def read_messages(self):
+        connection = None
+        while connection is None:
+            try:
+                connection, address = self.server.accept()
+            except socket.timeout:
+                if self.exited.is_set():
+                    return
+            except OSError:
+                return
+        connection.settimeout(None)
+        with self.lock:
+            self.connection = connection
+            for request in self.pending_requests:
+                connection.sendall(request)
+            self.pending_requests = []
+        with connection, connection.makefile('rb') as stream:
+            for line in stream:
+                try:
+                    self.message.emit(json.loads(line.decode()))
+                except ValueError:
+                    continue
+        with self.lock:
+            self.connection = None
+
+    def send(self, message_type, **data):
+        '''Sends a command to the launcher, such as a debugger step, once it has connected'''
+        data['type'] = message_type
+        request = (json.dumps(data) + '\n').encode()
+        with self.lock:
+            if self.connection is None:
+                self.pending_requests.append(request)
+            else:
+                try:
+                    self.connection.sendall(request)
+                except OSError:
+                    pass
 
-        self.title_label = QtWidgets.QLabel('Project Structure', self.title_bar)
-        self.title_label.setObjectName('dock_title_label')
-        size_policy = QtWidgets.QSizePolicy()
-        size_policy.setHorizontalPolicy(QtWidgets.QSizePolicy.Expanding)
-        self.title_label.setSizePolicy(size_policy)
-        title_layout.addWidget(self.title_label)
 
-        self.close_button = QtWidgets.QPushButton(self.title_bar)
-        self.close_button.setObjectName('dock_close')
-        self.close_button.clicked.connect(self.close)
-        title_layout.addWidget(self.close_button)
+class ProjectStructureDock(TitledDockWidget):
 
-        self.title_bar.setLayout(title_layout)
-        self.setTitleBarWidget(self.title_bar)
+    file_opened = QtCore.pyqtSignal(str)
+
+    def __init__(self, parent=None, excludes=None):
+        super().__init__('Project Structure', parent)
+        self.excludes = excludes
         self.init_project_structure_widget()
         self.dockLocationChanged.connect(self.style_borders)
 
@@ -130,50 +845,188 @@ class ProjectStructureDock(QtWidgets.QDockWidget):
         self.title_bar.setStyleSheet(f'QWidget#dock_title{{border-bottom: 1px solid {secondary_colour};}}')
 
     def reload_directory(self):
-        self.project_structure_tree.setRootIndex(self.filesystem_model.setRootPath(os.getcwd()))
+        if self.project_model.root is not None and self.project_model.root.path == os.path.abspath(os.getcwd()):
+            self.project_model.refresh()
+        else:
+            self.project_model.set_root(os.getcwd(), self.excludes)
+
+    def refresh(self, path=None):
+        self.project_model.refresh(path)
+
+    def stop(self):
+        self.project_model.stop()
+
+    def index_path(self, index):
+        return self.project_model.file_path(index)
+
+    def set_coverage(self, totals):
+        '''Show the covered percentage of measured files and their directories, from {path: (executed, executable)}'''
+        self.coverage_totals = totals
+        self.project_structure_tree.viewport().update()
 
     def init_project_structure_widget(self):
-        self.filesystem_model = QtWidgets.QFileSystemModel()
-        self.filesystem_model.setFilter(QtCore.QDir.AllEntries | QtCore.QDir.NoDotAndDotDot)
+        self.project_model = ProjectTreeModel(self)
         self.project_structure_tree = QtWidgets.QTreeView(self)
-        self.project_structure_tree.setModel(self.filesystem_model)
-        self.project_structure_tree.hideColumn(1) # Size Column
-        self.project_structure_tree.hideColumn(2) # Type Column
-        self.project_structure_tree.hideColumn(3) # Date Modified Column
+        self.project_structure_tree.setModel(self.project_model)
+        self.project_structure_tree.setUniformRowHeights(True)
         self.project_structure_tree.setObjectName('project_structure')
         self.project_structure_tree.setHeaderHidden(True)
         self.project_structure_tree.activated.connect(self.item_clicked)
+        self.coverage_totals = {}
+        self.project_structure_tree.setItemDelegate(CoverageDelegate(self, self.project_structure_tree))
         self.setWidget(self.project_structure_tree)
-        self.reload_directory()
 
     def item_clicked(self, index):
-        path = str(self.filesystem_model.filePath(index))
+        path = self.project_model.file_path(index)
         if os.path.isfile(path):
             self.file_opened.emit(path)
 
 
 
+class CoverageDelegate(QtWidgets.QStyledItemDelegate):
+    '''Draws the coverage percentage of a file or directory at the right of the project tree'''
+
+    def __init__(self, dock, parent=None):
+        super().__init__(parent)
+        self.dock = dock
+
+    def paint(self, painter, option, index):
+        super().paint(painter, option, index)
+        if not self.dock.coverage_totals:
+            return
+        totals = self.dock.coverage_totals.get(self.dock.index_path(index))
+        if totals is None or not totals[1]:
+            return
+        percentage = 100 * totals[0] / totals[1]
+        colour = QtGui.QColor.fromHsv(int(120 * percentage / 100), 150, 200)
+        painter.save()
+        painter.setPen(colour)
+        painter.drawText(option.rect.adjusted(0, 0, -4, 0), QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter,
+                         f'{percentage:.0f}%')
+        painter.restore()
+
+
+class QuickOpenEntry(QtWidgets.QLineEdit):
+    '''Line edit that passes the arrow and page keys on to the list of results below it'''
+
+    moved = QtCore.pyqtSignal(int)
+
+    steps = {QtCore.Qt.Key_Up: -1, QtCore.Qt.Key_Down: 1, QtCore.Qt.Key_PageUp: -10, QtCore.Qt.Key_PageDown: 10}
+
+    def keyPressEvent(self, event):
+        if event.key() in self.steps:
+            self.moved.emit(self.steps[event.key()])
+        else:
+            super().keyPressEvent(event)
+
+
+class QuickOpenList(QtWidgets.QListWidget):
+    '''Fuzzy matches of a quick open query, with the matched characters in bold'''
+
+    def show_matches(self, matches):
+        self.clear()
+        for entry, positions in matches:
+            positions = set(positions)
+            text = ''.join(f'<b>{html.escape(character)}</b>' if position in positions else html.escape(character)
+                           for position, character in enumerate(entry.relative))
+            item = QtWidgets.QListWidgetItem(self)
+            item.setData(QtCore.Qt.UserRole, entry.path)
+            item.setToolTip(entry.path)
+            label = QtWidgets.QLabel(text, self)
+            label.setObjectName('quick_open_label')
+            label.setTextFormat(QtCore.Qt.RichText)
+            self.setItemWidget(item, label)
+        if matches:
+            self.setCurrentRow(0)
+
+    def move_selection(self, step):
+        if self.count():
+            self.setCurrentRow(max(0, min(self.count() - 1, self.currentRow() + step)))
+
+    def selected_path(self):
+        item = self.currentItem()
+        return item.data(QtCore.Qt.UserRole) if item is not None else None
+
+
+class QuickOpenSearch(QtCore.QObject):
+    '''Matches quick open queries on a worker thread a moment after typing stops, dropping stale ones
+
+    Filtering a large project's paths takes longer than a keystroke, so it never runs on the GUI thread.
+    '''
+
+    matches_found = QtCore.pyqtSignal(list)
+    matched = QtCore.pyqtSignal(int, list)
+
+    def __init__(self, matcher, executor, parent=None, delay=30):
+        super().__init__(parent)
+        self.matcher = matcher
+        self.executor = executor
+        self.query = ''
+        self.generation = 0
+        self.matched.connect(self.deliver)
+        self.match_timer = QtCore.QTimer(self)
+        self.match_timer.setSingleShot(True)
+        self.match_timer.setInterval(delay)
+        self.match_timer.timeout.connect(self.match)
+
+    def set_query(self, query):
+        self.query = query
+        self.generation += 1
+        self.match_timer.start()
+
+    def match(self):
+        generation, query = self.generation, self.query
+
+        def run():
+            # Skipped when typing went on while it waited behind an earlier query
+            return self.matcher.match(query) if generation == self.generation else None
+
+        def done(future):
+            if future.cancelled() or future.exception() is not None or future.result() is None:
+                return
+            try:
+                self.matched.emit(generation, future.result())
+            except RuntimeError:
+                pass  # The dialog was closed while the query was matched
+        self.executor.submit(run).add_done_callback(done)
+
+    def deliver(self, generation, matches):
+        if generation == self.generation:
+            self.matches_found.emit(matches)
+
+
 class CodeTabWidget(QtWidgets.QTabWidget):
+
+    breakpoints_changed = QtCore.pyqtSignal(str, list)
+    definition_requested = QtCore.pyqtSignal(str, str, int, bool)
+    usages_requested = QtCore.pyqtSignal(str)
+    open_files_changed = QtCore.pyqtSignal()
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setObjectName('code_tabs')
         self.open_editors = MutableBidict()
+        self.project_completions = None
         self.setTabsClosable(True)
         self.setMovable(True)
         self.welcome_tab = self.show_welcome_tab()
         
 
+    @staticmethod
+    def read_file(path):
+        '''(contents, read only) of a file, which is read only when it cannot be decoded'''
+        with open(path, 'rb') as file:
+            file_bytes = file.read()
+        try:
+            encoding = chardet.detect(file_bytes)['encoding']
+            return file_bytes.decode(encoding or 'utf-8'), False
+        except UnicodeDecodeError:
+            return str(file_bytes)[2:-2], True
+
     def addTab(self, path):
         read_only = False
         if os.path.exists(path):
-            with open(path, 'rb') as file:
-                try:
-                    file_bytes = file.read()
-                    encoding = chardet.detect(file_bytes)['encoding']
-                    contents = file_bytes.decode(encoding)
-                except UnicodeDecodeError:
-                    contents = str(file_bytes)[2:-2]
-                    read_only = True
+            contents, read_only = self.read_file(path)
         else:
             with open(path, 'w') as file:
                 contents = ''
@@ -184,8 +1037,18 @@ class CodeTabWidget(QtWidgets.QTabWidget):
             code_widget.setReadOnly(read_only)
             code_widget.setPlainText(contents)
             code_widget.setFocus()
+            # Looked up when emitted, as Save As can move the tab to another path
+            code_widget.breakpoints_changed.connect(
+                lambda lines, editor=code_widget: self.breakpoints_changed.emit(self.open_editors.inv[editor], lines))
+            code_widget.definition_requested.connect(
+                lambda name, line, attribute, editor=code_widget: self.definition_requested.emit(
+                    self.open_editors.inv[editor], name, line, attribute))
+            code_widget.usages_requested.connect(self.usages_requested)
+            if self.project_completions is not None:
+                code_widget.set_completions(self.project_completions)
             self.open_editors[path] = code_widget
             super().addTab(self.open_editors[path], tab_name)
+            self.open_files_changed.emit()
 
         if self.welcome_tab is not None:
             super().removeTab(self.welcome_tab)
@@ -194,10 +1057,49 @@ class CodeTabWidget(QtWidgets.QTabWidget):
 
         return self.open_editors[path]
 
+    def set_completions(self, project_completions):
+        '''Offers completions from the project in every editor, including those opened later'''
+        self.project_completions = project_completions
+        for editor in self.open_editors.values():
+            editor.set_completions(project_completions)
+
+    def rename_file(self, editor, path):
+        '''Moves an editor's tab to another path, which no other tab may have open'''
+        self.open_editors.inv.pop(editor)
+        self.open_editors[path] = editor
+        self.setTabText(self.indexOf(editor), os.path.basename(path))
+        self.open_files_changed.emit()
+
+    def find_editor(self, path):
+        path = os.path.abspath(path)
+        for editor_path, editor in self.open_editors.items():
+            if os.path.abspath(editor_path) == path:
+                return editor
+
+    def reload_file(self, path):
+        '''Reloads the tab of a file that changed on disk, unless the tab has edits that are not saved'''
+        editor = self.find_editor(path)
+        if editor is None or not os.path.isfile(path) or file_stamp(path) == editor.saved_stamp:
+            return  # Gone, or still as this editor saved it, even if it has been edited since
+        try:
+            contents, read_only = self.read_file(path)
+        except OSError:
+            return
+        contents = contents.replace('\r\n', '\n')
+        if contents == editor.toPlainText():
+            editor.changed_on_disk = False
+        elif editor.document().isModified():
+            editor.changed_on_disk = True
+        else:
+            editor.replace_text(contents)
+            editor.setReadOnly(read_only)
+            editor.changed_on_disk = False
+
     def removeTab(self, p_int):
         widget = self.widget(p_int)
         self.open_editors.inv.pop(widget)
         super().removeTab(p_int)
+        self.open_files_changed.emit()
         if self.tabBar().count() < 1:
             self.welcome_tab = self.show_welcome_tab()
 
@@ -222,6 +1124,17 @@ class CodeTabWidget(QtWidgets.QTabWidget):
         self.setTabsClosable(False)
         return index
 
+class BlockMarkers(QtGui.QTextBlockUserData):
+    '''Gutter information attached to a line, so it follows the line as it is edited'''
+
+    def __init__(self):
+        super().__init__()
+        self.heat = None
+        self.error = None
+        self.breakpoint = False
+        self.coverage = None
+
+
 class LineNumberArea(QtWidgets.QWidget):
     def __init__(self, editor):
         super().__init__(editor)
@@ -233,10 +1146,30 @@ class LineNumberArea(QtWidgets.QWidget):
     def paintEvent(self, event):
         self.editor.line_number_area_paint_event(event)
 
+    def mousePressEvent(self, event):
+        if event.button() == QtCore.Qt.LeftButton:
+            self.editor.toggle_breakpoint(self.editor.cursorForPosition(QtCore.QPoint(0, event.pos().y())).block())
+
+    def event(self, event):
+        if event.type() == QtCore.QEvent.ToolTip:
+            tooltip = self.editor.line_number_area_tooltip(event.pos())
+            if tooltip:
+                QtWidgets.QToolTip.showText(event.globalPos(), tooltip, self)
+            else:
+                QtWidgets.QToolTip.hideText()
+            return True
+        return super().event(event)
+
 class CodeEditor(QtWidgets.QPlainTextEdit):
+
+    breakpoints_changed = QtCore.pyqtSignal(list)
+
     def __init__(self, language, parent=None):
         super().__init__(parent)
         self.font_size = 12
+        self.execution_line = 0
+        self.changed_on_disk = False
+        self.saved_stamp = None  # (size, modification time) of the file as this editor last wrote it
 
         # General
         self.setLineWrapMode(QtWidgets.QPlainTextEdit.NoWrap)
@@ -246,6 +1179,7 @@ class CodeEditor(QtWidgets.QPlainTextEdit):
         self.language = language
         self.theme = language.theme
         self.line_numbers_area = LineNumberArea(self)
+        self.max_line_heat = 0
         self.blockCountChanged.connect(self.update_line_numbers_area_width)
         self.updateRequest.connect(self.update_line_numbers_area)
         self.update_line_numbers_area_width(0)
@@ -296,6 +1230,161 @@ class CodeEditor(QtWidgets.QPlainTextEdit):
             self.setExtraSelections(extra_selections)
 
 
+    def block_markers(self, block, create=False):
+        markers = block.userData()
+        if markers is None and create:
+            markers = BlockMarkers()
+            block.setUserData(markers)
+        return markers
+
+    def blocks(self):
+        block = self.document().firstBlock()
+        while block.isValid():
+            yield block
+            block = block.next()
+
+    def set_line_heat(self, line_heat):
+        '''Show per-line (hits, seconds) from a line profile as a heat strip in the gutter'''
+        self.max_line_heat = max((seconds for hits, seconds in line_heat.values()), default=0)
+        for block in self.blocks():
+            heat = line_heat.get(block.blockNumber() + 1)
+            markers = self.block_markers(block, create=heat is not None)
+            if markers is not None:
+                markers.heat = heat
+        self.line_numbers_area.update()
+
+    def clear_line_heat(self):
+        self.set_line_heat({})
+
+    def set_error_lines(self, error_lines):
+        '''Mark the lines of a traceback in the gutter, with the exception message as their tooltip'''
+        for block in self.blocks():
+            error = error_lines.get(block.blockNumber() + 1)
+            markers = self.block_markers(block, create=error is not None)
+            if markers is not None:
+                markers.error = error
+        self.line_numbers_area.update()
+
+    def clear_error_lines(self):
+        self.set_error_lines({})
+
+    def set_line_coverage(self, line_coverage):
+        '''Mark executable lines in the gutter as covered (True) or not (False)'''
+        for block in self.blocks():
+            covered = line_coverage.get(block.blockNumber() + 1)
+            markers = self.block_markers(block, create=covered is not None)
+            if markers is not None:
+                markers.coverage = covered
+        self.line_numbers_area.update()
+
+    def breakpoint_lines(self):
+        return [block.blockNumber() + 1 for block in self.blocks()
+                if block.userData() is not None and block.userData().breakpoint]
+
+    def toggle_breakpoint(self, block):
+        markers = self.block_markers(block, create=True)
+        markers.breakpoint = not markers.breakpoint
+        self.line_numbers_area.update()
+        self.breakpoints_changed.emit(self.breakpoint_lines())
+
+    def set_execution_line(self, line):
+        '''Point at the line where the debugger is stopped, or at no line for 0'''
+        self.execution_line = line
+        self.line_numbers_area.update()
+
+    def heat_colour(self, seconds):
+        ratio = seconds / self.max_line_heat if self.max_line_heat else 0
+        colour = QtGui.QColor.fromHsv(int(60 - 60 * ratio), 200, 120 + int(135 * ratio))
+        return colour
+
+    def line_number_area_tooltip(self, position):
+        block = self.cursorForPosition(QtCore.QPoint(0, position.y())).block()
+        markers = self.block_markers(block)
+        if markers is None:
+            return None
+        tooltip = []
+        if markers.error is not None:
+            tooltip.append(markers.error)
+        if markers.heat is not None:
+            hits, seconds = markers.heat
+            tooltip.append(f'Line {block.blockNumber() + 1}: {hits} hits, {seconds * 1000:.3f}ms')
+        return '\n'.join(tooltip)
+
+    def is_cell_marker(self, block):
+        cell_marker = getattr(self.language, 'cell_marker', None)
+        return cell_marker is not None and cell_marker.indexIn(block.text(), 0) >= 0
+
+    def cells(self):
+        '''(first line, last line) of every cell in the document, 0-based'''
+        starts = [block.blockNumber() for block in self.blocks() if self.is_cell_marker(block)]
+        if not starts or starts[0] != 0:
+            starts.insert(0, 0)
+        ends = [start - 1 for start in starts[1:]] + [self.blockCount() - 1]
+        return list(zip(starts, ends))
+
+    def current_cell(self):
+        line = self.textCursor().blockNumber()
+        for index, (start, end) in enumerate(self.cells()):
+            if start <= line <= end:
+                return index, start, end
+
+    def cell_text(self, start, end):
+        lines = [self.document().findBlockByNumber(line).text() for line in range(start, end + 1)]
+        return '\n'.join(lines)
+
+    def cell_title(self, index, start):
+        text = self.document().findBlockByNumber(start).text()
+        if self.is_cell_marker(self.document().findBlockByNumber(start)):
+            title = text.split('%%', 1)[1].strip()
+            if title:
+                return f'Cell {index + 1}: {title}'
+        return f'Cell {index + 1}'
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if getattr(self.language, 'cell_marker', None) is None:
+            return
+        painter = QtGui.QPainter(self.viewport())
+        painter.setPen(self.theme['cell_separator'])
+        block = self.firstVisibleBlock()
+        while block.isValid():
+            top = self.blockBoundingGeometry(block).translated(self.contentOffset()).top()
+            if top > event.rect().bottom():
+                break
+            if block.blockNumber() and self.is_cell_marker(block):
+                painter.drawLine(0, int(top), self.viewport().width(), int(top))
+            block = block.next()
+
+    def mark_saved(self, path):
+        '''Marks the text as saved to path, so the watcher can tell the write apart from other programs' ones'''
+        self.document().setModified(False)
+        self.changed_on_disk = False
+        self.saved_stamp = file_stamp(path)
+
+    def replace_text(self, text):
+        '''Replaces the whole text as one undoable edit, keeping the cursor and scroll position'''
+        cursor = self.textCursor()
+        anchor, position = cursor.anchor(), cursor.position()
+        horizontal, vertical = self.horizontalScrollBar().value(), self.verticalScrollBar().value()
+        cursor.beginEditBlock()
+        cursor.select(QtGui.QTextCursor.Document)
+        cursor.insertText(text)
+        cursor.endEditBlock()
+        end = self.document().characterCount() - 1
+        cursor.setPosition(min(anchor, end))
+        cursor.setPosition(min(position, end), QtGui.QTextCursor.KeepAnchor)
+        self.setTextCursor(cursor)
+        self.horizontalScrollBar().setValue(horizontal)
+        self.verticalScrollBar().setValue(vertical)
+        self.document().setModified(False)
+
+    def go_to_line(self, line):
+        block = self.document().findBlockByNumber(max(line - 1, 0))
+        cursor = QtGui.QTextCursor(block)
+        self.setTextCursor(cursor)
+        self.centerCursor()
+        self.setFocus()
+
     def activate_theme(self):
         '''Change the current theme'''
         background_colour = self.theme['editor_background'].name()
@@ -351,8 +1440,23 @@ class CodeEditor(QtWidgets.QPlainTextEdit):
                     painter.fillRect(0, top, self.line_numbers_area_width(), height, self.theme['editor_background'].lighter(140))
                 else:
                     painter.setPen(self.theme['line_numbers_colour'])
+                markers = self.block_markers(block)
+                if markers is not None and markers.error is not None:
+                    painter.fillRect(0, int(top), self.line_numbers_area_width(), height, self.theme['error_line'])
+                if markers is not None and markers.heat is not None:
+                    painter.fillRect(0, int(top), 4, height, self.heat_colour(markers.heat[1]))
                 left_padding = self.fontMetrics().width(str(total_lines)) + 15
                 painter.drawText(0, top, left_padding, height, QtCore.Qt.AlignRight, number)
+                if markers is not None and markers.coverage is not None:
+                    colour = self.theme['covered_line'] if markers.coverage else self.theme['uncovered_line']
+                    painter.fillRect(self.line_numbers_area_width() - 3, int(top), 3, height, colour)
+                if blockNumber + 1 == self.execution_line:
+                    painter.fillRect(left_padding + 1, int(top), 2, height, self.theme['execution_line'])
+                if markers is not None and markers.breakpoint:
+                    size = min(height - 4, 9)
+                    painter.setBrush(self.theme['breakpoint'])
+                    painter.setPen(QtCore.Qt.NoPen)
+                    painter.drawEllipse(left_padding + 3, int(top) + (height - size) // 2, size, size)
             block = block.next()
             top = bottom
             bottom = top + self.blockBoundingRect(block).height()
@@ -360,8 +1464,16 @@ class CodeEditor(QtWidgets.QPlainTextEdit):
 
 
 class AutoIndentCodeEditor(CodeEditor):
+
+    # Keys the completion popup acts on while it is showing
+    completion_keys = (QtCore.Qt.Key_Return, QtCore.Qt.Key_Enter, QtCore.Qt.Key_Tab, QtCore.Qt.Key_Backtab,
+                       QtCore.Qt.Key_Escape)
+    completion_prefix_expression = re.compile(r'(?<!\w)[^\W\d]\w*$')
+
     def __init__(self, language, parent=None):
         super().__init__(language, parent)
+        self.completer = None
+        self.buffer_completions = None
 
     @property
     def control_modifier(self):
@@ -384,6 +1496,13 @@ class AutoIndentCodeEditor(CodeEditor):
             super().wheelEvent(event)
 
     def keyPressEvent(self, event):
+        if self.completion_visible and event.key() in self.completion_keys:
+            event.ignore()  # Left for the completer to pick or dismiss a completion with
+            return
+        if event.key() == QtCore.Qt.Key_Space and event.modifiers() & QtCore.Qt.ControlModifier:
+            if self.completer is not None:
+                self.update_completions(event, forced=True)
+            return
         if event.key() == QtCore.Qt.Key_Return:
             self.newline(event)
         elif event.key() == QtCore.Qt.Key_Backspace:
@@ -392,6 +1511,59 @@ class AutoIndentCodeEditor(CodeEditor):
             self.indent(self.language.indent_width)
         else:
             super().keyPressEvent(event)
+        if self.completer is not None:
+            self.update_completions(event)
+
+    def set_completions(self, project_completions):
+        '''Offers completions of the identifier being typed from the project and this buffer'''
+        self.buffer_completions = BufferCompletions(self, project_completions)
+        self.completer = QtWidgets.QCompleter(self)
+        self.completer.setWidget(self)
+        self.completer.setCompletionMode(QtWidgets.QCompleter.UnfilteredPopupCompletion)
+        self.completer.setModel(QtCore.QStringListModel(self.completer))
+        self.completer.popup().setObjectName('completions')
+        self.completer.activated[str].connect(self.insert_completion)
+
+    @property
+    def completion_visible(self):
+        return self.completer is not None and self.completer.popup().isVisible()
+
+    def completion_prefix(self):
+        '''The identifier before the cursor, or None where there is nothing to complete'''
+        cursor = self.textCursor()
+        if cursor.hasSelection():
+            return None
+        before = cursor.block().text()[:cursor.positionInBlock()]
+        if '#' in before:
+            return None
+        match = self.completion_prefix_expression.search(before)
+        return match.group() if match is not None else None
+
+    def update_completions(self, event, forced=False):
+        '''Shows completions after two identifier characters are typed or on Ctrl+Space, and narrows them as typing goes on'''
+        prefix = self.completion_prefix()
+        typed = event.text()[-1:]
+        if prefix is None or not (forced or self.completion_visible or
+                                  (typed and (typed.isalnum() or typed == '_') and len(prefix) >= 2)):
+            self.completer.popup().hide()
+            return
+        words = self.buffer_completions.complete(prefix)
+        if not words:
+            self.completer.popup().hide()
+            return
+        model = self.completer.model()
+        model.setStringList(words)
+        popup = self.completer.popup()
+        popup.setCurrentIndex(model.index(0, 0))
+        rect = self.cursorRect().translated(self.viewport().pos())
+        rect.setWidth(popup.sizeHintForColumn(0) + popup.verticalScrollBar().sizeHint().width())
+        self.completer.complete(rect)
+
+    def insert_completion(self, word):
+        cursor = self.textCursor()
+        cursor.movePosition(QtGui.QTextCursor.Left, QtGui.QTextCursor.KeepAnchor, len(self.completion_prefix() or ''))
+        cursor.insertText(word)
+        self.setTextCursor(cursor)
 
 
     def autopep8_code(self):
@@ -447,6 +1619,41 @@ class AutoIndentCodeEditor(CodeEditor):
 
 
 class PythonCodeEditor(AutoIndentCodeEditor):
+
+    definition_requested = QtCore.pyqtSignal(str, int, bool)  # name, line, whether it follows a dot
+    usages_requested = QtCore.pyqtSignal(str)
+
+    identifier_expression = re.compile(r'[^\W\d]\w*')
+
     def __init__(self, parent=None):
         super().__init__(syntax.python, parent)
         self.set_highlighter(syntax.PythonHighlighter)
+
+    def identifier_at(self, cursor):
+        '''(name, line, whether it follows a dot) of the identifier at a cursor, or None'''
+        text = cursor.block().text()
+        position = cursor.positionInBlock()
+        for match in self.identifier_expression.finditer(text):
+            if match.start() <= position <= match.end():
+                attribute = text[:match.start()].rstrip().endswith('.')
+                return match.group(), cursor.blockNumber() + 1, attribute
+            if match.start() > position:
+                break
+        return None
+
+    def go_to_definition(self):
+        identifier = self.identifier_at(self.textCursor())
+        if identifier is not None:
+            self.definition_requested.emit(*identifier)
+
+    def find_usages(self):
+        identifier = self.identifier_at(self.textCursor())
+        if identifier is not None:
+            self.usages_requested.emit(identifier[0])
+
+    def mousePressEvent(self, event):
+        if event.button() == QtCore.Qt.LeftButton and event.modifiers() & QtCore.Qt.ControlModifier:
+            self.setTextCursor(self.cursorForPosition(event.pos()))
+            self.go_to_definition()
+            return
+        super().mousePressEvent(event)